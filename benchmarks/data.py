@@ -0,0 +1,169 @@
+""" Synthetic Sentinel archive for benchmarks, generated from the samples in test/samples
+
+The archive is written to a directory as <bucket>/<key>, with an S3 inventory of it, and can be
+served by a local HTTP server standing in for both the free metadata endpoint and S3.
+"""
+import gzip
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import os.path as op
+
+from copy import deepcopy
+from datetime import datetime, timedelta
+
+from stac_sentinel.transport import Transport
+
+ROOT = op.dirname(op.dirname(op.abspath(__file__)))
+SAMPLES = op.join(ROOT, 'test', 'samples')
+
+COLLECTIONS = ['sentinel-s1-l1c', 'sentinel-s2-l1c', 'sentinel-s2-l2a']
+LATITUDE_BANDS = 'CDEFGHJKLMNPQRSTUVWX'
+
+
+def read_sample(name):
+    with open(op.join(SAMPLES, name)) as f:
+        return json.loads(f.read())
+
+
+def annotation_xml():
+    """ Sentinel-1 annotation XML, from the xmljson conversion of one in the samples """
+    from xml.etree.ElementTree import tostring
+    from xmljson import badgerfish as bf
+    return tostring(bf.etree(read_sample('sentinel-s1-l1c-metadata.json'))[0])
+
+
+def tileinfo_records(collection, n):
+    """ Generator returning n synthetic Sentinel-2 tileInfo records, spread across UTM zones and dates """
+    sample = read_sample('sentinel-s2-l1c-tileInfo.json')
+    level = 'L1C' if collection == 'sentinel-s2-l1c' else 'L2A'
+    start = datetime(2020, 1, 1)
+    for i in range(n):
+        md = deepcopy(sample)
+        zone, band, dt = i % 60 + 1, LATITUDE_BANDS[(i // 60) % 20], start + timedelta(days=i // 1200)
+        md['path'] = 'tiles/%s/%s/VB/%s/%s/%s/0' % (zone, band, dt.year, dt.month, dt.day)
+        md['utmZone'], md['latitudeBand'] = zone, band
+        md['tileOrigin']['crs']['properties']['name'] = 'urn:ogc:def:crs:EPSG:8.8.1:32%s%02d' % (
+            6 if band >= 'N' else 7, zone)
+        md['timestamp'] = dt.strftime('%Y-%m-%dT00:46:57.464Z')
+        md['productName'] = 'S2A_MSI%s_%s_N0205_R045_T%02d%sVB_%s' % (
+            level, dt.strftime('%Y%m%dT004701'), zone, band, dt.strftime('%Y%m%dT004657'))
+        md['cloudyPixelPercentage'] = float(i % 100)
+        yield md
+
+
+def productinfo_records(n):
+    """ Generator returning n synthetic Sentinel-1 productInfo records """
+    sample = read_sample('sentinel-s1-l1c-productInfo.json')
+    start = datetime(2020, 1, 1)
+    for i in range(n):
+        md = deepcopy(sample)
+        dt = start + timedelta(minutes=i)
+        md['id'] = 'S1B_IW_GRDH_1SDH_%s_%s_015028_01C14D_%04X' % (
+            dt.strftime('%Y%m%dT%H%M%S'), (dt + timedelta(seconds=25)).strftime('%Y%m%dT%H%M%S'), i % 65536)
+        md['path'] = 'GRD/%s/%s/%s/IW/DH/%s' % (dt.year, dt.month, dt.day, md['id'])
+        yield md
+
+
+def create_archive(path, collection, n, files=4):
+    """ Write n synthetic scenes of collection to path/<bucket>/<key>, and an inventory of them
+    to path/inventory/<collection> split into files data files
+
+    Returns:
+    Tuple of (inventory directory, list of metadata records)
+    """
+    records = []
+    keys = []
+    if collection == 'sentinel-s1-l1c':
+        xml = annotation_xml()
+        for md in productinfo_records(n):
+            base = op.join(path, collection, md['path'])
+            os.makedirs(op.join(base, 'annotation'), exist_ok=True)
+            for fname in md['filenameMap'].values():
+                if 'annotation' in fname and 'calibration' not in fname:
+                    with open(op.join(base, fname), 'wb') as f:
+                        f.write(xml)
+            keys.append(md['path'] + '/productInfo.json')
+            records.append(md)
+    else:
+        for md in tileinfo_records(collection, n):
+            keys.append(md['path'] + '/tileInfo.json')
+            records.append(md)
+    for key, md in zip(keys, records):
+        filename = op.join(path, collection, key)
+        os.makedirs(op.dirname(filename), exist_ok=True)
+        with open(filename, 'w') as f:
+            f.write(json.dumps(md))
+
+    # inventory, with other files of each scene as in the real inventories
+    inventory = op.join(path, 'inventory', collection)
+    os.makedirs(op.join(inventory, 'data'))
+    manifest = {
+        'sourceBucket': collection,
+        'fileFormat': 'CSV',
+        'fileSchema': 'Bucket, Key, Size, LastModifiedDate, ETag',
+        'files': []
+    }
+    for i in range(files):
+        lines = []
+        for j, key in enumerate(keys[i::files]):
+            for fname in ['preview.jpg', op.basename(key), 'B01.jp2']:
+                lines.append('"%s","%s/%s","1000","2020-06-01T00:00:00.000Z","%032x"' % (
+                    collection, op.dirname(key), fname, j))
+        filename = op.join(inventory, 'data', '%s.csv.gz' % i)
+        with gzip.open(filename, 'wt') as f:
+            f.write('\n'.join(lines))
+        manifest['files'].append({'key': '%s/%s-inventory/data/%s.csv.gz' % (collection, collection, i)})
+    with open(op.join(inventory, 'manifest.json'), 'w') as f:
+        f.write(json.dumps(manifest))
+    return inventory, records
+
+
+class Server(object):
+    """ HTTP server for a directory, in a separate process so it does not compete for the GIL """
+
+    def __init__(self, path):
+        self.path = path
+        self.process = None
+        self.url = None
+
+    def __enter__(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        self.process = subprocess.Popen([sys.executable, '-m', 'http.server', str(port), '--bind', '127.0.0.1',
+                                         '--directory', self.path],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.url = 'http://127.0.0.1:%s' % port
+        for i in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        return self
+
+    def __exit__(self, *args):
+        self.process.terminate()
+        self.process.wait()
+
+
+class S3Endpoint(Transport):
+    """ Transport reading s3://bucket/key from an HTTP server at endpoint/bucket/key """
+
+    def __init__(self, endpoint, **kwargs):
+        super(S3Endpoint, self).__init__(**kwargs)
+        self.endpoint = endpoint
+
+    def http_url(self, url):
+        return self.endpoint + '/' + url[5:] if url.startswith('s3://') else url
+
+    def get(self, url):
+        return super(S3Endpoint, self).get(self.http_url(url))
+
+    def iter_content(self, url, chunk_size=65536):
+        return super(S3Endpoint, self).iter_content(self.http_url(url), chunk_size=chunk_size)
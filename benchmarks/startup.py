@@ -0,0 +1,118 @@
+""" Startup benchmark: time to `import stac_sentinel` and time to the first Item for each collection
+
+Each measurement is made in a new Python process, as in a Lambda cold start. Metadata is read
+from the test samples with a LocalTransport, so no network access is needed.
+
+    $ python benchmarks/startup.py [--repeat 5] [--json]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import os.path as op
+
+ROOT = op.dirname(op.dirname(op.abspath(__file__)))
+SAMPLES = op.join(ROOT, 'test', 'samples')
+
+# heavy dependencies that should only be imported when needed
+HEAVY = ['boto3', 'botocore', 'boto3utils', 'dateutil', 'numpy', 'pyproj', 'requests', 'shapely', 'xmljson']
+
+IMPORT = """
+import sys, time
+t = time.perf_counter()
+import stac_sentinel
+print(time.perf_counter() - t)
+print(' '.join(m for m in %r if m in sys.modules))
+""" % (HEAVY,)
+
+FIRST_ITEM = """
+import sys, time
+t = time.perf_counter()
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.transport import LocalTransport
+SentinelSTAC.transport = LocalTransport(root=%r)
+metadata, base_url = SentinelSTAC.fetch_metadata(%r, %r, direct_from_s3=True)
+item = SentinelSTAC(%r, metadata).to_stac(base_url=base_url)
+print(time.perf_counter() - t)
+print(' '.join(m for m in %r if m in sys.modules))
+"""
+
+
+def create_samples(path):
+    """ Copy samples to path/<bucket>/<key> as read by LocalTransport, returning URL for each collection """
+    from xml.etree.ElementTree import tostring
+    from xmljson import badgerfish as bf
+
+    urls = {}
+    with open(op.join(SAMPLES, 'sentinel-s1-l1c-productInfo.json')) as f:
+        productinfo = json.loads(f.read())
+    with open(op.join(SAMPLES, 'sentinel-s1-l1c-metadata.json')) as f:
+        annotation = tostring(bf.etree(json.loads(f.read()))[0])
+    base = op.join(path, 'sentinel-s1-l1c', productinfo['path'])
+    os.makedirs(op.join(base, 'annotation'))
+    shutil.copy(op.join(SAMPLES, 'sentinel-s1-l1c-productInfo.json'), op.join(base, 'productInfo.json'))
+    for fname in productinfo['filenameMap'].values():
+        if 'annotation' in fname and 'calibration' not in fname:
+            with open(op.join(base, fname), 'wb') as f:
+                f.write(annotation)
+    urls['sentinel-s1-l1c'] = 's3://sentinel-s1-l1c/%s/productInfo.json' % productinfo['path']
+
+    with open(op.join(SAMPLES, 'sentinel-s2-l1c-tileInfo.json')) as f:
+        tileinfo = json.loads(f.read())
+    for collection in ['sentinel-s2-l1c', 'sentinel-s2-l2a']:
+        base = op.join(path, collection, tileinfo['path'])
+        os.makedirs(base)
+        shutil.copy(op.join(SAMPLES, 'sentinel-s2-l1c-tileInfo.json'), op.join(base, 'tileInfo.json'))
+        urls[collection] = 's3://%s/%s/tileInfo.json' % (collection, tileinfo['path'])
+    return urls
+
+
+def run(code):
+    """ Run code in a new interpreter, returning (seconds, modules) printed by it """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')]))
+    out = subprocess.check_output([sys.executable, '-c', code], env=env, cwd=ROOT).decode().splitlines()
+    return float(out[0]), out[1].split() if len(out) > 1 else []
+
+
+def measure(code, repeat):
+    times, modules = [], []
+    for i in range(repeat):
+        seconds, modules = run(code)
+        times.append(seconds * 1000)
+    return {
+        'median_ms': statistics.median(times),
+        'min_ms': min(times),
+        'max_ms': max(times),
+        'modules': modules
+    }
+
+
+def main(repeat=5):
+    results = {'import': measure(IMPORT, repeat)}
+    path = tempfile.mkdtemp()
+    try:
+        for collection, url in create_samples(path).items():
+            code = FIRST_ITEM % (path, collection, url, collection, HEAVY)
+            results['first_item:%s' % collection] = measure(code, repeat)
+    finally:
+        shutil.rmtree(path)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='stac-sentinel startup benchmark')
+    parser.add_argument('--repeat', help='Number of processes started for each measurement', default=5, type=int)
+    parser.add_argument('--json', help='Print results as JSON', default=False, action='store_true')
+    args = parser.parse_args()
+    results = main(repeat=args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            print('%-30s median %7.1f ms (min %.1f, max %.1f) heavy modules: %s' %
+                  (name, r['median_ms'], r['min_ms'], r['max_ms'], ', '.join(r['modules']) or '-'))
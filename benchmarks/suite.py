@@ -0,0 +1,208 @@
+""" Benchmark suite: throughput, latency percentiles and peak memory of to_stac, get_aws_archive and
+the CLI for each collection, using a synthetic archive served by a local HTTP server
+
+    $ python benchmarks/suite.py [-n 1000] [--collections sentinel-s2-l1c] [--output results.json]
+
+Results are written as JSON so runs of different releases can be compared.
+"""
+import argparse
+import glob
+import gzip
+import json
+import logging
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import os.path as op
+
+from datetime import datetime
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.cli import cli
+from stac_sentinel.version import __version__
+
+from data import COLLECTIONS, S3Endpoint, Server, annotation_xml, create_archive
+
+
+def percentiles(latencies, pcts=(50, 90, 99)):
+    """ Percentiles (nearest rank) of latencies, in milliseconds """
+    latencies = sorted(latencies)
+    if not latencies:
+        return {}
+    return {'p%s_ms' % p: latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+            for p in pcts}
+
+
+def measure(func, count):
+    """ Run func twice, once timed and once tracing memory allocations
+    func -- Function returning a list of latencies (seconds), one per Item
+    count -- Expected number of Items
+    """
+    t = time.perf_counter()
+    latencies = func()
+    seconds = time.perf_counter() - t
+    assert(len(latencies) == count), 'Expected %s Items, got %s' % (count, len(latencies))
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result = {
+        'items': len(latencies),
+        'seconds': seconds,
+        'items_per_sec': len(latencies) / seconds if seconds else None,
+        'peak_memory_mb': peak / 1024 ** 2
+    }
+    result.update(percentiles(latencies))
+    return result
+
+
+def bench_to_stac(collection, records):
+    """ Convert each metadata record with SentinelSTAC.to_stac, latency is per Item """
+    if collection == 'sentinel-s1-l1c':
+        records = [prepare_s1(md) for md in records]
+
+    def run():
+        latencies = []
+        for md in records:
+            t = time.perf_counter()
+            SentinelSTAC(collection, md).to_stac(base_url=SentinelSTAC.get_base_url(collection, md))
+            latencies.append(time.perf_counter() - t)
+        return latencies
+    return measure(run, len(records))
+
+
+def bench_to_stac_many(collection, records, chunk_size=500):
+    """ Convert metadata records in chunks with SentinelSTAC.to_stac_many, latency is per chunk per Item """
+    if collection == 'sentinel-s1-l1c':
+        records = [prepare_s1(md) for md in records]
+
+    def run():
+        latencies = []
+        for i in range(0, len(records), chunk_size):
+            chunk = records[i:i + chunk_size]
+            t = time.perf_counter()
+            items, errors = SentinelSTAC.to_stac_many(collection, chunk)
+            latencies += [(time.perf_counter() - t) / len(chunk)] * len(items)
+        return latencies
+    return measure(run, len(records))
+
+
+_annotation = None
+
+
+def prepare_s1(productinfo):
+    """ Sentinel-1 metadata as returned by fetch_metadata, so to_stac does no I/O """
+    global _annotation
+    if _annotation is None:
+        from stac_sentinel.annotation import read_annotation
+        _annotation = read_annotation([annotation_xml()])
+    base_url = 's3://sentinel-s1-l1c/%s' % productinfo['path']
+    md = SentinelSTAC.productinfo_to_metadata(productinfo, base_url)
+    md['annotation'] = _annotation
+    return md
+
+
+def bench_archive(collection, inventory, count, **kwargs):
+    """ Run get_aws_archive over the synthetic inventory, latency is the time between Items """
+    def run():
+        latencies = []
+        t = time.perf_counter()
+        for item in SentinelSTAC.get_aws_archive(collection, inventory=inventory, **kwargs):
+            now = time.perf_counter()
+            latencies.append(now - t)
+            t = now
+        return latencies
+    return measure(run, count)
+
+
+def bench_cli(collection, inventory, count, path):
+    """ Run the CLI end to end, writing Items to NDJSON """
+    argv = ['stac-sentinel', collection, '--inventory', inventory, '--log', '4', '--ndjson', path]
+
+    def run():
+        shutil.rmtree(path, ignore_errors=True)
+        _argv, sys.argv = sys.argv, argv
+        try:
+            cli()
+        finally:
+            sys.argv = _argv
+        logging.getLogger().handlers = []
+        # count Items written, there is no per Item latency for the CLI
+        n = 0
+        for fname in glob.glob(op.join(path, '*.ndjson.gz')):
+            with gzip.open(fname) as f:
+                n += sum(1 for line in f)
+        return [0] * n
+    result = measure(run, count)
+    for key in list(result.keys()):
+        if key.endswith('_ms'):
+            del result[key]
+    return result
+
+
+def main(n=1000, collections=COLLECTIONS, fetch_workers=16, transform_workers=1):
+    results = {
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': datetime.utcnow().isoformat(),
+        'params': {'n': n, 'fetch_workers': fetch_workers, 'transform_workers': transform_workers},
+        'results': {}
+    }
+    path = tempfile.mkdtemp()
+    _transport, _free_url = SentinelSTAC.transport, SentinelSTAC.FREE_URL
+    try:
+        with Server(path) as server:
+            SentinelSTAC.transport = S3Endpoint(server.url, pool_size=fetch_workers)
+            SentinelSTAC.FREE_URL = server.url
+            for collection in collections:
+                inventory, records = create_archive(path, collection, n)
+                kwargs = {'fetch_workers': fetch_workers, 'transform_workers': transform_workers}
+                res = results['results'][collection] = {}
+                res['to_stac'] = bench_to_stac(collection, records)
+                res['to_stac_many'] = bench_to_stac_many(collection, records)
+                res['get_aws_archive'] = bench_archive(collection, inventory, n, **kwargs)
+                res['get_aws_archive_unordered'] = bench_archive(collection, inventory, n, ordered=False, **kwargs)
+                # cache the metadata, then create Items from the cache alone
+                cache = op.join(path, 'cache', collection)
+                for item in SentinelSTAC.get_aws_archive(collection, inventory=inventory, cache=cache, **kwargs):
+                    pass
+                res['get_aws_archive_replay'] = bench_archive(collection, inventory, n, cache=cache, replay=True,
+                                                              **kwargs)
+                res['cli'] = bench_cli(collection, inventory, n, op.join(path, 'output'))
+    finally:
+        SentinelSTAC.transport, SentinelSTAC.FREE_URL = _transport, _free_url
+        shutil.rmtree(path)
+    return results
+
+
+def summary(results):
+    lines = ['stac-sentinel %s, python %s, %s Items per collection' % (
+        results['version'], results['python'], results['params']['n'])]
+    for collection, benchmarks in results['results'].items():
+        for name, r in benchmarks.items():
+            lines.append('%-16s %-26s %9.1f items/s  p50 %8s  p99 %8s  peak %7.1f MB' % (
+                collection, name, r['items_per_sec'],
+                '%.3fms' % r['p50_ms'] if 'p50_ms' in r else '-',
+                '%.3fms' % r['p99_ms'] if 'p99_ms' in r else '-', r['peak_memory_mb']))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='stac-sentinel benchmark suite')
+    parser.add_argument('-n', help='Number of synthetic scenes per collection', default=1000, type=int)
+    parser.add_argument('--collections', help='Collections to benchmark', nargs='*', default=COLLECTIONS)
+    parser.add_argument('--fetch_workers', help='Number of threads fetching metadata', default=16, type=int)
+    parser.add_argument('--transform_workers', help='Number of workers converting metadata', default=1, type=int)
+    parser.add_argument('--output', help='Save results to this JSON file', default=None)
+    args = parser.parse_args()
+    results = main(n=args.n, collections=args.collections, fetch_workers=args.fetch_workers,
+                   transform_workers=args.transform_workers)
+    print(summary(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(json.dumps(results, indent=2))
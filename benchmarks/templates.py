@@ -0,0 +1,42 @@
+""" Microbenchmark of building Item assets: reading Collection JSON per Item vs compiled ItemTemplate
+
+    $ python benchmarks/templates.py
+"""
+import json
+import os.path as op
+import timeit
+
+import stac_sentinel
+
+from stac_sentinel.templates import HREFS, ItemTemplate
+
+BASE_URL = 's3://sentinel-s2-l1c/tiles/57/U/VB/2017/10/23/0'
+
+
+def assets_from_collection_json(collection, base_url):
+    """ Previous implementation: read Collection JSON and join each href """
+    filename = op.join(op.dirname(stac_sentinel.__file__), '%s.json' % collection)
+    assets = json.loads(open(filename).read())['assets']
+    for key, href in HREFS[collection].items():
+        assets[key]['href'] = op.join(base_url, href.format(base='', l1c_base=''))
+    return assets
+
+
+def assets_from_template(collection, base_url):
+    return ItemTemplate.get(collection).get_assets_from_url(base_url)
+
+
+def main(number=10000):
+    for collection in HREFS:
+        assert(assets_from_collection_json(collection, BASE_URL) == assets_from_template(collection, BASE_URL))
+        results = {}
+        for name, func in [('collection_json', assets_from_collection_json), ('template', assets_from_template)]:
+            seconds = timeit.timeit(lambda: func(collection, BASE_URL), number=number)
+            results[name] = seconds / number * 1e6
+        print('%s: collection JSON %.1f us/item, template %.1f us/item (%.1fx)' %
+              (collection, results['collection_json'], results['template'],
+               results['collection_json'] / results['template']))
+
+
+if __name__ == '__main__':
+    main()
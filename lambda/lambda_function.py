@@ -1,26 +1,34 @@
-import boto3
 import json
 import logging
-import requests
+import os
 import sys
 
 import os.path as op
 
 from datetime import datetime
 from stac_sentinel import SentinelSTAC
+from stac_sentinel.changes import ChangeStore, content_hash
+from stac_sentinel.encoding import dumps
+from stac_sentinel.notifications import is_sqs_event, items_from_event
+from stac_sentinel.publish import SNSPublisher
 from urllib.parse import urljoin
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-client = boto3.client('sns', region_name=SentinelSTAC.region)
+# SNS client, created on first use and reused by later invocations
+client = None
+
+# SQLite file of Item content hashes (e.g., on an EFS mount), if set unchanged Items are not published
+# and published Items have a change message attribute (new or updated)
+CHANGE_STORE = os.getenv('CHANGE_STORE')
 
 # NOTE: this lambda function requires GeoLambda layers
 # - arn:aws:lambda:eu-central-1:552188055668:layer:geolambda:2
 # - arn:aws:lambda:eu-central-1:552188055668:layer:geolambda-python:1
 
 
-# NOTE: this lambda to be subscribed to the following SNS topics:
+# NOTE: this lambda to be subscribed to the following SNS topics, directly or through an SQS queue:
 # - (S1-L1C) arn:aws:sns:eu-central-1:214830741341:SentinelS1L1C
 # - (S2-L1C) arn:aws:sns:eu-west-1:214830741341:NewSentinel2Product
 # - (S2-L2A) arn:aws:sns:eu-central-1:214830741341:SentinelS2L2A
@@ -34,86 +42,73 @@ collections = {
 
 
 def lambda_handler(event, context):
-    logger.debug('Event: %s' % json.dumps(event))
-    
-    metadata = json.loads(event['Records'][0]['Sns']['Message'])
-    logger.info('Message: %s' % json.dumps(metadata))
-
-    # determine the collection
-    collection = None
-    if 'tiles' in metadata:
-        # sentinel-2
-        lvl = metadata['name'].split('_')[1][3:5]
-        if lvl == 'L1':
-            collection = 'sentinel-s2-l1c'
-        elif lvl == 'L2':
-            collection = 'sentinel-s2-l2a'
-    elif 'missionId' in metadata:
-        collection = 'sentinel-s1-l1c'
-        
-    if collection is None:
-        msg = 'Message not recognized'
-        logger.error(msg)
-        return msg
-
-    logger.info('Collection %s' % collection)
-
-    items = []
-    if 'sentinel-s1' in collection:
-        base_url = 's3://%s/%s' % (collection, metadata['path'])
-        fnames = [f"{base_url}/{a}" for a in metadata['filenameMap'].values() if 'annotation' in a and 'calibration' not in a]
-        md = {
-            'id': metadata['id'],
-            'coordinates': metadata['footprint']['coordinates'],
-            'filenames': fnames
-        }
-        scene = SentinelSTAC(collection, md)
-        item = scene.to_stac()
-        items.append(item)
-    else:
-        # there should never be more than one tile
-        for md in metadata['tiles']:
-            # get tile info for each tile
-            url = '%s/%s/%s/tileInfo.json' % (SentinelSTAC.FREE_URL, collection, md['path'])
-            logger.info('metadata url = %s' % url)
-            r = requests.get(url, stream=True)
-            metadata = json.loads(r.text)
-            logger.debug('Metadata: %s' % json.dumps(metadata))
-
-            # transform to STAC
-            scene = SentinelSTAC(collection, metadata)
-            item = scene.to_stac(base_url='s3://%s/%s' % (collection, md['path']))
-            items.append(item)
-
-    for item in items:
-        logger.info('Item: %s' % json.dumps(item))
+    """ Publish STAC Items for new scene notifications, from SNS or from an SQS batch
+
+    For SQS events the messages whose metadata could not be fetched or whose Items could not be
+    published are returned as batchItemFailures, so only those are retried (requires
+    ReportBatchItemFailures on the trigger). For SNS events an exception is raised if any of them
+    failed, so the invocation is retried (and sent to the dead-letter queue if it keeps failing).
+    Messages that are not recognized, or can not be converted, would fail again and are logged and
+    dropped.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('Event: %s' % json.dumps(event))
+
+    invalid = []
+    items, failed = items_from_event(event, invalid=invalid)
+    failed = set(failed)
+    if invalid:
+        logger.error('Dropped %s messages that could not be converted: %s' % (len(invalid), ', '.join(invalid)))
+
+    changes = None if CHANGE_STORE is None else ChangeStore(CHANGE_STORE)
+    try:
         # publish to SNS
-        client.publish(TopicArn=collections[collection], Message=json.dumps(item),
-                       MessageAttributes=get_sns_attributes(item))
-        logger.info('Published %s to %s' % (item['id'], collections[collection]))
-
-
-def get_sns_attributes(item):
-    """ Get Attributes from STAC item for publishing to SNS """
-    return {
-        'properties.datetime': {
-            'DataType': 'String',
-            'StringValue': item['properties']['datetime']
-        },
-        'bbox.ll_lon': {
-            'DataType': 'Number',
-            'StringValue': str(item['bbox'][0])
-        },
-        'bbox.ll_lat': {
-            'DataType': 'Number',
-            'StringValue': str(item['bbox'][1])
-        },
-        'bbox.ur_lon': {
-            'DataType': 'Number',
-            'StringValue': str(item['bbox'][2])
-        },
-        'bbox.ur_lat': {
-            'DataType': 'Number',
-            'StringValue': str(item['bbox'][3])
-        }     
-    }
\ No newline at end of file
+        for collection in collections:
+            _items = [(message_id, item, dumps(item)) for message_id, _collection, item in items
+                      if _collection == collection]
+            if not _items:
+                continue
+            _changes = [None] * len(_items)
+            if changes is not None:
+                _changes = changes.changes([(item['id'], content_hash(data)) for message_id, item, data in _items])
+                logger.info('%s of %s Items unchanged' % (_changes.count(None), len(_items)))
+            try:
+                with SNSPublisher(collections[collection], client=get_client()) as publisher:
+                    for (message_id, item, data), change in zip(_items, _changes):
+                        if changes is not None and change is None:
+                            continue
+                        if logger.isEnabledFor(logging.INFO):
+                            logger.info('Item: %s' % data.decode('utf-8'))
+                        publisher.publish(item, data=data, change=change)
+            except Exception:
+                if changes is not None:
+                    # the hashes of all changed Items are stored, published again when the event is retried
+                    changes.forget([item['id'] for (message_id, item, data), change in zip(_items, _changes)
+                                    if change is not None])
+                raise
+            logger.info('Published %s Items to %s' % (publisher.published, collections[collection]))
+            ids = set(json.loads(entry['Message'])['id'] for entry, code in publisher.failed)
+            failed.update(message_id for message_id, item, data in _items if item['id'] in ids)
+            if changes is not None and ids:
+                # published again when the message is retried
+                changes.forget(ids)
+    finally:
+        if changes is not None:
+            changes.close()
+
+    if failed:
+        logger.error('Failed to process %s of %s messages' % (len(failed), len(event.get('Records', []))))
+    if is_sqs_event(event):
+        return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in sorted(failed)]}
+    if failed:
+        raise Exception('Failed to process messages %s' % ', '.join(sorted(failed)))
+
+
+def get_client():
+    """ Get SNS client """
+    global client
+    if client is None:
+        import boto3
+        client = boto3.client('sns', region_name=SentinelSTAC.region)
+    return client
+
@@ -35,5 +35,9 @@ setup(
     packages=['stac_sentinel'],
     include_package_data=True,
     install_requires=install_requires,
+    extras_require={
+        'aio': ['aiohttp'],
+        'validate': ['fastjsonschema'],
+    },
     dependency_links=dependency_links,
 )
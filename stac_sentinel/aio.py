@@ -0,0 +1,314 @@
+""" asyncio API: non-blocking fetching of metadata and conversion to STAC Items
+
+    async with AsyncTransport(limit=200) as transport:
+        async for item in get_aws_archive('sentinel-s2-l1c', transport=transport, prefix='tiles/57/U'):
+            ...
+
+Requests are made with aiohttp (imported on first use), thousands can be in flight from one
+event loop, up to the limit of the transport.
+"""
+import asyncio
+import json
+import logging
+
+import os.path as op
+
+from collections import deque
+from itertools import islice
+from urllib.parse import urlparse
+
+from .annotation import AnnotationReader
+from .inventory import inventory_url, latest_inventory
+from .sentinel import SentinelSTAC, _to_stac
+from .transport import Transport, TransportError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTransport(object):
+    """ Non-blocking reader of HTTP(S), S3 and local files with a limit on concurrent requests
+
+    S3 objects are read from presigned URLs, signed locally with the S3 client of transport. Retries,
+    timeout and requester pays are those of transport. A single aiohttp session is created on first use
+    and must be closed with close() (or by using the transport as an async context manager). A transport
+    is used in a single event loop.
+    """
+
+    retry_status = Transport.retry_status
+
+    def __init__(self, transport=None, limit=100, expires=3600):
+        """ Create async transport
+        Keyword arguments:
+        transport -- Transport used for S3 credentials and retry settings (default SentinelSTAC.transport)
+        limit -- Maximum number of requests in flight
+        expires -- Seconds presigned S3 URLs are valid for
+        """
+        self.transport = transport or SentinelSTAC.transport
+        self.limit = limit
+        self.expires = expires
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    @property
+    def semaphore(self):
+        # created in the event loop it is used in
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    @property
+    def session(self):
+        """ aiohttp ClientSession with a connection pool of limit connections """
+        if self._session is None:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError('AsyncTransport requires aiohttp, install with `pip install stac-sentinel[aio]`')
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.limit),
+                                                  timeout=aiohttp.ClientTimeout(total=self.transport.timeout))
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def http_url(self, url):
+        """ HTTP(S) URL to read url from, S3 URLs are presigned """
+        if not url.startswith('s3://'):
+            return url
+        parts = urlparse(url)
+        params = {'Bucket': parts.netloc, 'Key': parts.path.lstrip('/')}
+        if self.transport.requester_pays:
+            params['RequestPayer'] = 'requester'
+        return self.transport.s3.generate_presigned_url('get_object', Params=params, ExpiresIn=self.expires)
+
+    def is_remote(self, url):
+        return url.startswith('s3://') or url.startswith('http://') or url.startswith('https://')
+
+    async def request(self, url):
+        """ GET url, retrying connection errors and retryable status codes
+        Returns:
+        aiohttp response, to be released by the caller
+        """
+        import aiohttp
+        _url = self.http_url(url)
+        attempt = 0
+        while True:
+            try:
+                resp = await self.session.get(_url)
+                if resp.status < 400:
+                    return resp
+                resp.release()
+                err = TransportError(url, 'HTTP status %s' % resp.status, status=resp.status)
+                if resp.status not in self.retry_status:
+                    raise err
+                wait = resp.headers.get('Retry-After', '')
+                wait = float(wait) if wait.isdigit() else 0
+            except (aiohttp.ClientError, asyncio.TimeoutError) as _err:
+                err = TransportError(url, str(_err) or type(_err).__name__)
+                wait = 0
+            if attempt >= self.transport.retries:
+                raise err
+            wait = max(wait, self.transport.delay(attempt))
+            attempt += 1
+            logger.warning('Retrying %s in %.2f seconds (%s)' % (url, wait, err))
+            await asyncio.sleep(wait)
+
+    async def get(self, url):
+        """ Read contents of url (s3://, http(s):// or local filename) as bytes """
+        if not self.is_remote(url):
+            return await asyncio.get_running_loop().run_in_executor(None, self.transport.get, url)
+        async with self.semaphore:
+            resp = await self.request(url)
+            try:
+                return await resp.read()
+            finally:
+                resp.release()
+
+    async def get_text(self, url):
+        """ Read contents of url as text """
+        return (await self.get(url)).decode('utf-8')
+
+    async def get_json(self, url):
+        """ Read contents of url as JSON """
+        return json.loads(await self.get(url))
+
+    async def iter_content(self, url, chunk_size=65536):
+        """ Async generator returning contents of url in chunks, reading stops if the generator is closed """
+        if not self.is_remote(url):
+            data = await self.get(url)
+            for i in range(0, len(data), chunk_size):
+                yield data[i:i + chunk_size]
+            return
+        async with self.semaphore:
+            resp = await self.request(url)
+            try:
+                async for chunk in resp.content.iter_chunked(chunk_size):
+                    yield chunk
+            finally:
+                # close rather than release, the rest of the response may not have been read
+                resp.close()
+
+
+class LocalAsyncTransport(AsyncTransport):
+    """ Stand-in async transport reading URLs with a (Local)Transport, for tests
+
+    Each read waits delay seconds, and the largest number of reads in flight is kept in max_in_flight.
+    """
+
+    def __init__(self, transport, limit=100, delay=0):
+        super(LocalAsyncTransport, self).__init__(transport=transport, limit=limit)
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get(self, url):
+        async with self.semaphore:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(self.delay)
+                return self.transport.get(url)
+            finally:
+                self.in_flight -= 1
+
+    async def iter_content(self, url, chunk_size=65536):
+        data = await self.get(url)
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+
+async def get_annotation(filename, transport):
+    """ Get the values used for STAC from an annotation XML, reading only as much of the file as needed """
+    reader = AnnotationReader()
+    chunks = transport.iter_content(filename)
+    try:
+        with SentinelSTAC.stats.timer('annotation'):
+            async for chunk in chunks:
+                values = reader.feed(chunk)
+                if values is not None:
+                    return values
+            raise reader.missing()
+    finally:
+        await chunks.aclose()
+
+
+async def fetch_metadata(collection, url, transport, direct_from_s3=False):
+    """ Fetch original metadata for the inventory file at url, see SentinelSTAC.fetch_metadata
+    Returns:
+    Tuple of (metadata, base_url) ready to be passed to SentinelSTAC
+    """
+    metadata = await transport.get_json(SentinelSTAC.metadata_url(collection, url, direct_from_s3=direct_from_s3))
+    base_url = op.dirname(url)
+    if collection == 'sentinel-s1-l1c':
+        metadata = SentinelSTAC.productinfo_to_metadata(metadata, base_url)
+        metadata['annotation'] = await get_annotation(metadata['filenames'][0], transport)
+    return metadata, base_url
+
+
+async def to_stac(collection, url, transport, direct_from_s3=False, executor=None):
+    """ Fetch metadata for the inventory file at url and convert it to a STAC Item
+    Keyword arguments:
+    direct_from_s3 -- Fetch metadata from S3 instead of the free endpoint
+    executor -- concurrent.futures Executor to convert metadata in, default is in the event loop
+    """
+    with SentinelSTAC.stats.timer('fetch'):
+        metadata, base_url = await fetch_metadata(collection, url, transport, direct_from_s3=direct_from_s3)
+    task = (collection, metadata, base_url)
+    if executor is None:
+        return _to_stac(task)
+    return await asyncio.get_running_loop().run_in_executor(executor, _to_stac, task)
+
+
+async def get_aws_archive(collection, transport=None, direct_from_s3=False, ordered=True, executor=None,
+                          inventory=None, inventory_workers=4, shard_index=0, shard_count=1, shard_by='hash',
+                          chunk_size=1000, **kwargs):
+    """ Async generator returning the archive of Sentinel data on AWS, see SentinelSTAC.get_aws_archive
+    Keyword arguments:
+    transport -- AsyncTransport, default is one created (and closed) for the archive
+    direct_from_s3 -- Fetch metadata from S3 instead of the free endpoint
+    ordered -- Return Items in inventory order, otherwise as they are completed
+    executor -- concurrent.futures Executor to convert metadata in, default is in the event loop
+    inventory -- Location of the inventory (s3:// URL or local directory), defaults to the AWS inventory
+    inventory_workers -- Number of inventory files read concurrently
+    shard_index, shard_count, shard_by -- Process only the keys in one shard, see inventory.in_shard
+    chunk_size -- Number of inventory records read at a time (in a thread)
+    prefix, start_date, end_date -- Filters of inventory records, see Inventory.records
+
+    Returns:
+    Async iterator of STAC Items
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError('shard_index must be between 0 and shard_count - 1')
+    shard = (shard_index, shard_count, shard_by) if shard_count > 1 else None
+    opened = transport is None
+    if opened:
+        transport = AsyncTransport()
+    stats = SentinelSTAC.stats
+    loop = asyncio.get_running_loop()
+
+    # the inventory is read with the blocking transport, in a thread
+    records = latest_inventory(inventory or inventory_url(collection), transport=SentinelSTAC.transport,
+                               workers=inventory_workers, stats=stats, suffix=SentinelSTAC.collections[collection],
+                               shard=shard, **kwargs)
+    buffered = deque()
+    exhausted = False
+
+    async def convert(record):
+        try:
+            item = await to_stac(collection, record['url'], transport, direct_from_s3=direct_from_s3,
+                                 executor=executor)
+            return record, item, None
+        except Exception as err:
+            return record, None, err
+
+    # enough conversions are scheduled to keep the transport busy
+    max_pending = 2 * transport.limit
+    pending = deque() if ordered else set()
+    i = 0
+    try:
+        while True:
+            while len(pending) < max_pending and not exhausted:
+                if not buffered:
+                    buffered.extend(await loop.run_in_executor(None, lambda: list(islice(records, chunk_size))))
+                    if not buffered:
+                        exhausted = True
+                        break
+                task = asyncio.ensure_future(convert(buffered.popleft()))
+                if ordered:
+                    pending.append(task)
+                else:
+                    pending.add(task)
+            if not pending:
+                break
+            if ordered:
+                done = [await pending.popleft()]
+            else:
+                finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending -= finished
+                done = [task.result() for task in finished]
+            for record, item, err in done:
+                if (i % 100) == 0:
+                    logger.info('%s records' % i)
+                    stats.report()
+                i += 1
+                if err is not None:
+                    stats.incr('failed')
+                    logger.error('Error creating STAC Item from %s, Error: %s' % (record['url'], err))
+                    continue
+                stats.incr('items')
+                yield item
+    finally:
+        for task in pending:
+            task.cancel()
+        # wait for the cancelled conversions to complete, so their requests are released
+        await asyncio.gather(*pending, return_exceptions=True)
+        if opened:
+            await transport.close()
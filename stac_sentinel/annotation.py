@@ -0,0 +1,98 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Sentinel-1 annotation elements used for STAC Items, as paths below the root product element
+SWATH_PARAMS = 'imageAnnotation/processingInformation/swathProcParamsList/swathProcParams'
+FIELDS = (
+    'adsHeader/missionId',
+    'adsHeader/productType',
+    'adsHeader/mode',
+    'adsHeader/startTime',
+    'adsHeader/stopTime',
+    'adsHeader/absoluteOrbitNumber',
+    'generalAnnotation/productInformation/pass',
+    'imageAnnotation/imageInformation/incidenceAngleMidSwath',
+    SWATH_PARAMS + '/rangeProcessing/numberOfLooks',
+    SWATH_PARAMS + '/azimuthProcessing/numberOfLooks'
+)
+
+
+class AnnotationReader(object):
+    """ Incremental parser of annotation XML, fed chunks of the document until all fields are read """
+
+    def __init__(self, fields=FIELDS):
+        """ Create reader
+        Keyword arguments:
+        fields -- Paths of elements to read, relative to the root element. If an element
+                  is repeated the first one is used
+        """
+        from xml.etree.ElementTree import XMLPullParser
+        self.fields = set(fields)
+        self.parser = XMLPullParser(events=('start', 'end'))
+        self.path = []
+        self.values = {}
+
+    def feed(self, chunk):
+        """ Parse the next chunk of the document
+        Returns:
+        Dictionary of path: value, with values converted as in xmljson, once all fields are read, otherwise None
+        """
+        self.parser.feed(chunk)
+        path, values = self.path, self.values
+        for event, elem in self.parser.read_events():
+            if event == 'start':
+                path.append(elem.tag.rsplit('}', 1)[-1])
+                continue
+            key = '/'.join(path[1:])
+            if key in self.fields and key not in values:
+                values[key] = convert(elem.text)
+                if len(values) == len(self.fields):
+                    return values
+            path.pop()
+            # drop contents of elements that have been read
+            elem.clear()
+        return None
+
+    def missing(self):
+        """ Error for a document that ended before all fields were read """
+        missing = sorted(self.fields - set(self.values.keys()))
+        return ValueError('Annotation is missing %s' % ', '.join(missing))
+
+
+def read_annotation(chunks, fields=FIELDS):
+    """ Incrementally parse annotation XML, stopping as soon as all fields are read
+    Arguments:
+    chunks -- Iterable of bytes of the XML document (e.g., Transport.iter_content)
+    fields -- Paths of elements to read, relative to the root element. If an element
+              is repeated the first one is used
+
+    Returns:
+    Dictionary of path: value, with values converted as in xmljson
+    """
+    reader = AnnotationReader(fields)
+    for chunk in chunks:
+        values = reader.feed(chunk)
+        if values is not None:
+            return values
+    raise reader.missing()
+
+
+def convert(value):
+    """ Convert XML text to None, boolean, int, float or string (as done by xmljson) """
+    if value is None:
+        return None
+    if value.lower() == 'true':
+        return True
+    elif value.lower() == 'false':
+        return False
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        if float('-inf') < float(value) < float('inf'):
+            return float(value)
+    except ValueError:
+        pass
+    return value
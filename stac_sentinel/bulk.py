@@ -0,0 +1,260 @@
+import abc
+import logging
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+from .encoding import dumps
+from .sentinel import SentinelSTAC
+from .sinks import Sink
+from .transport import Transport, TransportError
+
+logger = logging.getLogger(__name__)
+
+
+class BulkLoader(Sink):
+    """ Load Items into a search backend with bulk requests
+
+    Items are grouped into batches of up to batch_size Items (and max_bytes of JSON), which are sent
+    from a pool of threads sharing the connection pool of one Transport. At most max_in_flight batches
+    are queued or being sent, write() blocks when that limit is reached. Entries of a batch that fail
+    with a retryable status are retried with backoff, requests are retried by the Transport.
+
+    Subclasses send a batch of entries, tuples of (id, collection, Item encoded as JSON bytes), with
+    load_batch().
+    """
+
+    def __init__(self, url, transport=None, batch_size=500, max_bytes=10 * 1024 * 1024, workers=4,
+                 max_in_flight=None, retries=3, backoff=0.5, stats=None):
+        """ Create bulk loader
+        Arguments:
+        url -- URL of the API
+
+        Keyword arguments:
+        transport -- Transport requests are made with (default one with a pool of workers connections)
+        batch_size -- Maximum number of Items in a request
+        max_bytes -- Maximum size of the Items in a request
+        workers -- Number of threads sending requests
+        max_in_flight -- Maximum number of batches queued or being sent (default 2 * workers)
+        retries -- Number of times failed entries are retried
+        backoff -- Base delay, in seconds, between retries
+        stats -- Stats the loaded Items and requests are recorded in (default SentinelSTAC.stats)
+        """
+        self.url = url.rstrip('/')
+        self.transport = transport or Transport(pool_size=workers, backoff=backoff)
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = SentinelSTAC.stats if stats is None else stats
+        self.executor = ThreadPoolExecutor(workers)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight or 2 * workers)
+        self.lock = threading.Lock()
+        self.futures = set()
+        self.batch = []
+        self.batch_bytes = 0
+        self.start = None
+        self.loaded = 0
+        self.load_failed = 0
+        # (id, error) of Items that could not be loaded, not yet returned by pop_failed
+        self.failed = []
+
+    def write(self, item, data=None):
+        """ Add an Item to be loaded, optionally already encoded as JSON bytes """
+        if self.start is None:
+            self.start = time.time()
+        entry = (item['id'], item.get('collection'), dumps(item) if data is None else data)
+        if self.batch and self.batch_bytes + len(entry[2]) > self.max_bytes:
+            self.submit()
+        self.batch.append(entry)
+        self.batch_bytes += len(entry[2])
+        if len(self.batch) >= self.batch_size:
+            self.submit()
+
+    def submit(self):
+        """ Submit the current batch for loading """
+        if not self.batch:
+            return
+        batch, self.batch, self.batch_bytes = self.batch, [], 0
+        self.in_flight.acquire()
+        future = self.executor.submit(self.load, batch)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        with self.lock:
+            self.futures.discard(future)
+        self.in_flight.release()
+        if future.exception() is not None:
+            logger.error('Error loading Items to %s: %s' % (self.url, future.exception()))
+
+    def load(self, entries):
+        """ Load entries with load_batch, retrying entries that failed with a retryable status """
+        attempt = 0
+        while True:
+            try:
+                with self.stats.timer('bulk'):
+                    failed = self.load_batch(entries)
+            except Exception as err:
+                failed = [(entry, False, str(err)) for entry in entries]
+            loaded = len(entries) - len(failed)
+            with self.lock:
+                self.loaded += loaded
+            self.stats.incr('loaded', loaded)
+            if attempt >= self.retries:
+                failed = [(entry, False, error) for entry, retryable, error in failed]
+            final = [(entry[0], error) for entry, retryable, error in failed if not retryable]
+            if final:
+                with self.lock:
+                    self.failed += final
+                    self.load_failed += len(final)
+                self.stats.incr('load_failed', len(final))
+            entries = [entry for entry, retryable, error in failed if retryable]
+            if not entries:
+                return
+            attempt += 1
+            logger.warning('Retrying %s Items loaded to %s' % (len(entries), self.url))
+            time.sleep(self.backoff * 2 ** (attempt - 1))
+
+    @abc.abstractmethod
+    def load_batch(self, entries):
+        """ Send a batch of entries
+        Returns:
+        List of (entry, retryable, error message) of the entries that failed
+        """
+
+    def pop_failed(self):
+        """ Ids of the Items that could not be loaded since the last call, logged with their errors """
+        with self.lock:
+            failed, self.failed = self.failed, []
+        for id, error in failed:
+            logger.error('Error loading Item %s to %s: %s' % (id, self.url, error))
+        return [id for id, error in failed]
+
+    def flush(self):
+        """ Load remaining Items and wait for the batches in flight to complete """
+        self.submit()
+        with self.lock:
+            futures = list(self.futures)
+        wait_futures(futures)
+
+    def close(self):
+        """ Load remaining Items and wait for all batches to complete """
+        self.submit()
+        self.executor.shutdown(wait=True)
+        elapsed = time.time() - self.start if self.start is not None else 0
+        logger.info('Loaded %s Items to %s in %.1f seconds (%.1f Items/s)' % (
+            self.loaded, self.url, elapsed, self.loaded / elapsed if elapsed else 0))
+        if self.load_failed:
+            logger.error('%s Items could not be loaded to %s' % (self.load_failed, self.url))
+
+
+class TransactionsLoader(BulkLoader):
+    """ Load Items into a STAC API with the Transactions extension
+
+    The Items of a batch in each collection are POSTed to /collections/<collection>/items as an
+    ItemCollection (as accepted by e.g. stac-fastapi). If the batch is rejected as invalid (400 or
+    422), it is split to find the Items that are rejected. If an Item of the batch already exists
+    (409 Conflict), each Item is replaced with a PUT to /collections/<collection>/items/<id>, or
+    POSTed alone if it does not exist.
+    """
+
+    headers = {'Content-Type': 'application/json'}
+
+    def load_batch(self, entries):
+        collections = {}
+        for entry in entries:
+            collections.setdefault(entry[1], []).append(entry)
+        failed = []
+        for collection, _entries in collections.items():
+            failed += self.post_items('%s/collections/%s/items' % (self.url, collection), _entries)
+        return failed
+
+    def post_items(self, url, entries):
+        """ POST entries to the items url of a collection, returning the entries that failed """
+        if len(entries) == 1:
+            body = entries[0][2]
+        else:
+            body = b'{"type":"FeatureCollection","features":[' + b','.join(e[2] for e in entries) + b']}'
+        try:
+            self.transport.post(url, body, headers=self.headers)
+            return []
+        except TransportError as err:
+            # retryable errors were retried by the transport
+            if err.status == 409:
+                failed = []
+                for entry in entries:
+                    failed += self.put_item(url, entry)
+                return failed
+            if err.status in (400, 422) and len(entries) > 1:
+                half = len(entries) // 2
+                return self.post_items(url, entries[:half]) + self.post_items(url, entries[half:])
+            return [(entry, False, str(err)) for entry in entries]
+
+    def put_item(self, url, entry):
+        """ Replace an Item with a PUT, or POST it if it does not exist, returning the entry if it failed """
+        try:
+            self.transport.put('%s/%s' % (url, entry[0]), entry[2], headers=self.headers)
+            return []
+        except TransportError as err:
+            if err.status != 404:
+                return [(entry, False, str(err))]
+        try:
+            self.transport.post(url, entry[2], headers=self.headers)
+            return []
+        except TransportError as err:
+            return [(entry, False, str(err))]
+
+
+class ElasticsearchLoader(BulkLoader):
+    """ Load Items into Elasticsearch or OpenSearch with the _bulk API
+
+    Items are indexed by id, replacing existing documents, in index (default the collection of the
+    Item). Items rejected with a retryable status (e.g. 429 when the cluster is overloaded) are retried.
+    """
+
+    headers = {'Content-Type': 'application/x-ndjson'}
+
+    def __init__(self, url, index=None, **kwargs):
+        """ Create Elasticsearch loader
+        Arguments:
+        url -- URL of the cluster
+
+        Keyword arguments:
+        index -- Index Items are added to, default the collection of the Item
+        (other keyword arguments are those of BulkLoader)
+        """
+        super(ElasticsearchLoader, self).__init__(url, **kwargs)
+        self.index = index
+
+    def load_batch(self, entries):
+        lines = []
+        for id, collection, data in entries:
+            lines.append(dumps({'index': {'_index': self.index or collection, '_id': id}}))
+            lines.append(data)
+        resp = self.transport.post(self.url + '/_bulk', b'\n'.join(lines) + b'\n', headers=self.headers)
+        result = resp.json()
+        if not result.get('errors'):
+            return []
+        failed = []
+        for entry, action in zip(entries, result['items']):
+            status = action.get('index', {}).get('status', 200)
+            if status >= 300:
+                error = 'HTTP status %s: %s' % (status, action['index'].get('error'))
+                failed.append((entry, status in self.transport.retry_status, error))
+        return failed
+
+
+LOADERS = {
+    'stac': TransactionsLoader,
+    'elasticsearch': ElasticsearchLoader
+}
+
+
+def get_loader(url, api='stac', **kwargs):
+    """ Create a bulk loader for api ('stac' or 'elasticsearch'), keyword arguments are those of BulkLoader """
+    if api not in LOADERS:
+        raise ValueError('Unknown bulk API %s, must be one of %s' % (api, ', '.join(LOADERS)))
+    return LOADERS[api](url, **kwargs)
@@ -0,0 +1,268 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+
+import os.path as op
+
+from datetime import datetime
+from urllib.parse import urlparse
+
+from .transport import Transport, TransportError
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    version TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    digest TEXT NOT NULL,
+    partial INTEGER NOT NULL,
+    updated TEXT NOT NULL
+);
+"""
+
+FIELDS = ('version', 'etag', 'last_modified', 'digest', 'partial')
+
+
+class MetadataCache(object):
+    """ Local, content-addressed cache of raw metadata files
+
+    Contents are stored zlib compressed in path/objects, named by the SHA-256 digest of the contents
+    so identical files are stored once. An SQLite index (path/index.db) maps the key of each file
+    (bucket/key) to its digest, the version it was read at (ETag or LastModifiedDate in the inventory)
+    and the ETag and Last-Modified returned with it, used for conditional requests.
+
+    Index entries are buffered and written in transactions of batch_size entries.
+    """
+
+    def __init__(self, path, batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        os.makedirs(op.join(path, 'objects'), exist_ok=True)
+        self.db = sqlite3.connect(op.join(path, 'index.db'), check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        self.flush()
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def object_path(self, digest):
+        return op.join(self.path, 'objects', digest[:2], digest)
+
+    def lookup(self, key):
+        """ Index entry of key (dictionary of version, etag, last_modified, digest and partial), or None """
+        with self.lock:
+            row = self.pending.get(key)
+            if row is None:
+                row = self.db.execute('SELECT %s FROM entries WHERE key = ?' % ', '.join(FIELDS), (key,)).fetchone()
+        return None if row is None else dict(zip(FIELDS, row))
+
+    def read(self, digest):
+        """ Contents stored under digest, or None if they have been removed """
+        try:
+            with open(self.object_path(digest), 'rb') as f:
+                return zlib.decompress(f.read())
+        except FileNotFoundError:
+            return None
+
+    def get(self, key, version=None):
+        """ Cached contents of key, or None if not cached (or cached at a version other than version) """
+        entry = self.lookup(key)
+        if entry is None or (version is not None and entry['version'] != version):
+            return None
+        return self.read(entry['digest'])
+
+    def put(self, key, data, version=None, etag=None, last_modified=None, partial=False):
+        """ Store contents of key
+        Keyword arguments:
+        version -- Version of the file in the inventory (ETag or LastModifiedDate)
+        etag -- ETag returned with the contents
+        last_modified -- Last-Modified returned with the contents
+        partial -- Contents are only the beginning of the file
+
+        Returns:
+        Digest of the contents
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        filename = self.object_path(digest)
+        if not op.exists(filename):
+            os.makedirs(op.dirname(filename), exist_ok=True)
+            tmp = '%s.%s.%s.tmp' % (filename, os.getpid(), threading.get_ident())
+            with open(tmp, 'wb') as f:
+                f.write(zlib.compress(data))
+            os.replace(tmp, filename)
+        row = (version, etag, last_modified, digest, int(partial), datetime.utcnow().isoformat())
+        with self.lock:
+            self.pending[key] = row
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.flush()
+        return digest
+
+    def flush(self):
+        """ Write buffered index entries """
+        with self.lock:
+            if self.pending:
+                with self.db:
+                    self.db.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        [(key,) + row for key, row in self.pending.items()])
+                self.pending = {}
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def keys(self, prefix='', chunk_size=10000):
+        """ Generator returning keys of cached files beginning with prefix, in order """
+        self.flush()
+        sql, last = 'SELECT key FROM entries WHERE key >= ? ORDER BY key LIMIT ?', prefix
+        while True:
+            with self.lock:
+                keys = [row[0] for row in self.db.execute(sql, (last, chunk_size))]
+            for key in keys:
+                if not key.startswith(prefix):
+                    return
+                yield key
+            if len(keys) < chunk_size:
+                return
+            sql, last = sql.replace('>=', '>'), keys[-1]
+
+    def records(self, collection, prefix=None, suffix=None):
+        """ Generator returning inventory records (Bucket, Key and url) of the cached files of collection,
+        used to replay an archive from the cache
+        Keyword arguments:
+        prefix -- Only keys beginning with this prefix
+        suffix -- Only keys ending with this suffix
+        """
+        start = '%s/' % collection
+        for key in self.keys(start + (prefix or '')):
+            if suffix and not key.endswith(suffix):
+                continue
+            yield {'Bucket': collection, 'Key': key[len(start):], 'url': 's3://%s' % key}
+
+
+class CachingTransport(Transport):
+    """ Transport reading files through a MetadataCache
+
+    A file is read from the cache if the version expected for it (see expect) is the version it was
+    cached at, otherwise it is requested conditionally on the cached ETag and Last-Modified and only
+    downloaded if it has changed. Offline, files are only read from the cache.
+
+    Files read in chunks with iter_content (Sentinel-1 annotation) are assumed not to change once
+    written, and only the part of the file that was read is cached. If a reader needs more than the
+    cached part, the rest is read from the file (offline, TransportError is raised).
+    """
+
+    def __init__(self, cache, transport=None, aliases=None, offline=False, stats=None):
+        """ Create caching transport
+        Arguments:
+        cache -- MetadataCache
+
+        Keyword arguments:
+        transport -- Transport used to read files not in the cache
+        aliases -- Dictionary of URL prefixes to replace with a key prefix, such as the free endpoint of a
+                   bucket, so the same file is cached once. s3://bucket/key is cached as bucket/key.
+        offline -- Read files from the cache only
+        stats -- Stats counting cache hits, misses and files not modified
+        """
+        super(CachingTransport, self).__init__()
+        self.cache = cache
+        self.transport = transport or Transport()
+        self.aliases = aliases or {}
+        self.offline = offline
+        self.stats = stats
+        self.versions = {}
+
+    def incr(self, name):
+        if self.stats is not None:
+            self.stats.incr(name)
+
+    def key(self, url):
+        """ Cache key of url """
+        for prefix, replacement in self.aliases.items():
+            if url.startswith(prefix):
+                return replacement + url[len(prefix):]
+        if urlparse(url).scheme == 's3':
+            return url[5:]
+        return url
+
+    def expect(self, url, version):
+        """ Set the version (ETag or LastModifiedDate in the inventory) expected by the next read of url """
+        if version is not None:
+            self.versions[self.key(url)] = version
+
+    def get(self, url):
+        key = self.key(url)
+        version = self.versions.pop(key, None)
+        entry = self.cache.lookup(key)
+        if entry is not None and entry['partial']:
+            entry = None
+        if entry is not None and (self.offline or (version is not None and entry['version'] == version)):
+            data = self.cache.read(entry['digest'])
+            if data is not None:
+                self.incr('cache_hits')
+                return data
+            entry = None
+        if self.offline:
+            raise TransportError(url, 'Not in cache', status=404)
+        etag, last_modified = (None, None) if entry is None else (entry['etag'], entry['last_modified'])
+        data, etag, last_modified = self.transport.get_conditional(url, etag=etag, last_modified=last_modified)
+        if data is None:
+            data = self.cache.read(entry['digest'])
+            self.incr('cache_not_modified')
+        else:
+            self.incr('cache_misses')
+        self.cache.put(key, data, version=version, etag=etag, last_modified=last_modified)
+        return data
+
+    def get_conditional(self, url, etag=None, last_modified=None):
+        return self.get(url), None, None
+
+    def iter_content(self, url, chunk_size=65536):
+        key = self.key(url)
+        entry = self.cache.lookup(key)
+        data = None if entry is None else self.cache.read(entry['digest'])
+        if data is not None:
+            self.incr('cache_misses' if entry['partial'] else 'cache_hits')
+            for i in range(0, len(data), chunk_size):
+                yield data[i:i + chunk_size]
+            if not entry['partial']:
+                return
+            # the reader needs more than the part of the file that was cached
+            if self.offline:
+                raise TransportError(url, 'Only the first %s bytes are in the cache' % len(data), status=404)
+        elif self.offline:
+            raise TransportError(url, 'Not in cache', status=404)
+        else:
+            self.incr('cache_misses')
+        # bytes already returned from the cache
+        cached = 0 if data is None else len(data)
+        chunks = []
+        size = 0
+        try:
+            for chunk in self.transport.iter_content(url, chunk_size=chunk_size):
+                chunks.append(chunk)
+                start = max(0, cached - size)
+                size += len(chunk)
+                if start < len(chunk):
+                    yield chunk[start:]
+        except GeneratorExit:
+            # closed by the reader, which has all it needs from the file
+            if size > cached:
+                self.cache.put(key, b''.join(chunks), partial=True)
+            raise
+        self.cache.put(key, b''.join(chunks))
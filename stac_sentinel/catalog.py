@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+import threading
+
+import os.path as op
+
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+from .encoding import dumps
+from .sentinel import SentinelSTAC
+from .sinks import Sink
+
+logger = logging.getLogger(__name__)
+
+
+def shard_path(item):
+    """ Catalog path (list of names) of an Item below its collection:
+    utm_zone/latitude_band/grid_square/year for Sentinel-2, year/month/day for Sentinel-1
+    """
+    props = item['properties']
+    dt = props['datetime']
+    if 'sentinel:grid_square' in props:
+        return [str(props['sentinel:utm_zone']), props['sentinel:latitude_band'], props['sentinel:grid_square'],
+                dt[0:4]]
+    return [dt[0:4], dt[5:7], dt[8:10]]
+
+
+def relative(path, start):
+    """ Relative href from the directory start to path (both tuples of names from the catalog root) """
+    i = 0
+    while i < min(len(path), len(start)) and path[i] == start[i]:
+        i += 1
+    return '/'.join(['..'] * (len(start) - i) + list(path[i:]))
+
+
+class CatalogWriter(Sink):
+    """ Write Items to a static STAC catalog
+
+        root/catalog.json
+        root/<collection>/collection.json
+        root/<collection>/<shard>/.../catalog.json (see shard_path)
+        root/<collection>/<shard>/.../<id>.json
+
+    Items are written by a pool of threads, with relative root, parent and collection links. Catalogs
+    and Collections, with links to their children and Items, are written by flush(), which is called
+    every batch_size Items and when the writer is closed. Links are added to those of existing
+    catalogs, so a catalog can be updated by later runs.
+    """
+
+    def __init__(self, root, id='sentinel-stac', description='Sentinel STAC catalog', workers=8,
+                 max_in_flight=None, batch_size=10000):
+        """ Create catalog writer
+        Arguments:
+        root -- Directory of the catalog
+
+        Keyword arguments:
+        id -- ID of the root catalog
+        description -- Description of the root catalog
+        workers -- Number of threads writing files
+        max_in_flight -- Maximum number of files queued or being written (default 100 * workers)
+        batch_size -- Number of Items written between updates of the catalogs
+        """
+        self.root = root
+        self.id = id
+        self.description = description
+        self.workers = workers
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(workers)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight or 100 * workers)
+        self.lock = threading.Lock()
+        self.futures = set()
+        self.errors = []
+        self.dirs = set()
+        # children of each catalog and Items of each leaf catalog, by path from the root, added since
+        # the catalogs were last written
+        self.children = {}
+        self.items = {}
+        self.count = 0
+        # (path, id) of Items that could not be written, and ids not yet returned by pop_failed
+        self.unwritten = []
+        self.failed = []
+
+    def filename(self, path, name):
+        return op.join(self.root, *(list(path) + [name]))
+
+    def makedirs(self, path):
+        # directories are created once, from the writing threads
+        if path not in self.dirs:
+            os.makedirs(op.join(self.root, *path), exist_ok=True)
+            self.dirs.add(path)
+
+    def submit(self, path, item):
+        self.in_flight.acquire()
+        future = self.executor.submit(self._write, path, item)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(lambda f: self._done(f, item['id']))
+
+    def _done(self, future, id):
+        with self.lock:
+            self.futures.discard(future)
+        self.in_flight.release()
+        if future.exception() is not None:
+            logger.error('Error writing Item %s: %s' % (id, future.exception()))
+            with self.lock:
+                self.errors.append(future.exception())
+
+    def _write(self, path, item):
+        try:
+            self._write_item(path, item)
+        except Exception:
+            # recorded before the future completes, as flush may not wait for the done callbacks
+            with self.lock:
+                self.unwritten.append((path, item['id']))
+            raise
+
+    def write(self, item, data=None):
+        """ Add an Item to the catalog, links are added so data (the encoded Item) is not used """
+        path = (item['collection'],) + tuple(shard_path(item))
+        for i in range(len(path)):
+            self.children.setdefault(path[:i], set()).add(path[i])
+        self.items.setdefault(path, set()).add(item['id'])
+        self.submit(path, item)
+        self.count += 1
+        if self.count % self.batch_size == 0:
+            self.flush()
+
+    def _write_item(self, path, item):
+        item = dict(item)
+        item['links'] = [link for link in item.get('links', [])
+                         if link['rel'] not in ('collection', 'root', 'parent')]
+        item['links'] += [
+            {'rel': 'root', 'href': relative(('catalog.json',), path), 'type': 'application/json'},
+            {'rel': 'parent', 'href': 'catalog.json', 'type': 'application/json'},
+            {'rel': 'collection', 'href': relative((path[0], 'collection.json'), path), 'type': 'application/json'}
+        ]
+        self.makedirs(path)
+        with open(self.filename(path, '%s.json' % item['id']), 'wb') as f:
+            f.write(dumps(item))
+
+    def flush(self):
+        """ Wait for the Items submitted to be written, then add links to them to the catalogs """
+        with self.lock:
+            futures = list(self.futures)
+        wait_futures(futures)
+        with self.lock:
+            unwritten, self.unwritten = self.unwritten, []
+        children, items = self.children, self.items
+        self.children, self.items = {}, {}
+        for path, id in unwritten:
+            # not linked, and reported by pop_failed
+            items[path].discard(id)
+            self.failed.append(id)
+        paths = set(children.keys()) | set(items.keys())
+        if not paths:
+            return
+        futures = {self.executor.submit(self._write_catalog, p, children, items): p for p in paths}
+        for future, path in futures.items():
+            err = future.exception()
+            if err is not None:
+                logger.error('Error writing catalog %s: %s' % ('/'.join(path), err))
+                self.errors.append(err)
+                # Items of a leaf catalog that could not be written are not linked
+                self.failed += list(items.get(path, []))
+        logger.info('Wrote %s catalogs with links to %s Items to %s' % (
+            len(paths), sum(len(v) for v in items.values()), self.root))
+
+    def pop_failed(self):
+        failed, self.failed = self.failed, []
+        return failed
+
+    def close(self):
+        """ Write the remaining Items and the catalogs """
+        self.flush()
+        self.executor.shutdown(wait=True)
+
+    def get_catalog(self, path):
+        """ New catalog (or Collection) at path """
+        if len(path) == 0:
+            return {'stac_version': SentinelSTAC.stac_version, 'id': self.id, 'description': self.description,
+                    'links': []}
+        if len(path) == 1:
+            catalog = SentinelSTAC(path[0], {}).get_collection()
+            catalog['links'] = [link for link in catalog.get('links', [])
+                                if link['rel'] not in ('root', 'parent', 'child', 'item')]
+            return catalog
+        return {
+            'stac_version': SentinelSTAC.stac_version,
+            'id': '-'.join(path),
+            'description': '%s %s' % (path[0], '/'.join(path[1:])),
+            'links': []
+        }
+
+    def _write_catalog(self, path, children, items):
+        name = 'collection.json' if len(path) == 1 else 'catalog.json'
+        filename = self.filename(path, name)
+        if op.exists(filename):
+            with open(filename) as f:
+                catalog = json.loads(f.read())
+        else:
+            catalog = self.get_catalog(path)
+        links = [link for link in catalog['links'] if link['rel'] not in ('root', 'parent')]
+        hrefs = set(link['href'] for link in links)
+        for child in sorted(children.get(path, [])):
+            href = '%s/%s' % (child, 'collection.json' if len(path) == 0 else 'catalog.json')
+            if href not in hrefs:
+                links.append({'rel': 'child', 'href': href, 'type': 'application/json'})
+        for id in sorted(items.get(path, [])):
+            href = '%s.json' % id
+            if href not in hrefs:
+                links.append({'rel': 'item', 'href': href, 'type': 'application/json'})
+        if len(path) > 0:
+            parent = 'collection.json' if len(path) == 2 else 'catalog.json'
+            links = [
+                {'rel': 'root', 'href': relative(('catalog.json',), path), 'type': 'application/json'},
+                {'rel': 'parent', 'href': '../%s' % parent, 'type': 'application/json'}
+            ] + links
+        else:
+            links = [{'rel': 'root', 'href': 'catalog.json', 'type': 'application/json'}] + links
+        catalog['links'] = links
+        self.makedirs(path)
+        tmp = '%s.%s.tmp' % (filename, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(json.dumps(catalog, indent=2))
+        os.replace(tmp, filename)
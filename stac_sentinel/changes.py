@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    updated TEXT NOT NULL
+);
+"""
+
+
+def content_hash(data):
+    """ Hash of an Item encoded as JSON bytes (see encoding.dumps) """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ChangeStore(object):
+    """ SQLite store of the content hash of each Item id, used to find Items that are new or have changed
+
+    Items are encoded deterministically, so an Item created again from the same metadata has the same
+    hash (with the same JSON backend, see encoding). Hashes are buffered and written in transactions of
+    batch_size Items.
+    """
+
+    NEW = 'new'
+    UPDATED = 'updated'
+
+    def __init__(self, filename, batch_size=1000):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        self.flush()
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+    def get(self, ids, chunk_size=500):
+        """ Get stored hash of each of ids """
+        hashes = {}
+        missing = []
+        with self.lock:
+            for id in ids:
+                if id in self.pending:
+                    hashes[id] = self.pending[id][0]
+                else:
+                    missing.append(id)
+            for i in range(0, len(missing), chunk_size):
+                chunk = missing[i:i + chunk_size]
+                sql = 'SELECT id, hash FROM items WHERE id IN (%s)' % ','.join('?' * len(chunk))
+                hashes.update(self.db.execute(sql, chunk))
+        return hashes
+
+    def changes(self, hashes):
+        """ Compare Items with the store, recording the hashes of new and changed Items
+        Arguments:
+        hashes -- List of (id, hash) of Items
+
+        Returns:
+        List of the change of each Item: NEW, UPDATED, or None if unchanged
+        """
+        stored = self.get([id for id, h in hashes])
+        now = datetime.utcnow().isoformat()
+        result = []
+        for id, h in hashes:
+            old = stored.get(id)
+            if old == h:
+                result.append(None)
+                continue
+            result.append(self.NEW if old is None else self.UPDATED)
+            stored[id] = h
+            with self.lock:
+                self.pending[id] = (h, now)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return result
+
+    def change(self, item, data):
+        """ Compare an Item, encoded as JSON bytes, with the store, see changes """
+        return self.changes([(item['id'], content_hash(data))])[0]
+
+    def forget(self, ids):
+        """ Remove Items, for instance ones that could not be published, so they are new again """
+        ids = list(ids)
+        with self.lock:
+            for id in ids:
+                self.pending.pop(id, None)
+            with self.db:
+                self.db.executemany('DELETE FROM items WHERE id = ?', [(id,) for id in ids])
+
+    def flush(self):
+        """ Write buffered hashes """
+        with self.lock:
+            if self.pending:
+                with self.db:
+                    self.db.executemany('INSERT OR REPLACE INTO items VALUES (?, ?, ?)',
+                                        [(id,) + row for id, row in self.pending.items()])
+                self.pending = {}
+
+    def close(self):
+        self.flush()
+        self.db.close()
@@ -1,14 +1,20 @@
 import argparse
-import boto3
+import json
 import logging
 import sys
 
 from datetime import datetime
-from dateutil.parser import parse as dateparse
-from json import dumps
-from os import makedirs, path as op
-from .sentinel import SentinelSTAC
+from .bulk import get_loader
+from .catalog import CatalogWriter
+from .changes import ChangeStore
+from .encoding import dumps
+from .index import ItemIndex
+from .sentinel import SentinelSTAC, parse_datetime
+from .publish import SNSPublisher
+from .sinks import FileSink, NDJSONSink, GeoParquetSink
+from .validate import ValidationSink
 from .version import __version__
+from .worker import SQSQueue, Worker
 
 logger = logging.getLogger(__name__)
 
@@ -29,11 +35,47 @@ def parse_args(args):
     parser.add_argument('--prefix', help='Only ingest scenes with a path starting with prefix', default=None)
     parser.add_argument('--start_date', help='Only ingest scenes with a Last Modified Date past provided start date', default=None)
     parser.add_argument('--end_date', help='Only ingest scenes with a Last Modified Date before provided end date', default=None)
+    parser.add_argument('--inventory', help='Inventory location (s3:// URL or local directory), default is the AWS inventory', default=None)
+    parser.add_argument('--inventory_workers', help='Number of inventory files read concurrently', default=4, type=int)
     parser.add_argument('--direct_from_s3', help='Get metadata direct from s3 instead of free endpoint', default=False, action='store_true')
 
+    # concurrency
+    parser.add_argument('--fetch_workers', help='Number of threads fetching metadata', default=8, type=int)
+    parser.add_argument('--transform_workers', help='Number of workers converting metadata to STAC', default=1, type=int)
+    parser.add_argument('--processes', help='Convert metadata in processes rather than threads', default=False, action='store_true')
+    parser.add_argument('--unordered', help='Output Items as completed rather than in inventory order', default=False, action='store_true')
+
+    # sharding
+    parser.add_argument('--shard_index', help='Only process keys in this shard (0 to shard_count - 1)', default=0, type=int)
+    parser.add_argument('--shard_count', help='Number of shards to split keys into', default=1, type=int)
+    parser.add_argument('--shard_by', help='Split keys by hash of key, or by grid square (S2) / date (S1)', default='hash', choices=['hash', 'grid'])
+
+    # incremental runs
+    parser.add_argument('--state', help='SQLite file recording the outcome for each inventory key', default=None)
+    parser.add_argument('--resume', help='Skip keys already processed in state', default=False, action='store_true')
+    parser.add_argument('--delta', help='Only process keys new or changed since they were converted in state', default=False, action='store_true')
+    parser.add_argument('--retry_failed', help='Only process keys that failed in state', default=False, action='store_true')
+    parser.add_argument('--cache', help='Cache raw metadata in this folder, files unchanged in the inventory are not fetched again', default=None)
+    parser.add_argument('--replay', help='Create Items from the metadata in cache only, without fetching anything', default=False, action='store_true')
+
     # output control
     parser.add_argument('--save', help='Save fetch Items as <id>.json files to this folder', default=None)
+    parser.add_argument('--ndjson', help='Save Items to rolling, gzipped NDJSON files in this folder', default=None)
+    parser.add_argument('--ndjson_max_items', help='Maximum number of Items per NDJSON file', default=100000, type=int)
+    parser.add_argument('--index', help='Add Items to this SQLite index, see the query command', default=None)
+    parser.add_argument('--parquet', help='Save a summary of Items to this GeoParquet file (requires pyarrow)', default=None)
+    parser.add_argument('--catalog', help='Add Items to a static STAC catalog in this folder', default=None)
+    parser.add_argument('--validate', help='Validate this fraction of Items (0 to 1) against the STAC schemas', default=None, type=float)
+    parser.add_argument('--validate_workers', help='Number of processes validating Items (0 to validate in the main process)', default=2, type=int)
+    parser.add_argument('--bulk', help='Load Items to this STAC API (Transactions extension) or Elasticsearch URL', default=None)
+    parser.add_argument('--bulk_api', help='API of the --bulk URL', default='stac', choices=['stac', 'elasticsearch'])
+    parser.add_argument('--bulk_batch_size', help='Number of Items per bulk request', default=500, type=int)
     parser.add_argument('--publish', help='SNS to publish new Items to', default=None)
+    parser.add_argument('--changes', help='SQLite file of Item content hashes, unchanged Items are not saved or published', default=None)
+
+    # instrumentation
+    parser.add_argument('--stats', help='Write statistics to this file (Prometheus text format if it ends in .prom, otherwise JSON)', default=None)
+    parser.add_argument('--stats_interval', help='Seconds between logged summaries of throughput and stage timings', default=60, type=float)
 
     # turn Namespace into dictinary
     parsed_args = vars(parser.parse_args(args))
@@ -41,34 +83,200 @@ def parse_args(args):
     # convert date fields to dates
     for d in ['start_date', 'end_date']:
         if parsed_args[d]:
-            parsed_args[d] = dateparse(parsed_args[d]).date()
+            parsed_args[d] = parse_datetime(parsed_args[d]).date()
+    return parsed_args
+
+
+def parse_query_args(args):
+    desc = 'stac-sentinel query (v%s): find Items in an index created with --index' % __version__
+    dhf = argparse.ArgumentDefaultsHelpFormatter
+    parser = argparse.ArgumentParser(prog='stac-sentinel query', description=desc, formatter_class=dhf)
+    parser.add_argument('index', help='SQLite index file')
+    parser.add_argument('--bbox', help='Only Items intersecting bounding box xmin,ymin,xmax,ymax', default=None)
+    parser.add_argument('--datetime', help='Only Items in this datetime or interval (start/end, .. for open end)', default=None)
+    parser.add_argument('--collection', help='Only Items of this collection', default=None)
+    parser.add_argument('--max_cloud_cover', help='Only Items with cloud cover at or below this percentage', default=None, type=float)
+    parser.add_argument('--grid_square', help='Only Items of this Sentinel-2 grid square (e.g. 57UVB)', default=None)
+    parser.add_argument('--limit', help='Maximum number of Items', default=None, type=int)
+    parser.add_argument('--ids', help='Only print Item IDs', default=False, action='store_true')
+    parsed_args = vars(parser.parse_args(args))
+    if parsed_args['bbox']:
+        bbox = [float(v) for v in parsed_args['bbox'].split(',')]
+        if len(bbox) != 4:
+            parser.error('bbox must be xmin,ymin,xmax,ymax')
+        parsed_args['bbox'] = bbox
     return parsed_args
 
 
+def parse_worker_args(args):
+    desc = 'stac-sentinel worker (v%s): convert new scene notifications read from an SQS queue' % __version__
+    dhf = argparse.ArgumentDefaultsHelpFormatter
+    parser = argparse.ArgumentParser(prog='stac-sentinel worker', description=desc, formatter_class=dhf)
+    parser.add_argument('queue', help='SQS queue URL of new scene notifications')
+    parser.add_argument('--log', default=2, type=int,
+                        help='0:all, 1:debug, 2:info, 3:warning, 4:error, 5:critical')
+    parser.add_argument('--batch_size', help='Maximum number of messages processed together', default=10, type=int)
+    parser.add_argument('--fetch_workers', help='Number of threads fetching metadata', default=16, type=int)
+    parser.add_argument('--wait_time', help='Seconds to wait for messages (long polling, up to 20)', default=20, type=int)
+    parser.add_argument('--visibility_timeout', help='Seconds received messages are hidden from other receivers', default=None, type=int)
+    parser.add_argument('--save', help='Save fetch Items as <id>.json files to this folder', default=None)
+    parser.add_argument('--ndjson', help='Save Items to rolling, gzipped NDJSON files in this folder', default=None)
+    parser.add_argument('--ndjson_max_items', help='Maximum number of Items per NDJSON file', default=100000, type=int)
+    parser.add_argument('--index', help='Add Items to this SQLite index, see the query command', default=None)
+    parser.add_argument('--parquet', help='Save a summary of Items to this GeoParquet file (requires pyarrow)', default=None)
+    parser.add_argument('--catalog', help='Add Items to a static STAC catalog in this folder', default=None)
+    parser.add_argument('--validate', help='Validate this fraction of Items (0 to 1) against the STAC schemas', default=None, type=float)
+    parser.add_argument('--validate_workers', help='Number of processes validating Items (0 to validate in the main process)', default=2, type=int)
+    parser.add_argument('--bulk', help='Load Items to this STAC API (Transactions extension) or Elasticsearch URL', default=None)
+    parser.add_argument('--bulk_api', help='API of the --bulk URL', default='stac', choices=['stac', 'elasticsearch'])
+    parser.add_argument('--bulk_batch_size', help='Number of Items per bulk request', default=500, type=int)
+    parser.add_argument('--publish', help='SNS to publish new Items to, or COLLECTION=SNS for each collection', default=[], nargs='*')
+    parser.add_argument('--changes', help='SQLite file of Item content hashes, unchanged Items are not saved or published', default=None)
+    parser.add_argument('--stats', help='Write statistics to this file (Prometheus text format if it ends in .prom, otherwise JSON)', default=None)
+    parser.add_argument('--stats_interval', help='Seconds between logged summaries of throughput and stage timings', default=60, type=float)
+    return vars(parser.parse_args(args))
+
+
+def get_sinks(args):
+    """ Create the Sinks given by output arguments, removing them from args """
+    sinks = []
+    savepath = args.pop('save')
+    if savepath is not None:
+        sinks.append(FileSink(savepath))
+    ndjson, ndjson_max_items = args.pop('ndjson'), args.pop('ndjson_max_items')
+    if ndjson is not None:
+        sinks.append(NDJSONSink(ndjson, max_items=ndjson_max_items))
+    parquet = args.pop('parquet')
+    if parquet is not None:
+        sinks.append(GeoParquetSink(parquet))
+    index = args.pop('index')
+    if index is not None:
+        sinks.append(ItemIndex(index))
+    catalog = args.pop('catalog')
+    if catalog is not None:
+        sinks.append(CatalogWriter(catalog))
+    validate, validate_workers = args.pop('validate'), args.pop('validate_workers')
+    if validate is not None:
+        sinks.append(ValidationSink(rate=validate, workers=validate_workers))
+    bulk, bulk_api, bulk_batch_size = args.pop('bulk'), args.pop('bulk_api'), args.pop('bulk_batch_size')
+    if bulk is not None:
+        sinks.append(get_loader(bulk, api=bulk_api, batch_size=bulk_batch_size))
+    return sinks
+
+
+def worker(argv):
+    """ Convert new scene notifications from an SQS queue until stopped (SIGTERM or SIGINT) """
+    args = parse_worker_args(argv)
+    logging.basicConfig(stream=sys.stdout,
+                        level=args.pop('log') * 10,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    stats = SentinelSTAC.stats
+    stats.filename, stats.interval = args.pop('stats'), args.pop('stats_interval')
+    publishers = {}
+    for topic in args.pop('publish'):
+        collection, topic = topic.split('=', 1) if '=' in topic else (None, topic)
+        publishers[collection] = SNSPublisher(topic)
+    queue = SQSQueue(args['queue'], wait_time=args['wait_time'], visibility_timeout=args['visibility_timeout'])
+    changes = None if args['changes'] is None else ChangeStore(args['changes'])
+    Worker(queue, sinks=get_sinks(args), publishers=publishers, changes=changes, batch_size=args['batch_size'],
+           workers=args['fetch_workers']).run()
+
+
+def query(argv):
+    """ Print Items in an index matching the query, one JSON object per line """
+    args = parse_query_args(argv)
+    ids = args.pop('ids')
+    index = ItemIndex(args.pop('index'))
+    try:
+        for row in index.query(**args):
+            print(row['id'] if ids else dumps(row).decode('utf-8'))
+    finally:
+        index.close()
+
+
 def cli():
+    # subcommands, otherwise ingest a collection
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        return COMMANDS[sys.argv[1]](sys.argv[2:])
+
     args = parse_args(sys.argv[1:])
     logging.basicConfig(stream=sys.stdout,
                         level=args.pop('log') * 10,
                         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+    stats = SentinelSTAC.stats
+    stats.filename, stats.interval = args.pop('stats'), args.pop('stats_interval')
+
     publish = args.pop('publish', None)
+    publisher = None if publish is None else SNSPublisher(publish)
+    args['ordered'] = not args.pop('unordered')
+    changes = args.pop('changes')
+    changes = None if changes is None else ChangeStore(changes)
 
     collection_id = args.pop('collection')
-    savepath = args.pop('save')
-    if savepath is not None:
-        makedirs(savepath, exist_ok=True)
-    for item in SentinelSTAC.get_aws_archive(collection_id, **args):
-        # save items as JSON files
-        if savepath:
-            fname = op.join(savepath, '%s.json' % item['id'])
-            with open(fname, 'w') as f:
-                f.write(dumps(item))
-        # publish to SNS
-        if publish:
-            client = boto3.client('sns', region_name=publish.split(':')[3])
-            client.publish(TopicArn=publish, Message=dumps(item))
-        #if i > 5:
-        #    break
+    sinks = get_sinks(args)
+    try:
+        for item in SentinelSTAC.get_aws_archive(collection_id, **args):
+            # encode once for all outputs
+            data = None
+            if sinks or publisher or changes:
+                with stats.timer('encode'):
+                    data = dumps(item)
+            # skip unchanged items
+            change = None
+            if changes is not None:
+                with stats.timer('changes'):
+                    change = changes.change(item, data)
+                if change is None:
+                    stats.incr('unchanged')
+                    continue
+                stats.incr(change)
+            # save items
+            try:
+                for sink in sinks:
+                    with stats.timer('write'):
+                        sink.write(item, data=data)
+            except Exception:
+                if changes is not None:
+                    changes.forget([item['id']])
+                raise
+            # publish to SNS
+            if publisher:
+                with stats.timer('publish'):
+                    publisher.publish(item, data=data, change=change)
+    finally:
+        # ids of Items that could not be output, every output is closed even if another one fails
+        unwritten = set()
+        for sink in sinks:
+            try:
+                with stats.timer('write'):
+                    sink.close()
+            except Exception:
+                logger.exception('Error closing %s' % type(sink).__name__)
+            unwritten.update(sink.pop_failed())
+        if publisher:
+            try:
+                with stats.timer('publish'):
+                    publisher.close()
+            except Exception:
+                logger.exception('Error closing publisher to %s' % publisher.topic_arn)
+            stats.incr('published', publisher.published)
+        if changes is not None:
+            try:
+                if publisher:
+                    unwritten.update(json.loads(entry['Message'])['id'] for entry, code in publisher.failed)
+                if unwritten:
+                    # output again by the next run
+                    changes.forget(unwritten)
+            finally:
+                changes.close()
+        stats.report(force=True)
+
+
+COMMANDS = {
+    'query': query,
+    'worker': worker
+}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# backend used by dumps, None to use orjson if it is installed
+BACKEND = None
+
+_encoders = {}
+
+
+def _json_dumps(obj):
+    # compact and not ASCII escaped, the same output as orjson except for floats below 1e-4 or from
+    # 1e16, which are the same values written in a different exponent notation
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def get_encoder(backend=None):
+    """ Get function encoding an object to JSON bytes
+    Keyword arguments:
+    backend -- 'json' (standard library) or 'orjson', default is BACKEND or orjson if installed
+    """
+    backend = backend or BACKEND
+    encoder = _encoders.get(backend)
+    if encoder is not None:
+        return encoder
+    if backend in (None, 'orjson'):
+        try:
+            import orjson
+            encoder = orjson.dumps
+        except ImportError:
+            if backend == 'orjson':
+                raise ImportError('orjson backend requires orjson, install with `pip install orjson`')
+            encoder = _json_dumps
+    elif backend == 'json':
+        encoder = _json_dumps
+    else:
+        raise ValueError('Unknown JSON backend %s' % backend)
+    _encoders[backend] = encoder
+    return encoder
+
+
+def dumps(obj):
+    """ Encode object (such as a STAC Item) as compact JSON bytes """
+    return get_encoder()(obj)
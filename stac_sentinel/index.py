@@ -0,0 +1,182 @@
+import logging
+import sqlite3
+import threading
+
+from datetime import timedelta, timezone
+
+from .sentinel import parse_datetime
+from .sinks import Sink
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT NOT NULL UNIQUE,
+    collection TEXT NOT NULL,
+    datetime TEXT NOT NULL,
+    xmin REAL, ymin REAL, xmax REAL, ymax REAL,
+    cloud_cover REAL,
+    grid_square TEXT,
+    orbit_state TEXT,
+    relative_orbit INTEGER
+);
+CREATE INDEX IF NOT EXISTS items_datetime ON items (datetime);
+CREATE INDEX IF NOT EXISTS items_grid_square ON items (grid_square);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_rtree USING rtree(id, xmin, xmax, ymin, ymax);
+"""
+
+FIELDS = ('id', 'collection', 'datetime', 'xmin', 'ymin', 'xmax', 'ymax', 'cloud_cover', 'grid_square',
+          'orbit_state', 'relative_orbit')
+
+
+def format_datetime(dt):
+    """ Format datetime as UTC ISO 8601 string, as stored in the index """
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def parse_interval(value):
+    """ Parse a datetime or interval (start/end, with .. for an open end) as used by STAC APIs
+    Returns:
+    Tuple of (start, end) strings, end exclusive, either can be None
+    """
+    parts = value.split('/')
+    if len(parts) == 1:
+        parts = parts * 2
+    if len(parts) != 2:
+        raise ValueError('Invalid datetime interval %s' % value)
+    bounds = []
+    for i, part in enumerate(parts):
+        if part in ('', '..'):
+            bounds.append(None)
+            continue
+        dt = parse_datetime(part)
+        if i == 1:
+            # a date includes the whole day
+            dt += timedelta(days=1) if len(part) == 10 else timedelta(microseconds=1)
+        bounds.append(format_datetime(dt))
+    return tuple(bounds)
+
+
+class ItemIndex(Sink):
+    """ SQLite index of STAC Items: id, bbox (in an R-tree), datetime, cloud cover, grid square (Sentinel-2)
+    and orbit (Sentinel-1), used to query Items by area and time, or to check which Items exist
+
+    Items are buffered and written in transactions of batch_size Items.
+    """
+
+    def __init__(self, filename, batch_size=1000):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.pending = []
+
+    def __contains__(self, id):
+        return bool(self.contains([id]))
+
+    def __len__(self):
+        self.flush()
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+    @classmethod
+    def to_row(cls, item):
+        """ Index fields of an Item """
+        props = item['properties']
+        grid_square = None
+        if 'sentinel:grid_square' in props:
+            grid_square = '%s%s%s' % (props['sentinel:utm_zone'], props['sentinel:latitude_band'],
+                                      props['sentinel:grid_square'])
+        bbox = item['bbox']
+        return (item['id'], item['collection'], format_datetime(parse_datetime(props['datetime'])),
+                bbox[0], bbox[1], bbox[2], bbox[3], props.get('eo:cloud_cover'), grid_square,
+                props.get('sat:orbit_state'), props.get('sat:relative_orbit'))
+
+    def write(self, item, data=None):
+        """ Add (or replace) an Item in the index """
+        self.pending.append(self.to_row(item))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ Write buffered Items """
+        with self.lock:
+            if not self.pending:
+                return
+            # an Item written more than once in a batch (e.g. a notification delivered twice) is
+            # indexed once, with its last row
+            rows = list(dict((row[0], row) for row in self.pending).values())
+            ids = [(row[0],) for row in rows]
+            with self.db:
+                self.db.executemany('DELETE FROM items_rtree WHERE id = (SELECT rowid FROM items WHERE id = ?)', ids)
+                self.db.executemany('INSERT OR REPLACE INTO items (%s) VALUES (%s)' % (
+                    ', '.join(FIELDS), ', '.join('?' * len(FIELDS))), rows)
+                self.db.executemany('INSERT INTO items_rtree SELECT rowid, xmin, xmax, ymin, ymax FROM items '
+                                    'WHERE id = ?', ids)
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def contains(self, ids, chunk_size=500):
+        """ Get the set of ids that are in the index """
+        self.flush()
+        ids = list(ids)
+        found = set()
+        with self.lock:
+            for i in range(0, len(ids), chunk_size):
+                chunk = ids[i:i + chunk_size]
+                sql = 'SELECT id FROM items WHERE id IN (%s)' % ','.join('?' * len(chunk))
+                found.update(row[0] for row in self.db.execute(sql, chunk))
+        return found
+
+    def query(self, bbox=None, datetime=None, collection=None, max_cloud_cover=None, grid_square=None,
+              limit=None):
+        """ Find Items in the index, ordered by datetime
+        Keyword arguments:
+        bbox -- Only Items intersecting [xmin, ymin, xmax, ymax]
+        datetime -- Only Items with a datetime in this interval (see parse_interval), or (start, end) tuple
+        collection -- Only Items of this collection
+        max_cloud_cover -- Only Items with cloud cover at or below this percentage
+        grid_square -- Only Items of this Sentinel-2 grid square (e.g. 57UVB)
+        limit -- Maximum number of Items returned
+
+        Returns:
+        List of dictionaries of the index fields
+        """
+        self.flush()
+        sql = 'SELECT %s FROM items' % ', '.join('items.%s' % f for f in FIELDS)
+        where, params = [], []
+        if bbox is not None:
+            # the R-tree stores bounds as 32 bit floats, so candidates are checked against the exact bbox
+            sql += ' JOIN items_rtree ON items_rtree.id = items.rowid'
+            for table in ['items_rtree', 'items']:
+                where += ['%s.xmax >= ?' % table, '%s.xmin <= ?' % table, '%s.ymax >= ?' % table,
+                          '%s.ymin <= ?' % table]
+                params += [bbox[0], bbox[2], bbox[1], bbox[3]]
+        if datetime is not None:
+            start, end = parse_interval(datetime) if isinstance(datetime, str) else datetime
+            # with a bbox the R-tree is more selective, unary + stops SQLite using the datetime index instead
+            column = '+items.datetime' if bbox is not None else 'items.datetime'
+            if start is not None:
+                where.append('%s >= ?' % column)
+                params.append(start)
+            if end is not None:
+                where.append('%s < ?' % column)
+                params.append(end)
+        for field, op, value in [('collection', '=', collection), ('cloud_cover', '<=', max_cloud_cover),
+                                 ('grid_square', '=', grid_square)]:
+            if value is not None:
+                where.append('items.%s %s ?' % (field, op))
+                params.append(value)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY items.datetime'
+        if limit is not None:
+            sql += ' LIMIT %d' % int(limit)
+        with self.lock:
+            return [dict(zip(FIELDS, row)) for row in self.db.execute(sql, params)]
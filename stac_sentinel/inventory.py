@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import zlib
+
+import os.path as op
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from .transport import Transport
+
+logger = logging.getLogger(__name__)
+
+
+def inventory_url(collection):
+    """ URL of the S3 inventory for a Sentinel collection on AWS """
+    return 's3://sentinel-inventory/%s/%s-inventory' % (collection, collection)
+
+
+def shard_key(key, by='hash'):
+    """ Part of an inventory key used to assign it to a shard
+    by -- 'hash' to use the whole key, or 'grid' to keep keys of the same Sentinel-2 grid square
+          (tiles/<zone>/<band>/<square>) or Sentinel-1 product type and date (<type>/<y>/<m>/<d>) together
+    """
+    if by == 'hash':
+        return key
+    elif by == 'grid':
+        return '/'.join(key.split('/', 4)[0:4])
+    raise ValueError('Unknown shard method %s' % by)
+
+
+def in_shard(key, index, count, by='hash'):
+    """ Check if key belongs to shard index of count, using a stable hash so all processes agree """
+    return zlib.crc32(shard_key(key, by).encode()) % count == index
+
+
+def latest_inventory(url, transport=None, workers=4, stats=None, **kwargs):
+    """ Generator returning records from the latest inventory at url, see Inventory.records """
+    return Inventory(url, transport=transport, workers=workers, stats=stats).records(**kwargs)
+
+
+class Inventory(object):
+    """ Reader of an S3 inventory (CSV format), on S3 or mirrored to a local directory
+
+    Inventory files are read concurrently, while records are returned in the order of the
+    manifest. Filters are applied to each line before it is parsed into a record.
+    """
+
+    def __init__(self, url, transport=None, workers=4, manifest_age_days=2, stats=None):
+        """ Create inventory reader
+        Arguments:
+        url -- s3://bucket/prefix of the inventory, or a local directory containing manifest.json
+               (directly or in dated subdirectories) and the data files
+
+        Keyword arguments:
+        transport -- Transport used to read files on S3
+        workers -- Number of inventory files read at the same time
+        manifest_age_days -- Number of days to look back for the latest manifest on S3
+        stats -- Stats recording the time to read each file and the number of records
+        """
+        self.url = url
+        self.transport = transport or Transport()
+        self.workers = max(1, workers)
+        self.manifest_age_days = manifest_age_days
+        self.stats = stats
+        self.local = not url.startswith('s3://')
+        self._manifest = None
+
+    @property
+    def manifest(self):
+        """ Latest inventory manifest, None if there is no inventory """
+        if self._manifest is None:
+            url = self.latest_manifest_url()
+            if url is not None:
+                logger.debug('Reading inventory manifest %s' % url)
+                self._manifest = json.loads(self.transport.get(url))
+        return self._manifest
+
+    def latest_manifest_url(self):
+        """ Location of the latest manifest.json """
+        if self.local:
+            filename = op.join(self.url, 'manifest.json')
+            if op.exists(filename):
+                return filename
+            # inventory deliveries are in subdirectories named by date
+            dirs = sorted(d for d in os.listdir(self.url) if op.exists(op.join(self.url, d, 'manifest.json')))
+            return op.join(self.url, dirs[-1], 'manifest.json') if dirs else None
+        parts = urlparse(self.url)
+        bucket, prefix = parts.netloc, parts.path.strip('/')
+        today = datetime.now()
+        for dt in [today - timedelta(days) for days in range(self.manifest_age_days)]:
+            resp = self.transport.s3.list_objects_v2(Bucket=bucket, Prefix='%s/%s' % (prefix, dt.strftime('%Y-%m-%d')))
+            manifests = sorted(o['Key'] for o in resp.get('Contents', []) if o['Key'].endswith('manifest.json'))
+            if manifests:
+                return 's3://%s/%s' % (bucket, manifests[-1])
+        return None
+
+    def files(self):
+        """ Locations of the inventory data files """
+        manifest = self.manifest
+        if manifest is None:
+            return []
+        if not self.local:
+            bucket = urlparse(self.url).netloc
+            return ['s3://%s/%s' % (bucket, f['key']) for f in manifest.get('files', [])]
+        files = []
+        for f in manifest.get('files', []):
+            filename = op.join(self.url, f['key'])
+            if not op.exists(filename):
+                filename = op.join(self.url, 'data', op.basename(f['key']))
+            files.append(filename)
+        return files
+
+    def records(self, prefix=None, suffix=None, start_date=None, end_date=None, shard=None):
+        """ Generator returning records (dictionaries of the inventory fields, plus url)
+        Keyword arguments:
+        prefix -- Only keys beginning with this prefix
+        suffix -- Only keys ending with this suffix
+        start_date -- Only keys last modified after this date
+        end_date -- Only keys last modified before this date
+        shard -- Only keys in this shard, given as (index, count, by), see in_shard
+        """
+        files = self.files()
+        if not files:
+            logger.warning('No inventory found at %s' % self.url)
+            return
+        logger.info('Getting latest inventory from %s (%s files)' % (self.url, len(files)))
+        fields = [str(key).strip() for key in self.manifest['fileSchema'].split(',')]
+        filters = {
+            'prefix': prefix,
+            'suffix': suffix,
+            # LastModifiedDate is ISO 8601, so dates can be compared as strings
+            'start_date': None if start_date is None else start_date.isoformat(),
+            'end_date': None if end_date is None else end_date.isoformat(),
+            'shard': shard
+        }
+        with ThreadPoolExecutor(self.workers) as executor:
+            # keep up to workers files being read ahead of the one being returned
+            futures = [executor.submit(self.read_file, f, fields, **filters) for f in files[:self.workers]]
+            for i in range(len(files)):
+                records = futures[i].result()
+                futures[i] = None
+                if i + self.workers < len(files):
+                    futures.append(executor.submit(self.read_file, files[i + self.workers], fields, **filters))
+                logger.info('Read inventory file %s of %s (%s records)' % (i + 1, len(files), len(records)))
+                yield from records
+
+    def read_file(self, url, fields, **kwargs):
+        """ Read an inventory data file, returning the records matching the filters """
+        if self.stats is None:
+            return self._read_file(url, fields, **kwargs)
+        with self.stats.timer('inventory'):
+            records = self._read_file(url, fields, **kwargs)
+        self.stats.incr('records', len(records))
+        return records
+
+    def _read_file(self, url, fields, prefix=None, suffix=None, start_date=None, end_date=None, shard=None):
+        data = self.transport.get(url)
+        if url.endswith('.gz'):
+            data = zlib.decompress(data, zlib.MAX_WBITS | 16)
+        ikey, idate = fields.index('Key'), fields.index('LastModifiedDate')
+        nfields = len(fields)
+        # when fields are quoted the suffix of a key is followed by a quote, lines without it are skipped unparsed
+        _suffix = (suffix + '"').encode() if suffix and data[0:1] == b'"' else None
+        records = []
+        for line in data.splitlines():
+            if _suffix is not None and _suffix not in line:
+                continue
+            values = line.decode().replace('"', '').split(',')
+            if len(values) != nfields:
+                continue
+            key = values[ikey]
+            if (prefix and not key.startswith(prefix)) or (suffix and not key.endswith(suffix)):
+                continue
+            dt = values[idate][0:10]
+            if (start_date and dt <= start_date) or (end_date and dt >= end_date):
+                continue
+            if shard is not None and not in_shard(key, *shard):
+                continue
+            record = dict(zip(fields, values))
+            record['url'] = 's3://%s/%s' % (record['Bucket'], key)
+            records.append(record)
+        return records
@@ -0,0 +1,146 @@
+import json
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .sentinel import SentinelSTAC
+
+logger = logging.getLogger(__name__)
+
+
+def get_messages(event):
+    """ Get (message_id, body) of each record in an SNS or SQS Lambda event """
+    messages = []
+    for record in event.get('Records', []):
+        if 'Sns' in record:
+            messages.append((record['Sns'].get('MessageId'), record['Sns']['Message']))
+        else:
+            messages.append((record.get('messageId'), record.get('body')))
+    return messages
+
+
+def is_sqs_event(event):
+    """ Check if Lambda event is a batch of SQS messages """
+    return any(r.get('eventSource') == 'aws:sqs' for r in event.get('Records', []))
+
+
+def parse_message(body):
+    """ Parse new scene notification, unwrapping SNS notifications delivered through SQS """
+    message = json.loads(body)
+    if message.get('Type') == 'Notification' and 'Message' in message:
+        message = json.loads(message['Message'])
+    return message
+
+
+def get_collection(message):
+    """ Determine collection from a new scene notification, None if not recognized """
+    if 'tiles' in message:
+        # sentinel-2, product type is MSIL1C or MSIL2A (preceded by OPER_PRD in older names)
+        lvl = next((p[3:5] for p in message['name'].split('_') if p.startswith('MSI')), None)
+        if lvl == 'L1':
+            return 'sentinel-s2-l1c'
+        elif lvl == 'L2':
+            return 'sentinel-s2-l2a'
+    elif 'missionId' in message:
+        return 'sentinel-s1-l1c'
+    return None
+
+
+def fetch_tile(collection, path):
+    """ Fetch tileInfo of a Sentinel-2 tile, returning (metadata, base_url) """
+    url = '%s/%s/%s/tileInfo.json' % (SentinelSTAC.FREE_URL, collection, path)
+    logger.info('metadata url = %s' % url)
+    return SentinelSTAC.transport.get_json(url), 's3://%s/%s' % (collection, path)
+
+
+def fetch_product(collection, productinfo):
+    """ Fetch annotation of a Sentinel-1 product, returning (metadata, base_url) """
+    base_url = 's3://%s/%s' % (collection, productinfo['path'])
+    metadata = SentinelSTAC.productinfo_to_metadata(productinfo, base_url)
+    metadata['annotation'] = SentinelSTAC.get_annotation(metadata['filenames'][0])
+    return metadata, base_url
+
+
+def get_tasks(message):
+    """ Get collection and list of metadata fetches (function, arguments) for a new scene notification """
+    collection = get_collection(message)
+    if collection is None:
+        raise ValueError('Message not recognized')
+    if 'sentinel-s1' in collection:
+        return collection, [(fetch_product, (collection, message))]
+    return collection, [(fetch_tile, (collection, tile['path'])) for tile in message['tiles']]
+
+
+def items_from_event(event, workers=16, invalid=None):
+    """ Convert all new scene notifications in an SNS or SQS event to STAC Items, see items_from_messages """
+    return items_from_messages(get_messages(event), workers=workers, invalid=invalid)
+
+
+def items_from_messages(messages, workers=16, executor=None, invalid=None):
+    """ Convert new scene notifications to STAC Items
+
+    Metadata of all scenes (every tile of every message) is fetched concurrently, then converted
+    with one to_stac_many call per collection.
+
+    Arguments:
+    messages -- List of (message_id, body)
+
+    Keyword arguments:
+    workers -- Number of threads fetching metadata
+    executor -- Thread pool to fetch metadata in, rather than one of workers threads for these messages
+    invalid -- List the ids of messages that can not be read or recognized, or whose metadata can not be
+               converted, are added to rather than to the failed ids, as they would fail again
+
+    Returns:
+    Tuple of (items, failed), with items a list of (message_id, collection, item) and failed a list
+    of the message_ids that could not be completely converted
+    """
+    failed = []
+    if invalid is None:
+        invalid = failed
+    tasks = []
+    for message_id, body in messages:
+        try:
+            message = parse_message(body)
+            collection, fetches = get_tasks(message)
+        except Exception as err:
+            logger.error('Error reading message %s: %s' % (message_id, err))
+            invalid.append(message_id)
+            continue
+        tasks += [(message_id, collection, func, args) for func, args in fetches]
+
+    def fetch(task):
+        try:
+            return task[2](*task[3]), None
+        except Exception as err:
+            return None, err
+
+    if executor is not None:
+        results = list(executor.map(fetch, tasks))
+    else:
+        with ThreadPoolExecutor(max(1, min(workers, len(tasks)))) as executor:
+            results = list(executor.map(fetch, tasks))
+
+    # group fetched metadata by collection
+    records = {}
+    for (message_id, collection, func, args), (result, err) in zip(tasks, results):
+        if err is not None:
+            logger.error('Error fetching metadata for message %s: %s' % (message_id, err))
+            if message_id not in failed:
+                failed.append(message_id)
+            continue
+        records.setdefault(collection, []).append((message_id, result))
+
+    items = []
+    for collection, recs in records.items():
+        _items, errors = SentinelSTAC.to_stac_many(collection, [r[1][0] for r in recs],
+                                                   base_urls=[r[1][1] for r in recs])
+        errors = dict(errors)
+        _items = iter(_items)
+        for i, (message_id, _) in enumerate(recs):
+            if i in errors:
+                if message_id not in failed and message_id not in invalid:
+                    invalid.append(message_id)
+                continue
+            items.append((message_id, collection, next(_items)))
+    return items, failed
@@ -0,0 +1,169 @@
+import logging
+import threading
+
+from queue import Queue, Empty, Full
+
+logger = logging.getLogger(__name__)
+
+# marker passed between stages to signal there is no more work
+_STOP = object()
+
+
+class Pipeline(object):
+    """ Multi-stage pipeline: fetch (I/O bound) -> transform (CPU bound) -> output
+
+    Each stage runs in its own pool of workers and stages are connected by bounded queues,
+    so a slow stage applies backpressure to the stages before it rather than buffering
+    the entire inventory in memory. When results are returned in input order, at most window
+    inputs are in progress or waiting for an earlier input, so a slow input does not cause
+    later results to be buffered without limit.
+    """
+
+    def __init__(self, fetch, transform, fetch_workers=8, transform_workers=1,
+                 processes=False, queue_size=None, ordered=True, window=None):
+        """ Create pipeline
+        Arguments:
+        fetch -- function taking an input and returning the data to transform (I/O stage)
+        transform -- function taking the output of fetch and returning a result (CPU stage)
+
+        Keyword arguments:
+        fetch_workers -- Number of threads fetching inputs
+        transform_workers -- Number of workers running transform
+        processes -- Run transform in a pool of processes (transform and data must be picklable)
+        queue_size -- Maximum number of records waiting between stages (default: 2 x workers)
+        ordered -- Return results in input order, otherwise in order of completion
+        window -- Maximum number of inputs in progress or held for reordering when ordered
+                  (default: 8 x queue_size)
+        """
+        self.fetch = fetch
+        self.transform = transform
+        self.fetch_workers = max(1, fetch_workers)
+        self.transform_workers = max(1, transform_workers)
+        self.processes = processes
+        self.queue_size = queue_size or 2 * max(self.fetch_workers, self.transform_workers)
+        self.ordered = ordered
+        self.window = window or 8 * self.queue_size
+
+    def run(self, inputs):
+        """ Generator returning (input, result, error) for every input
+        error is None on success, otherwise the exception raised by fetch or transform. An
+        exception raised reading inputs is raised once the results of the inputs read are returned
+        """
+        stop = threading.Event()
+        # inputs that may be fed before the result of the earliest input in progress is returned
+        window = threading.Semaphore(self.window)
+        feed_errors = []
+        input_q = Queue(self.queue_size)
+        fetched_q = Queue(self.queue_size)
+        output_q = Queue(self.queue_size)
+        executor = None
+        if self.processes:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor(self.transform_workers)
+
+        def put(q, value):
+            # block while queue is full, unless the pipeline is being shut down
+            while not stop.is_set():
+                try:
+                    q.put(value, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except Empty:
+                    continue
+            return _STOP
+
+        def acquire():
+            while not stop.is_set():
+                if window.acquire(timeout=0.1):
+                    return True
+            return False
+
+        def feed():
+            try:
+                for i, value in enumerate(inputs):
+                    if self.ordered and not acquire():
+                        return
+                    if not put(input_q, (i, value)):
+                        return
+            except Exception as err:
+                logger.error('Error reading pipeline inputs: %s' % err)
+                feed_errors.append(err)
+            finally:
+                for _ in range(self.fetch_workers):
+                    put(input_q, _STOP)
+
+        def fetch():
+            while True:
+                task = get(input_q)
+                if task is _STOP:
+                    return
+                i, value = task
+                try:
+                    put(fetched_q, (i, value, self.fetch(value), None))
+                except Exception as err:
+                    put(fetched_q, (i, value, None, err))
+
+        def transform():
+            while True:
+                task = get(fetched_q)
+                if task is _STOP:
+                    return
+                i, value, data, err = task
+                result = None
+                if err is None:
+                    try:
+                        if executor is None:
+                            result = self.transform(data)
+                        else:
+                            result = executor.submit(self.transform, data).result()
+                    except Exception as _err:
+                        err = _err
+                put(output_q, (i, value, result, err))
+
+        def supervise():
+            # close each stage once all workers of the previous stage are finished
+            for t in fetchers:
+                t.join()
+            for _ in range(self.transform_workers):
+                put(fetched_q, _STOP)
+            for t in transformers:
+                t.join()
+            put(output_q, _STOP)
+
+        fetchers = [threading.Thread(target=fetch, daemon=True) for _ in range(self.fetch_workers)]
+        transformers = [threading.Thread(target=transform, daemon=True) for _ in range(self.transform_workers)]
+        threads = [threading.Thread(target=feed, daemon=True)] + fetchers + transformers
+        threads.append(threading.Thread(target=supervise, daemon=True))
+        for t in threads:
+            t.start()
+
+        try:
+            pending = {}
+            next_index = 0
+            while True:
+                task = get(output_q)
+                if task is _STOP:
+                    break
+                if not self.ordered:
+                    yield task[1:]
+                    continue
+                # hold results until all preceding inputs have been returned
+                pending[task[0]] = task[1:]
+                while next_index in pending:
+                    result = pending.pop(next_index)
+                    window.release()
+                    yield result
+                    next_index += 1
+            if feed_errors:
+                raise feed_errors[0]
+        finally:
+            stop.set()
+            if executor is not None:
+                executor.shutdown(wait=False)
@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+
+from .encoding import dumps
+
+logger = logging.getLogger(__name__)
+
+# limits of an SNS PublishBatch request
+BATCH_SIZE = 10
+MAX_BATCH_BYTES = 256 * 1024
+
+
+def get_sns_attributes(item, change=None):
+    """ Get Attributes from STAC item for publishing to SNS, with the change (new or updated, see
+    changes.ChangeStore) if known
+    """
+    attributes = {
+        'properties.datetime': {
+            'DataType': 'String',
+            'StringValue': item['properties']['datetime']
+        },
+        'bbox.ll_lon': {
+            'DataType': 'Number',
+            'StringValue': str(item['bbox'][0])
+        },
+        'bbox.ll_lat': {
+            'DataType': 'Number',
+            'StringValue': str(item['bbox'][1])
+        },
+        'bbox.ur_lon': {
+            'DataType': 'Number',
+            'StringValue': str(item['bbox'][2])
+        },
+        'bbox.ur_lat': {
+            'DataType': 'Number',
+            'StringValue': str(item['bbox'][3])
+        }
+    }
+    if change is not None:
+        attributes['change'] = {
+            'DataType': 'String',
+            'StringValue': change
+        }
+    return attributes
+
+
+def entry_size(entry):
+    """ Size of a batch entry as counted by SNS (message plus attribute names, types and values) """
+    size = len(entry['Message'].encode('utf-8'))
+    for name, attr in entry['MessageAttributes'].items():
+        size += len(name.encode('utf-8')) + len(attr['DataType']) + len(attr['StringValue'].encode('utf-8'))
+    return size
+
+
+class SNSPublisher(object):
+    """ Publish STAC Items to an SNS topic with PublishBatch requests
+
+    Items are grouped into batches of up to 10 messages (and 256 KB), which are published from a pool
+    of threads sharing one SNS client. At most max_in_flight batches are queued or being published,
+    publish() blocks when that limit is reached. Failed entries are retried with backoff.
+    """
+
+    def __init__(self, topic_arn, client=None, workers=4, max_in_flight=None, retries=3, backoff=0.5):
+        """ Create publisher
+        Arguments:
+        topic_arn -- ARN of SNS topic
+
+        Keyword arguments:
+        client -- boto3 SNS client, created for the region of the topic if not provided
+        workers -- Number of threads publishing batches
+        max_in_flight -- Maximum number of batches queued or being published (default 2 * workers)
+        retries -- Number of times failed entries are retried
+        backoff -- Base delay, in seconds, between retries
+        """
+        self.topic_arn = topic_arn
+        if client is None:
+            import boto3
+            client = boto3.client('sns', region_name=topic_arn.split(':')[3])
+        self.client = client
+        self.retries = retries
+        self.backoff = backoff
+        self.executor = ThreadPoolExecutor(workers)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight or 2 * workers)
+        self.lock = threading.Lock()
+        self.futures = set()
+        self.batch = []
+        self.batch_bytes = 0
+        self.published = 0
+        self.failed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def publish(self, item, attributes=None, data=None, change=None):
+        """ Add an Item to be published, with message attributes (default from get_sns_attributes, with
+        change) and optionally the Item already encoded as JSON bytes
+        """
+        entry = {
+            'Id': str(len(self.batch)),
+            'Message': (dumps(item) if data is None else data).decode('utf-8'),
+            'MessageAttributes': get_sns_attributes(item, change=change) if attributes is None else attributes
+        }
+        size = entry_size(entry)
+        if size > MAX_BATCH_BYTES:
+            logger.error('Message for %s exceeds maximum SNS message size (%s bytes)' % (item['id'], size))
+            self.failed.append((entry, 'MessageTooLong'))
+            return
+        if self.batch and self.batch_bytes + size > MAX_BATCH_BYTES:
+            self.flush()
+            entry['Id'] = '0'
+        self.batch.append(entry)
+        self.batch_bytes += size
+        if len(self.batch) == BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """ Submit the current batch for publishing """
+        if not self.batch:
+            return
+        batch, self.batch, self.batch_bytes = self.batch, [], 0
+        self.in_flight.acquire()
+        future = self.executor.submit(self.publish_batch, batch)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        with self.lock:
+            self.futures.discard(future)
+        self.in_flight.release()
+        if future.exception() is not None:
+            logger.error('Error publishing to %s: %s' % (self.topic_arn, future.exception()))
+
+    def publish_batch(self, entries):
+        """ Publish entries in one PublishBatch request, retrying failed entries """
+        attempt = 0
+        while True:
+            try:
+                resp = self.client.publish_batch(TopicArn=self.topic_arn, PublishBatchRequestEntries=entries)
+                failed = resp.get('Failed', [])
+            except Exception as err:
+                failed = [{'Id': e['Id'], 'Code': type(err).__name__, 'SenderFault': False} for e in entries]
+            with self.lock:
+                self.published += len(entries) - len(failed)
+            if not failed:
+                return
+            # errors caused by the message itself will not succeed when retried
+            retry = set(f['Id'] for f in failed if not f.get('SenderFault'))
+            codes = {f['Id']: f.get('Code') for f in failed}
+            if attempt >= self.retries:
+                retry = set()
+            with self.lock:
+                self.failed += [(e, codes[e['Id']]) for e in entries if e['Id'] in codes and e['Id'] not in retry]
+            entries = [e for e in entries if e['Id'] in retry]
+            if not entries:
+                return
+            attempt += 1
+            logger.warning('Retrying %s entries published to %s' % (len(entries), self.topic_arn))
+            time.sleep(self.backoff * 2 ** (attempt - 1))
+
+    def wait(self):
+        """ Publish remaining Items and wait for the batches in flight to complete """
+        self.flush()
+        with self.lock:
+            futures = list(self.futures)
+        wait_futures(futures)
+
+    def close(self):
+        """ Publish remaining Items and wait for all batches to complete """
+        self.flush()
+        self.executor.shutdown(wait=True)
+        if self.failed:
+            logger.error('%s Items could not be published to %s' % (len(self.failed), self.topic_arn))
@@ -0,0 +1,70 @@
+import numpy
+import threading
+
+from collections import OrderedDict
+from pyproj import Transformer
+from shapely import geometry
+
+# maximum number of cached transformers per thread, Sentinel-2 uses ~120 UTM zones
+CACHE_SIZE = 256
+
+# pyproj objects should not be shared between threads, so each thread keeps its own cache
+_cache = threading.local()
+
+
+def get_transformer(epsg, cache_size=CACHE_SIZE):
+    """ Get a (cached) Transformer from EPSG code to lon/lat (EPSG:4326) """
+    epsg = int(epsg)
+    transformers = getattr(_cache, 'transformers', None)
+    if transformers is None:
+        transformers = _cache.transformers = OrderedDict()
+    transformer = transformers.get(epsg)
+    if transformer is None:
+        transformer = Transformer.from_crs('epsg:%s' % epsg, 'epsg:4326', always_xy=True)
+        transformers[epsg] = transformer
+        # evict least recently used
+        while len(transformers) > cache_size:
+            transformers.popitem(last=False)
+    else:
+        transformers.move_to_end(epsg)
+    return transformer
+
+
+def reproject_footprints(footprints):
+    """ Reproject many footprints to lon/lat, one transform call per CRS
+    Arguments:
+    footprints -- list of (epsg, coordinates), where coordinates is a ring of [x, y] pairs
+
+    Returns:
+    List of dictionaries with bbox and (convex hull) geometry, in the same order as footprints
+    """
+    groups = {}
+    for i, (epsg, coordinates) in enumerate(footprints):
+        groups.setdefault(int(epsg), []).append(i)
+
+    results = [None] * len(footprints)
+    for epsg, indices in groups.items():
+        rings = [numpy.asarray(footprints[i][1], dtype='float64') for i in indices]
+        xy = numpy.concatenate(rings) if len(rings) > 1 else rings[0]
+        lons, lats = get_transformer(epsg).transform(xy[:, 0], xy[:, 1])
+        start = 0
+        for i, ring in zip(indices, rings):
+            end = start + len(ring)
+            results[i] = lonlat_to_geometry(lons[start:end], lats[start:end])
+            start = end
+    return results
+
+
+def reproject_footprint(epsg, coordinates):
+    """ Reproject a single footprint to lon/lat, returns bbox and (convex hull) geometry """
+    return reproject_footprints([(epsg, coordinates)])[0]
+
+
+def lonlat_to_geometry(lons, lats):
+    """ Get bbox and convex hull geometry from arrays of lons and lats """
+    bbox = [float(lons.min()), float(lats.min()), float(lons.max()), float(lats.max())]
+    hull = geometry.Polygon(numpy.column_stack((lons, lats))).convex_hull
+    return {
+        'bbox': bbox,
+        'geometry': geometry.mapping(hull)
+    }
@@ -1,20 +1,42 @@
-import json
 import logging
-import requests
+import re
 import os.path as op
 
-from boto3utils import s3
-from boto3utils.s3 import get_presigned_url
-from dateutil.parser import parse
+from datetime import datetime, timedelta, timezone
 from os import getcwd
-from pyproj import Proj, transform as reproj
-from shapely import geometry
-from xmljson import badgerfish as bf
-from xml.etree.ElementTree import fromstring
+from urllib.parse import urlparse
+from .annotation import SWATH_PARAMS, read_annotation
+from .cache import CachingTransport, MetadataCache
+from .inventory import in_shard, inventory_url, latest_inventory
+from .pipeline import Pipeline
+from .state import StateStore
+from .stats import Stats
+from .templates import ItemTemplate
+from .transport import Transport
 from .version import __version__
 
 logger = logging.getLogger(__name__)
 
+# ISO 8601 datetimes as found in Sentinel metadata and Items, e.g. 2017-10-23T00:46:57.464Z
+ISO_DATETIME = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d{1,6}))?(Z|[+-]\d\d:\d\d)?$')
+
+
+def parse_datetime(value):
+    """ Parse datetime string, same as dateutil parse but fast for ISO 8601 datetimes """
+    m = ISO_DATETIME.match(value)
+    if m is None:
+        from dateutil.parser import parse
+        return parse(value)
+    parts = [int(p) for p in m.groups()[0:6]]
+    microsecond = int(m.group(7).ljust(6, '0')) if m.group(7) else 0
+    tz = m.group(8)
+    if tz in ('Z', '+00:00', '-00:00'):
+        tz = timezone.utc
+    elif tz:
+        offset = timedelta(hours=int(tz[1:3]), minutes=int(tz[4:6]))
+        tz = timezone(offset if tz[0] == '+' else -offset)
+    return datetime(*parts, microsecond, tzinfo=tz)
+
 
 class SentinelSTAC(object):
 
@@ -30,6 +52,12 @@ class SentinelSTAC(object):
     region = 'eu-central-1'
     FREE_URL = 'https://roda.sentinel-hub.com'
 
+    # shared connection pools used for all metadata fetches
+    transport = Transport(region=region)
+
+    # counters and timing of each stage
+    stats = Stats()
+
     def __init__(self, collection, metadata):
         assert(collection in self.collections.keys())
         self.collection = collection
@@ -47,9 +75,7 @@ class SentinelSTAC(object):
 
     def get_collection(self):
         """ Get STAC Collection JSON """
-        filename = op.join(op.dirname(__file__), '%s.json' % self.collection)
-        collection = json.loads(open(filename).read())
-        return collection        
+        return ItemTemplate.get(self.collection).get_collection()
 
     def get_collection_link(self):
         """ Return a STAC link to STAC Collection JSON from GitHub repo """
@@ -64,22 +90,25 @@ class SentinelSTAC(object):
     @classmethod
     def get_xml_metadata(cls, filename):
         """ get XML metadata """
-        try: 
-            if filename[0:5] == 's3://':
-                # if s3, try presigned URL
-                url, headers = get_presigned_url(filename, aws_region=cls.region, requester_pays=True)
-                resp = requests.get(url, headers=headers)
-                # TODO - check response
-                logger.info('Get presigned URL response: (%s) %s' % (resp, resp.text))
-                metadata = resp.text
-            elif op.exists(filename):
-                with open(filename) as f:
-                    metadata = f.read()
+        from xml.etree.ElementTree import fromstring
+        from xmljson import badgerfish as bf
+        try:
+            metadata = cls.transport.get_text(filename)
             return bf.data(fromstring(metadata))
         except Exception as err:
-            logger.error('Error reading %s' % filename)
+            logger.error('Error reading %s: %s' % (filename, err))
             return None
 
+    @classmethod
+    def get_annotation(cls, filename, transport=None):
+        """ Get the values used for STAC from an annotation XML, reading only as much of the file as needed """
+        chunks = (transport or cls.transport).iter_content(filename)
+        try:
+            with cls.stats.timer('annotation'):
+                return read_annotation(chunks)
+        finally:
+            chunks.close()
+
     @classmethod
     def coordinates_to_geometry(cls, coordinates):
         """ Convert coordinates to GeoJSON Geometry and bbox """
@@ -97,6 +126,8 @@ class SentinelSTAC(object):
     @classmethod
     def kml_to_geometry(cls, filename):
         """ Convert KML to bbox and geometry """
+        from xml.etree.ElementTree import fromstring
+        from xmljson import badgerfish as bf
         # open local
         with open(filename) as f:
             kml = bf.data(fromstring(f.read()))['kml']['Document']['Folder']['GroundOverlay']
@@ -106,104 +137,255 @@ class SentinelSTAC(object):
         return cls.coordinates_to_geometry(coordinates)
 
     @classmethod
-    def get_aws_archive(cls, collection, direct_from_s3=False, **kwargs):
+    def metadata_url(cls, collection, url, direct_from_s3=False):
+        """ URL the metadata of the inventory file at url is fetched from """
+        if direct_from_s3:
+            return url
+        # use free endpoint to access file
+        key = urlparse(url).path.lstrip('/')
+        return '%s/%s/%s' % (cls.FREE_URL, collection, key)
+
+    @classmethod
+    def fetch_metadata(cls, collection, url, direct_from_s3=False, transport=None):
+        """ Fetch original metadata for the inventory file at url, with transport (default cls.transport)
+        Returns:
+        Tuple of (metadata, base_url) ready to be passed to SentinelSTAC
+        """
+        _url = cls.metadata_url(collection, url, direct_from_s3=direct_from_s3)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Fetching initial metadata: %s' % _url)
+        transport = transport or cls.transport
+        metadata = transport.get_json(_url)
+        base_url = op.dirname(url)
+        if collection == 'sentinel-s1-l1c':
+            metadata = cls.productinfo_to_metadata(metadata, base_url)
+            # annotation is fetched here so transforming the metadata needs no I/O
+            metadata['annotation'] = cls.get_annotation(metadata['filenames'][0], transport=transport)
+        return metadata, base_url
+
+    @classmethod
+    def productinfo_to_metadata(cls, productinfo, base_url):
+        """ Reduce Sentinel-1 productInfo to the metadata used by to_stac_from_s1l1c """
+        fnames = [f"{base_url}/{a}" for a in productinfo['filenameMap'].values()
+                  if 'annotation' in a and 'calibration' not in a]
+        return {
+            'id': productinfo['id'],
+            'path': productinfo['path'],
+            'coordinates': productinfo['footprint']['coordinates'],
+            'filenames': fnames
+        }
+
+    @classmethod
+    def get_aws_archive(cls, collection, direct_from_s3=False, fetch_workers=8, transform_workers=1,
+                        processes=False, ordered=True, state=None, resume=False, delta=False,
+                        retry_failed=False, inventory=None, inventory_workers=4, shard_index=0, shard_count=1,
+                        shard_by='hash', cache=None, replay=False, **kwargs):
         """ Generator function returning the archive of Sentinel data on AWS
         Keyword arguments:
         prefix -- Process only files keys begining with this prefix
         start_date -- Process this date and after
         end_date -- Process this date and earlier
+        fetch_workers -- Number of threads fetching metadata
+        transform_workers -- Number of workers converting metadata to STAC
+        processes -- Use processes rather than threads for converting metadata
+        ordered -- Return Items in inventory order, otherwise as they are completed
+        state -- StateStore (or filename of one) recording the outcome for each inventory key
+        resume -- Skip keys with a recorded outcome in state
+        delta -- Skip keys in state that were converted and have not changed since
+        retry_failed -- Process only the keys that failed in state, rather than the inventory
+        inventory -- Location of the inventory (s3:// URL or local directory), defaults to the AWS inventory
+        inventory_workers -- Number of inventory files read concurrently
+        shard_index -- Process only the keys in this shard (0 to shard_count - 1)
+        shard_count -- Number of shards the keys are split into, for running in separate processes
+        shard_by -- Split keys by 'hash' of the key, or by 'grid' square (S2) / date (S1), see inventory.in_shard
+        cache -- MetadataCache (or directory of one) caching the metadata fetched, files unchanged in the
+                 inventory since they were cached are not fetched again
+        replay -- Create Items from the files in cache only, without reading the inventory or fetching
+                  anything, only prefix and shards are used to select files
 
         Returns:
         Iterator of STAC Items using specified Transform object
         """
+        opened = isinstance(state, str)
+        if opened:
+            state = StateStore(state)
 
-        # get latest AWS inventory for this collection
-        inventory_url = 's3://sentinel-inventory/%s/%s-inventory' % (collection, collection)
-        inventory = s3().latest_inventory(inventory_url, **kwargs, suffix=cls.collections[collection])
-        #import pdb; pdb.set_trace()
-        # iterate through latest inventory
-        from datetime import datetime
-        for i, url in enumerate(inventory):
-            if (i % 100) == 0:
-                logger.info('%s records' % i)
-            
-            try:
-                if direct_from_s3:
-                    logger.debug('Fetching initial metadata: %s' % url)
-                    metadata = s3().read_json(url, requester_pays=True)
-                else:
-                    # use free endpoint to access file
-                    parts = s3().urlparse(url)
-                    _url = '%s/%s/%s' % (cls.FREE_URL, collection, parts['key'])                
-                    logger.debug('Fetching initial metadata: %s' % _url)
-                    r = requests.get(_url, stream=True)
-                    metadata = json.loads(r.text)
-               
-                '''
-                fnames = [f"{base_url}/{a}" for a in md['filenameMap'].values() if 'annotation' in a and 'calibration' not in a]
-                metadata = {
-                    'id': md['id'],
-                    'coordinates': md['footprint']['coordinates'],
-                    'filenames': fnames
-                }
-                '''                  
-                # transform to STAC Item
-                sentinel_scene = cls(collection, metadata)
-                item = sentinel_scene.to_stac(base_url=url)
+        if state is None and (resume or delta or retry_failed):
+            raise ValueError('resume, delta and retry_failed require a state store')
+
+        if not 0 <= shard_index < shard_count:
+            raise ValueError('shard_index must be between 0 and shard_count - 1')
+        shard = (shard_index, shard_count, shard_by) if shard_count > 1 else None
+
+        if replay and cache is None:
+            raise ValueError('replay requires a cache')
+        opened_cache = isinstance(cache, str)
+        if opened_cache:
+            cache = MetadataCache(cache)
+        transport = cls.transport
+        if cache is not None:
+            # metadata is cached by bucket/key whether it is read from S3 or the free endpoint
+            transport = CachingTransport(cache, transport, aliases={cls.FREE_URL + '/': ''}, offline=replay,
+                                         stats=cls.stats)
+
+        if retry_failed or replay:
+            if retry_failed:
+                records = state.failed()
+            else:
+                records = cache.records(collection, prefix=kwargs.get('prefix'), suffix=cls.collections[collection])
+                if state is not None:
+                    records = state.skip(records, resume=resume, delta=delta)
+            if shard is not None:
+                records = (r for r in records if in_shard(r['Key'], *shard))
+        else:
+            # get latest AWS inventory for this collection
+            records = latest_inventory(inventory or inventory_url(collection), transport=cls.transport,
+                                       workers=inventory_workers, stats=cls.stats, suffix=cls.collections[collection],
+                                       shard=shard, **kwargs)
+            if state is not None:
+                records = state.skip(records, resume=resume, delta=delta)
+
+        def fetch(record):
+            if cache is not None:
+                transport.expect(record['url'], record.get('ETag') or record.get('LastModifiedDate'))
+            with cls.stats.timer('fetch'):
+                metadata, base_url = cls.fetch_metadata(collection, record['url'], direct_from_s3=direct_from_s3,
+                                                        transport=transport)
+            return collection, metadata, base_url
+
+        pipeline = Pipeline(fetch, _to_stac, fetch_workers=fetch_workers, transform_workers=transform_workers,
+                            processes=processes, ordered=ordered)
+        try:
+            for i, (record, item, err) in enumerate(pipeline.run(records)):
+                if (i % 100) == 0:
+                    logger.info('%s records' % i)
+                    cls.stats.report()
+                if state is not None:
+                    state.record(record, item_id=None if item is None else item['id'], error=err)
+                if err is not None:
+                    cls.stats.incr('failed')
+                    logger.error('Error creating STAC Item from %s, Error: %s' % (record['url'], err))
+                    continue
+                cls.stats.incr('items')
                 yield item
+        finally:
+            if opened:
+                state.close()
+            elif state is not None:
+                state.flush()
+            if opened_cache:
+                cache.close()
+            elif cache is not None:
+                cache.flush()
 
-            except Exception as err:
-                logger.error('Error creating STAC Item from %s, Error: %s' % (url, err))
+    @classmethod
+    def get_base_url(cls, collection, metadata):
+        """ Default base_url of a scene, the location of its metadata on S3 """
+        return 's3://%s/%s' % (collection, metadata['path']) if 'path' in metadata else ''
+
+    @classmethod
+    def to_stac_many(cls, collection, records, base_urls=None):
+        """ Transform a batch of metadata records into STAC Items
+        Work shared between records, such as reprojecting Sentinel-2 footprints, is done once for the batch.
+        Arguments:
+        collection -- Collection ID of all records
+        records -- List of metadata (tileInfo, or productInfo reduced with productinfo_to_metadata)
+        base_urls -- List of base_url for each record (default: from the path of each record)
+
+        Returns:
+        Tuple of (items, errors), the Items in the order of records and a list of (index, error)
+        for records that failed (these are missing from items)
+        """
+        if base_urls is None:
+            base_urls = [cls.get_base_url(collection, md) for md in records]
+        scenes = [cls(collection, md) for md in records]
+        errors = {}
+
+        footprints = {}
+        if 'sentinel-s2' in collection:
+            # pyproj is only imported for Sentinel-2
+            from .reproject import reproject_footprint, reproject_footprints
+            for i, scene in enumerate(scenes):
+                try:
+                    footprints[i] = scene.get_s2_footprint()
+                except Exception as err:
+                    errors[i] = err
+            try:
+                with cls.stats.timer('reproject'):
+                    footprints = dict(zip(footprints.keys(), reproject_footprints(list(footprints.values()))))
+            except Exception:
+                # reproject individually to find the failing records
+                for i, footprint in list(footprints.items()):
+                    try:
+                        footprints[i] = reproject_footprint(*footprint)
+                    except Exception as err:
+                        errors[i] = err
+                        del footprints[i]
+
+        items = []
+        for i, scene in enumerate(scenes):
+            if i in errors:
                 continue
+            try:
+                if i in footprints:
+                    items.append(scene.to_stac_from_s2(base_url=base_urls[i], footprint=footprints[i]))
+                else:
+                    items.append(scene.to_stac(base_url=base_urls[i]))
+            except Exception as err:
+                errors[i] = err
+        errors = sorted(errors.items(), key=lambda e: e[0])
+        for i, err in errors:
+            logger.error('Error creating STAC Item from record %s, Error: %s' % (i, err))
+        return items, errors
+
+    @classmethod
+    def to_stac_chunks(cls, collection, chunks):
+        """ Generator returning (items, errors) from to_stac_many for each chunk of metadata records """
+        for records in chunks:
+            yield cls.to_stac_many(collection, list(records))
 
     def to_stac_from_s1l1c(self, **kwargs):
         """ Transform Sentinel-1 L1c metadata (from annotation XML) into a STAC item """
-        logger.debug('Metadata filename: %s' % self.metadata['filenames'][0])
-        extended_metadata = self.get_xml_metadata(self.metadata['filenames'][0])
+        annotation = self.metadata.get('annotation')
+        if annotation is None:
+            logger.debug('Metadata filename: %s', self.metadata['filenames'][0])
+            annotation = self.get_annotation(self.metadata['filenames'][0])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Annotation: %s' % annotation)
 
-        logger.debug('Extended metadata: %s' % json.dumps(extended_metadata))
-
-        adsHeader = extended_metadata['product']['adsHeader']
-        imageInfo = extended_metadata['product']['imageAnnotation']['imageInformation']
-        procInfo = extended_metadata['product']['imageAnnotation']['processingInformation']
-        swathProcParams = procInfo['swathProcParamsList']['swathProcParams']
-        if isinstance(swathProcParams, list):
-            swathProcParams = swathProcParams[0]
+        # annotation times are UTC, without a timezone
+        start = parse_datetime(annotation['adsHeader/startTime']).replace(tzinfo=timezone.utc).isoformat()
         props = {
-            'datetime': parse(adsHeader['startTime']['$']).isoformat(),
-            'start_datetime': parse(adsHeader['startTime']['$']).isoformat(),
-            'end_datetime': parse(adsHeader['stopTime']['$']).isoformat(),
-            'platform': 'sentinel-1%s' % adsHeader['missionId']['$'][2].lower(),
-            'sar:instrument_mode': adsHeader['mode']['$'],
-            'sar:product_type': adsHeader['productType']['$'],
-            'sar:looks_range': swathProcParams['rangeProcessing']['numberOfLooks']['$'],
-            'sar:looks_azimuth': swathProcParams['azimuthProcessing']['numberOfLooks']['$'],
-            'sat:orbit_state': extended_metadata['product']['generalAnnotation']['productInformation']['pass']['$'].lower(),
-            'view:incidence_angle': imageInfo['incidenceAngleMidSwath']['$'],
-            'sat:relative_orbit': int(adsHeader['absoluteOrbitNumber']['$']/175.0)
+            'datetime': start,
+            'start_datetime': start,
+            'end_datetime': parse_datetime(annotation['adsHeader/stopTime']).replace(tzinfo=timezone.utc).isoformat(),
+            'platform': 'sentinel-1%s' % annotation['adsHeader/missionId'][2].lower(),
+            'sar:instrument_mode': annotation['adsHeader/mode'],
+            'sar:product_type': annotation['adsHeader/productType'],
+            'sar:looks_range': annotation[SWATH_PARAMS + '/rangeProcessing/numberOfLooks'],
+            'sar:looks_azimuth': annotation[SWATH_PARAMS + '/azimuthProcessing/numberOfLooks'],
+            'sat:orbit_state': annotation['generalAnnotation/productInformation/pass'].lower(),
+            'view:incidence_angle': annotation['imageAnnotation/imageInformation/incidenceAngleMidSwath'],
+            'sat:relative_orbit': int(annotation['adsHeader/absoluteOrbitNumber']/175.0)
         }
 
-        # get Asset definition dictionary from Collection
-        assets = self.get_collection()['assets']
-
         # populate Asset URLs
         prefix = self.metadata['filenames'][0].split('annotation')[0].strip('/')
-        assets['thumbnail']['href'] = f"{prefix}/preview/quick-look.png"
+        hrefs = {'thumbnail': f"{prefix}/preview/quick-look.png"}
         if 'path' in self.metadata:
             # this means input metadata was from productInfo, so link to that
-            assets['metadata']['href'] = prefix + '/productInfo.json'
+            hrefs['metadata'] = prefix + '/productInfo.json'
         for f in self.metadata['filenames']:
             # if this is AWS public dataset, filenames are named as mode-pol
             pol = op.splitext(f)[0].split('-')[-1].upper()
             # if not a public dataset, then filenames are the item ids
             if pol not in ['HH', 'VV', 'VH', 'HV']:
                 pol = op.basename(f).split('-')[3].upper()
-            fname = f.replace('annotation', 'measurement').replace('.xml', '.tiff')
-            assets['%s' % pol]['href'] = fname
-            assets['%s-metadata' % pol]['href'] = f
+            hrefs[pol] = f.replace('annotation', 'measurement').replace('.xml', '.tiff')
+            hrefs['%s-metadata' % pol] = f
 
-        # drop any assets for which there is no url
-        assets = {k: assets[k] for k in assets if 'href' in assets[k]}
+        # get Asset definitions from Collection, only for assets with a url
+        assets = ItemTemplate.get(self.collection).get_assets(hrefs)
 
         item = {
             'type': 'Feature',
@@ -222,9 +404,18 @@ class SentinelSTAC(object):
 
         return item
 
-    def to_stac_from_s2(self, base_url=''):
-        """ Create STAC Item from Sentinel-2 L1C or L2A metadata """
-        dt = parse(self.metadata['timestamp'])
+    def get_s2_footprint(self):
+        """ Get (epsg, coordinates) of the Sentinel-2 data footprint, in native coordinates """
+        epsg = self.metadata['tileOrigin']['crs']['properties']['name'].split(':')[-1]
+        return epsg, self.metadata['tileDataGeometry']['coordinates'][0]
+
+    def to_stac_from_s2(self, base_url='', footprint=None):
+        """ Create STAC Item from Sentinel-2 L1C or L2A metadata
+        Keyword arguments:
+        base_url -- Location of the scene files
+        footprint -- Reprojected footprint (bbox and geometry), if already calculated
+        """
+        dt = parse_datetime(self.metadata['timestamp'])
         # Item properties
         props = {
             'datetime': dt.isoformat(),
@@ -238,61 +429,17 @@ class SentinelSTAC(object):
         }
 
         # geometry - TODO see about getting this from a productInfo file without having to reproject
-        epsg = self.metadata['tileOrigin']['crs']['properties']['name'].split(':')[-1]
-        coordinates = self.metadata['tileDataGeometry']['coordinates']
-        ys = [c[1] for c in coordinates[0]]
-        xs = [c[0] for c in coordinates[0]]
-        p1 = Proj(init='epsg:%s' % epsg)
-        p2 = Proj(init='epsg:4326')
-        lons, lats = reproj(p1, p2, xs, ys)
-        bbox = [min(lons), min(lats), max(lons), max(lats)]
-        coordinates = [[[lons[i], lats[i]] for i in range(0, len(lons))]]
-        geom = geometry.mapping(geometry.Polygon(coordinates[0]).convex_hull)
+        if footprint is None:
+            from .reproject import reproject_footprint
+            with self.stats.timer('reproject'):
+                footprint = reproject_footprint(*self.get_s2_footprint())
 
         # assets
-        assets = self.get_collection()['assets']
-        if self.collection == 'sentinel-s2-l1c':
-            assets['thumbnail']['href'] = op.join(base_url, 'preview.jpg')
-            assets['info']['href'] = op.join(base_url, 'tileInfo.json')
-            assets['metadata']['href'] = op.join(base_url, 'metadata.xml')
-            assets['overview']['href'] = op.join(base_url, 'TCI.jp2')
-            assets['B01']['href'] = op.join(base_url, 'B01.jp2')
-            assets['B02']['href'] = op.join(base_url, 'B02.jp2')
-            assets['B03']['href'] = op.join(base_url, 'B03.jp2')
-            assets['B04']['href'] = op.join(base_url, 'B04.jp2')
-            assets['B05']['href'] = op.join(base_url, 'B05.jp2')
-            assets['B06']['href'] = op.join(base_url, 'B06.jp2')
-            assets['B07']['href'] = op.join(base_url, 'B07.jp2')
-            assets['B08']['href'] = op.join(base_url, 'B08.jp2')
-            assets['B8A']['href'] = op.join(base_url, 'B8A.jp2')
-            assets['B09']['href'] = op.join(base_url, 'B09.jp2')
-            assets['B10']['href'] = op.join(base_url, 'B10.jp2')
-            assets['B11']['href'] = op.join(base_url, 'B11.jp2')
-            assets['B12']['href'] = op.join(base_url, 'B12.jp2')
-        elif self.collection == 'sentinel-s2-l2a':
-            # get link back to l1c data
-            s1_base_url = base_url.replace('sentinel-s2-l2a', 'sentinel-s2-l1c')
-            assets['thumbnail']['href'] = op.join(s1_base_url, 'preview.jpg')
-            assets['info']['href'] = op.join(base_url, 'tileInfo.json')
-            assets['metadata']['href'] = op.join(base_url, 'metadata.xml')
-            assets['overview']['href'] = op.join(base_url, 'R10m/TCI.jp2')
-            assets['B02']['href'] = op.join(base_url, 'R10m/B02.jp2')
-            assets['B03']['href'] = op.join(base_url, 'R10m/B03.jp2')
-            assets['B04']['href'] = op.join(base_url, 'R10m/B04.jp2')
-            assets['B08']['href'] = op.join(base_url, 'R10m/B08.jp2')
-            assets['overview_20m']['href'] = op.join(base_url, 'R20m/TCI.jp2')
-            assets['B05']['href'] = op.join(base_url, 'R20m/B05.jp2')
-            assets['B06']['href'] = op.join(base_url, 'R20m/B06.jp2')
-            assets['B07']['href'] = op.join(base_url, 'R20m/B07.jp2')
-            assets['B8A']['href'] = op.join(base_url, 'R20m/B8A.jp2')
-            assets['B11']['href'] = op.join(base_url, 'R20m/B11.jp2')
-            assets['B12']['href'] = op.join(base_url, 'R20m/B12.jp2')
-            assets['overview_60m']['href'] = op.join(base_url, 'R60m/TCI.jp2')
-            assets['B01']['href'] = op.join(base_url, 'R60m/B01.jp2')
-            assets['B09']['href'] = op.join(base_url, 'R60m/B09.jp2')
-            assets['B10']['href'] = op.join(base_url, 'R60m/B10.jp2')
-        else:
+        if self.collection not in ('sentinel-s2-l1c', 'sentinel-s2-l2a'):
             raise Exception(f"Collection {self.collection} not supported")
+        # get link back to l1c data
+        l1c_base_url = base_url.replace('sentinel-s2-l2a', 'sentinel-s2-l1c')
+        assets = ItemTemplate.get(self.collection).get_assets_from_url(base_url, l1c_base_url=l1c_base_url)
         #if dt < datetime(2016,12,6):
         #    del assets['tki']
 
@@ -307,10 +454,17 @@ class SentinelSTAC(object):
             'stac_extensions': ['dtr', 'sat', 'eo'],            
             'id': id,
             'collection': self.collection,
-            'bbox': bbox,
-            'geometry': geom,
+            'bbox': footprint['bbox'],
+            'geometry': footprint['geometry'],
             'properties':props,
             'assets': assets,
             'links': [self.get_collection_link()]
         }
-        return item
\ No newline at end of file
+        return item
+
+
+def _to_stac(task):
+    """ Convert (collection, metadata, base_url) to a STAC Item, used as pipeline transform """
+    collection, metadata, base_url = task
+    with SentinelSTAC.stats.timer('transform'):
+        return SentinelSTAC(collection, metadata).to_stac(base_url=base_url)
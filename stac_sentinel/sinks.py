@@ -0,0 +1,206 @@
+import abc
+import gzip
+import json
+import logging
+import os
+
+import os.path as op
+
+from datetime import timezone
+
+from .encoding import dumps
+from .sentinel import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+class Sink(abc.ABC):
+    """ Destination for STAC Items
+
+    write() is given the Item and, optionally, the Item already encoded as JSON bytes (see
+    encoding.dumps) so an Item written to several sinks is only encoded once. Subclasses must
+    implement write().
+    """
+
+    @abc.abstractmethod
+    def write(self, item, data=None):
+        """ Write (or buffer) item, data is item encoded as JSON bytes or None """
+
+    def flush(self):
+        """ Write buffered Items """
+        pass
+
+    def pop_failed(self):
+        """ Ids of the Items that could not be written (after write() returned) since the last call """
+        return []
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class FileSink(Sink):
+    """ Save each Item as <id>.json in a directory """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, item, data=None):
+        with open(op.join(self.path, '%s.json' % item['id']), 'wb') as f:
+            f.write(dumps(item) if data is None else data)
+
+
+class NDJSONSink(Sink):
+    """ Write Items as newline delimited JSON to files rolled over by number of Items or size
+
+    Files are named <prefix>-00000.ndjson(.gz) and lines are written in batches of batch_size Items.
+    """
+
+    def __init__(self, path, max_items=100000, max_bytes=None, compress=True, prefix='items', batch_size=1000):
+        """ Create NDJSON sink
+        Arguments:
+        path -- Directory to write files to
+
+        Keyword arguments:
+        max_items -- Maximum number of Items per file
+        max_bytes -- Maximum (uncompressed) bytes per file
+        compress -- Compress files with gzip
+        prefix -- Prefix of filenames
+        batch_size -- Number of Items buffered before writing
+        """
+        self.path = path
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.filenames = []
+        self._file = None
+        self._items = 0
+        self._bytes = 0
+        self._buffer = []
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, item, data=None):
+        line = (dumps(item) if data is None else data) + b'\n'
+        full = (self.max_items and self._items >= self.max_items) or \
+               (self.max_bytes and self._bytes and self._bytes + len(line) > self.max_bytes)
+        if full:
+            self.roll()
+        self._buffer.append(line)
+        self._items += 1
+        self._bytes += len(line)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ Write buffered Items to the current file """
+        if not self._buffer:
+            return
+        if self._file is None:
+            ext = '.ndjson.gz' if self.compress else '.ndjson'
+            filename = op.join(self.path, '%s-%05d%s' % (self.prefix, len(self.filenames), ext))
+            self._file = gzip.open(filename, 'wb', compresslevel=6) if self.compress else open(filename, 'wb')
+            self.filenames.append(filename)
+        self._file.write(b''.join(self._buffer))
+        self._buffer = []
+
+    def roll(self):
+        """ Close the current file, following Items are written to a new file """
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            logger.debug('Wrote %s Items to %s' % (self._items, self.filenames[-1]))
+        self._file = None
+        self._items = 0
+        self._bytes = 0
+
+    def close(self):
+        self.roll()
+
+
+class GeoParquetSink(Sink):
+    """ Write a summary of each Item (id, datetime, bbox, geometry, cloud cover, grid square,
+    asset hrefs) to a GeoParquet file, in row groups of batch_size Items. Requires pyarrow """
+
+    def __init__(self, filename, batch_size=10000):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('GeoParquet output requires pyarrow, install with `pip install pyarrow`')
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.filename = filename
+        self.batch_size = batch_size
+        self.schema = self.get_schema()
+        self._writer = None
+        self._rows = []
+
+    def get_schema(self):
+        pa = self.pa
+        geo = {
+            'version': '1.0.0',
+            'primary_column': 'geometry',
+            'columns': {
+                'geometry': {'encoding': 'WKB', 'geometry_types': ['Polygon']}
+            }
+        }
+        fields = [
+            ('id', pa.string()),
+            ('collection', pa.string()),
+            ('datetime', pa.timestamp('us', tz='UTC')),
+            ('bbox', pa.struct([(k, pa.float64()) for k in ['xmin', 'ymin', 'xmax', 'ymax']])),
+            ('eo:cloud_cover', pa.float64()),
+            ('sentinel:grid_square', pa.string()),
+            ('sat:orbit_state', pa.string()),
+            ('assets', pa.map_(pa.string(), pa.string())),
+            ('geometry', pa.binary())
+        ]
+        return pa.schema(fields, metadata={'geo': json.dumps(geo)})
+
+    def to_row(self, item):
+        from shapely import geometry
+        props = item['properties']
+        dt = parse_datetime(props['datetime'])
+        grid_square = None
+        if 'sentinel:grid_square' in props:
+            grid_square = '%s%s%s' % (props['sentinel:utm_zone'], props['sentinel:latitude_band'],
+                                      props['sentinel:grid_square'])
+        return {
+            'id': item['id'],
+            'collection': item['collection'],
+            'datetime': dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc),
+            'bbox': dict(zip(['xmin', 'ymin', 'xmax', 'ymax'], item['bbox'])),
+            'eo:cloud_cover': props.get('eo:cloud_cover'),
+            'sentinel:grid_square': grid_square,
+            'sat:orbit_state': props.get('sat:orbit_state'),
+            'assets': [(k, a['href']) for k, a in item['assets'].items()],
+            'geometry': geometry.shape(item['geometry']).wkb
+        }
+
+    def write(self, item, data=None):
+        self._rows.append(self.to_row(item))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ Write buffered Items as a row group """
+        if not self._rows:
+            return
+        if self._writer is None:
+            self._writer = self.pq.ParquetWriter(self.filename, self.schema)
+        self._writer.write_table(self.pa.Table.from_pylist(self._rows, schema=self.schema))
+        self._rows = []
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -0,0 +1,122 @@
+import logging
+import sqlite3
+import threading
+
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS keys (
+    url TEXT PRIMARY KEY,
+    last_modified TEXT,
+    etag TEXT,
+    status TEXT NOT NULL,
+    item_id TEXT,
+    error TEXT,
+    updated TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS keys_status ON keys (status);
+"""
+
+
+class StateStore(object):
+    """ SQLite record of the outcome of converting each inventory key
+
+    Outcomes are buffered and written in transactions of batch_size records.
+    """
+
+    OK = 'ok'
+    ERROR = 'error'
+
+    def __init__(self, filename, batch_size=1000):
+        self.filename = filename
+        self.batch_size = batch_size
+        # used from the pipeline feeder thread and the consuming thread
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def record(self, record, item_id=None, error=None):
+        """ Record outcome for an inventory record (with url, LastModifiedDate and optional ETag) """
+        status = self.OK if error is None else self.ERROR
+        self.pending.append((record['url'], record.get('LastModifiedDate'), record.get('ETag'), status,
+                             item_id, None if error is None else str(error), datetime.utcnow().isoformat()))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ Write buffered outcomes """
+        with self.lock:
+            if self.pending:
+                with self.db:
+                    self.db.executemany('INSERT OR REPLACE INTO keys VALUES (?, ?, ?, ?, ?, ?, ?)', self.pending)
+                self.pending = []
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def get(self, urls):
+        """ Get stored (last_modified, etag, status) for each of urls """
+        with self.lock:
+            sql = 'SELECT url, last_modified, etag, status FROM keys WHERE url IN (%s)' % ','.join('?' * len(urls))
+            return {row[0]: row[1:] for row in self.db.execute(sql, urls)}
+
+    def skip(self, records, resume=False, delta=False, chunk_size=500):
+        """ Generator returning inventory records that have not been processed
+        Keyword arguments:
+        resume -- Skip records that have an outcome, successful or not
+        delta -- Skip records successfully converted that have not changed (LastModifiedDate and ETag)
+        """
+        if not (resume or delta):
+            yield from records
+            return
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == chunk_size:
+                yield from self._skip(chunk, resume, delta)
+                chunk = []
+        yield from self._skip(chunk, resume, delta)
+
+    def _skip(self, records, resume, delta):
+        if not records:
+            return
+        stored = self.get([r['url'] for r in records])
+        for record in records:
+            state = stored.get(record['url'])
+            if state is None:
+                yield record
+                continue
+            last_modified, etag, status = state
+            if resume:
+                continue
+            unchanged = last_modified == record.get('LastModifiedDate') and etag == record.get('ETag')
+            if status == self.OK and unchanged:
+                continue
+            yield record
+
+    def failed(self):
+        """ Generator returning inventory records for keys that failed to convert """
+        with self.lock:
+            rows = self.db.execute('SELECT url, last_modified, etag FROM keys WHERE status = ?',
+                                   (self.ERROR,)).fetchall()
+        for url, last_modified, etag in rows:
+            bucket, key = url[5:].split('/', 1)
+            record = {'Bucket': bucket, 'Key': key, 'LastModifiedDate': last_modified, 'url': url}
+            if etag is not None:
+                record['ETag'] = etag
+            yield record
+
+    def counts(self):
+        """ Number of keys for each status """
+        with self.lock:
+            return dict(self.db.execute('SELECT status, COUNT(*) FROM keys GROUP BY status'))
@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram(object):
+    """ Latency histogram with fixed buckets """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(self.buckets) and seconds > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def percentile(self, pct):
+        """ Estimate of percentile pct (0-100), interpolated within a bucket """
+        if not self.count:
+            return None
+        rank = self.count * pct / 100.0
+        total = 0
+        for i, n in enumerate(self.counts):
+            if n and total + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - total) / n
+            total += n
+        return self.buckets[-1]
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts))
+        }
+
+
+class Stats(object):
+    """ Counters, errors by type and latency histograms for each stage of the ingest
+
+    Stages are timed with the timer context manager, for instance:
+
+        with stats.timer('fetch'):
+            ...
+
+    Statistics are recorded in the process they are created in, stages run in worker processes
+    (transform with processes=True) are not recorded.
+    """
+
+    def __init__(self, interval=60, filename=None):
+        """ Create statistics
+        Keyword arguments:
+        interval -- Seconds between summaries logged (and written to filename) by report()
+        filename -- Write statistics to this file when reporting, Prometheus text format if it ends
+                    with .prom, otherwise JSON
+        """
+        self.interval = interval
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.errors = {}
+            self.histograms = {}
+            self.start = self.last_report = time.time()
+            self.last_counters = {}
+
+    def incr(self, name, n=1):
+        """ Increment counter name by n """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def error(self, stage, err):
+        """ Count an error in stage, by type of error """
+        key = (stage, type(err).__name__)
+        with self.lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def observe(self, stage, seconds):
+        """ Record the time taken by stage """
+        with self.lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """ Context manager timing stage, errors raised are counted for the stage """
+        t = time.perf_counter()
+        try:
+            yield
+        except Exception as err:
+            self.error(stage, err)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - t)
+
+    def to_dict(self):
+        """ All statistics as a dictionary """
+        with self.lock:
+            elapsed = time.time() - self.start
+            return {
+                'elapsed': elapsed,
+                'counters': dict(self.counters),
+                'rates': {k: v / elapsed if elapsed else None for k, v in self.counters.items()},
+                'errors': {'%s:%s' % k: v for k, v in self.errors.items()},
+                'stages': {k: h.to_dict() for k, h in self.histograms.items()}
+            }
+
+    def to_prometheus(self, prefix='stac_sentinel'):
+        """ All statistics in the Prometheus text exposition format """
+        with self.lock:
+            lines = []
+            for name, value in sorted(self.counters.items()):
+                lines.append('# TYPE %s_%s_total counter' % (prefix, name))
+                lines.append('%s_%s_total %s' % (prefix, name, value))
+            lines.append('# TYPE %s_errors_total counter' % prefix)
+            for (stage, kind), value in sorted(self.errors.items()):
+                lines.append('%s_errors_total{stage="%s",type="%s"} %s' % (prefix, stage, kind, value))
+            lines.append('# TYPE %s_stage_seconds histogram' % prefix)
+            for stage, hist in sorted(self.histograms.items()):
+                total = 0
+                for le, n in zip([repr(b) for b in hist.buckets] + ['+Inf'], hist.counts):
+                    total += n
+                    lines.append('%s_stage_seconds_bucket{stage="%s",le="%s"} %s' % (prefix, stage, le, total))
+                lines.append('%s_stage_seconds_sum{stage="%s"} %s' % (prefix, stage, hist.sum))
+                lines.append('%s_stage_seconds_count{stage="%s"} %s' % (prefix, stage, hist.count))
+            lines.append('# TYPE %s_elapsed_seconds gauge' % prefix)
+            lines.append('%s_elapsed_seconds %s' % (prefix, time.time() - self.start))
+            return '\n'.join(lines) + '\n'
+
+    def save(self, filename=None):
+        """ Write statistics to filename (default self.filename), replacing it atomically """
+        filename = filename or self.filename
+        data = self.to_prometheus() if filename.endswith('.prom') else json.dumps(self.to_dict(), indent=2)
+        tmp = '%s.%s.tmp' % (filename, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, filename)
+
+    def summary(self):
+        """ Summary of throughput since the start and since the last summary, and time spent in each stage """
+        with self.lock:
+            now = time.time()
+            elapsed, since = now - self.start, now - self.last_report
+            counts = []
+            for name, value in sorted(self.counters.items()):
+                recent = (value - self.last_counters.get(name, 0)) / since if since else 0
+                counts.append('%s %s (%.1f/s, recent %.1f/s)' % (name, value, value / elapsed if elapsed else 0,
+                                                                  recent))
+            stages = ['%s %s x %.1fms (p50 %.1fms, p90 %.1fms)' % (
+                stage, h.count, h.sum / h.count * 1000, h.percentile(50) * 1000, h.percentile(90) * 1000)
+                for stage, h in sorted(self.histograms.items()) if h.count]
+            errors = ['%s:%s %s' % (k[0], k[1], v) for k, v in sorted(self.errors.items())]
+            self.last_report, self.last_counters = now, dict(self.counters)
+        parts = ['%.0fs' % elapsed, ', '.join(counts)]
+        if stages:
+            parts.append('stages: ' + ', '.join(stages))
+        if errors:
+            parts.append('errors: ' + ', '.join(errors))
+        return '; '.join(parts)
+
+    def report(self, force=False):
+        """ Log summary (and save to filename) if interval seconds have passed since the last report """
+        if not force and (self.interval is None or time.time() - self.last_report < self.interval):
+            return
+        logger.info(self.summary())
+        if self.filename:
+            self.save()
@@ -0,0 +1,125 @@
+import json
+import os.path as op
+import threading
+
+from copy import deepcopy
+
+# Asset hrefs for each collection, relative to the scene base_url ({base}) or to the
+# base_url of the matching L1C scene ({l1c_base})
+HREFS = {
+    'sentinel-s2-l1c': {
+        'thumbnail': '{base}preview.jpg',
+        'info': '{base}tileInfo.json',
+        'metadata': '{base}metadata.xml',
+        'overview': '{base}TCI.jp2',
+        'B01': '{base}B01.jp2',
+        'B02': '{base}B02.jp2',
+        'B03': '{base}B03.jp2',
+        'B04': '{base}B04.jp2',
+        'B05': '{base}B05.jp2',
+        'B06': '{base}B06.jp2',
+        'B07': '{base}B07.jp2',
+        'B08': '{base}B08.jp2',
+        'B8A': '{base}B8A.jp2',
+        'B09': '{base}B09.jp2',
+        'B10': '{base}B10.jp2',
+        'B11': '{base}B11.jp2',
+        'B12': '{base}B12.jp2'
+    },
+    'sentinel-s2-l2a': {
+        'thumbnail': '{l1c_base}preview.jpg',
+        'info': '{base}tileInfo.json',
+        'metadata': '{base}metadata.xml',
+        'overview': '{base}R10m/TCI.jp2',
+        'B02': '{base}R10m/B02.jp2',
+        'B03': '{base}R10m/B03.jp2',
+        'B04': '{base}R10m/B04.jp2',
+        'B08': '{base}R10m/B08.jp2',
+        'overview_20m': '{base}R20m/TCI.jp2',
+        'B05': '{base}R20m/B05.jp2',
+        'B06': '{base}R20m/B06.jp2',
+        'B07': '{base}R20m/B07.jp2',
+        'B8A': '{base}R20m/B8A.jp2',
+        'B11': '{base}R20m/B11.jp2',
+        'B12': '{base}R20m/B12.jp2',
+        'overview_60m': '{base}R60m/TCI.jp2',
+        'B01': '{base}R60m/B01.jp2',
+        'B09': '{base}R60m/B09.jp2',
+        'B10': '{base}R60m/B10.jp2'
+    }
+}
+
+_templates = {}
+_lock = threading.Lock()
+
+
+def load_collection(collection):
+    """ Read STAC Collection JSON included with the package """
+    filename = op.join(op.dirname(__file__), '%s.json' % collection)
+    with open(filename) as f:
+        return json.loads(f.read())
+
+
+def prefix(url):
+    """ url as a prefix for relative paths, equivalent to os.path.join(url, path) """
+    return url if url == '' or url.endswith('/') else url + '/'
+
+
+class ItemTemplate(object):
+    """ Collection metadata compiled once for creating Items
+
+    Asset definitions from the Collection are kept in a skeleton that is never handed out,
+    each Item gets a copy of the asset dictionaries (and their lists), while the remaining
+    nested values (e.g., eo:bands entries) are shared between Items and must not be
+    modified in place.
+    """
+
+    def __init__(self, collection):
+        self.collection_id = collection
+        self.collection = load_collection(collection)
+        self.assets = tuple(self.collection['assets'].items())
+        # compile href patterns into (key, asset, use l1c_base, path) for string concatenation
+        hrefs = HREFS.get(collection, {})
+        self.hrefs = []
+        for key, asset in self.assets:
+            if key in hrefs:
+                base, path = hrefs[key][1:].split('}', 1)
+                self.hrefs.append((key, asset, base == 'l1c_base', path))
+
+    @classmethod
+    def get(cls, collection):
+        """ Get the compiled template for collection, compiling it on first use """
+        template = _templates.get(collection)
+        if template is None:
+            with _lock:
+                template = _templates.get(collection)
+                if template is None:
+                    template = _templates[collection] = cls(collection)
+        return template
+
+    def get_collection(self):
+        """ Get a copy of the STAC Collection JSON """
+        return deepcopy(self.collection)
+
+    def get_assets(self, hrefs):
+        """ Get assets for the keys in hrefs, with their href set """
+        assets = {}
+        for key, asset in self.assets:
+            if key in hrefs:
+                assets[key] = _copy(asset)
+                assets[key]['href'] = hrefs[key]
+        return assets
+
+    def get_assets_from_url(self, base_url, l1c_base_url=None):
+        """ Get assets with hrefs from the collection's href patterns """
+        base = prefix(base_url)
+        l1c_base = base if l1c_base_url is None else prefix(l1c_base_url)
+        assets = {}
+        for key, asset, use_l1c, path in self.hrefs:
+            assets[key] = _copy(asset)
+            assets[key]['href'] = (l1c_base if use_l1c else base) + path
+        return assets
+
+
+def _copy(asset):
+    return {k: (list(v) if type(v) is list else v) for k, v in asset.items()}
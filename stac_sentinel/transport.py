@@ -0,0 +1,280 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import os.path as op
+
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class TransportError(Exception):
+    """ Raised when a URL can not be read """
+
+    def __init__(self, url, message, status=None):
+        super(TransportError, self).__init__('%s: %s' % (url, message))
+        self.url = url
+        self.status = status
+
+
+class Transport(object):
+    """ Pooled, retrying reader of HTTP(S), S3 and local files
+
+    A single requests Session (keep-alive connection pool) and a single boto3 S3 client are
+    created on first use and shared by all threads using the transport. requests and boto3
+    are only imported when first used.
+    """
+
+    # HTTP status codes that are retried
+    retry_status = (429, 500, 502, 503, 504)
+
+    def __init__(self, region='eu-central-1', requester_pays=True, pool_size=32, retries=5,
+                 backoff=0.5, max_backoff=30, timeout=60):
+        """ Create transport
+        Keyword arguments:
+        region -- AWS region used for the S3 client
+        requester_pays -- Make S3 requests as requester pays
+        pool_size -- Maximum number of connections kept open per host
+        retries -- Number of times a failed request is retried
+        backoff -- Base delay, in seconds, between retries (grows exponentially, with jitter)
+        max_backoff -- Maximum delay, in seconds, between retries
+        timeout -- Timeout, in seconds, for connecting and reading a response
+        """
+        self.region = region
+        self.requester_pays = requester_pays
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._session = None
+        self._s3 = None
+
+    def _reset(self):
+        # connections can not be shared with forked processes
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._session = None
+            self._s3 = None
+
+    @property
+    def session(self):
+        """ requests Session with a connection pool sized for pool_size threads """
+        with self._lock:
+            self._reset()
+            if self._session is None:
+                import requests
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size,
+                                                        pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    @property
+    def s3(self):
+        """ boto3 S3 client """
+        with self._lock:
+            self._reset()
+            if self._s3 is None:
+                import boto3
+                from botocore.config import Config
+                config = Config(max_pool_connections=self.pool_size,
+                                retries={'max_attempts': self.retries, 'mode': 'standard'},
+                                connect_timeout=self.timeout, read_timeout=self.timeout)
+                self._s3 = boto3.client('s3', region_name=self.region, config=config)
+            return self._s3
+
+    def delay(self, attempt):
+        """ Delay before retry number attempt, exponential backoff with full jitter """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def get(self, url):
+        """ Read contents of url (s3://, http(s):// or local filename) as bytes """
+        if url.startswith('s3://'):
+            return self.get_s3(url)
+        elif url.startswith('http://') or url.startswith('https://'):
+            return self.get_http(url)
+        elif op.exists(url):
+            with open(url, 'rb') as f:
+                return f.read()
+        raise TransportError(url, 'File not found', status=404)
+
+    def get_text(self, url):
+        """ Read contents of url as text """
+        return self.get(url).decode('utf-8')
+
+    def get_json(self, url):
+        """ Read contents of url as JSON """
+        return json.loads(self.get(url))
+
+    def iter_content(self, url, chunk_size=65536):
+        """ Generator returning contents of url in chunks, reading stops if the generator is closed """
+        if url.startswith('s3://'):
+            body = self.get_object(url)['Body']
+            try:
+                for chunk in iter(lambda: body.read(chunk_size), b''):
+                    yield chunk
+            finally:
+                body.close()
+        elif url.startswith('http://') or url.startswith('https://'):
+            resp = self.request_http(url, stream=True)
+            try:
+                for chunk in resp.iter_content(chunk_size):
+                    yield chunk
+            finally:
+                resp.close()
+        elif op.exists(url):
+            with open(url, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    yield chunk
+        else:
+            raise TransportError(url, 'File not found', status=404)
+
+    def get_http(self, url, **kwargs):
+        """ GET an HTTP(S) URL """
+        return self.request_http(url, **kwargs).content
+
+    def post(self, url, data, headers=None):
+        """ POST data (bytes) to an HTTP(S) URL
+        Returns:
+        requests Response
+        """
+        return self.request_http(url, method='POST', data=data, headers=headers)
+
+    def put(self, url, data, headers=None):
+        """ PUT data (bytes) to an HTTP(S) URL
+        Returns:
+        requests Response
+        """
+        return self.request_http(url, method='PUT', data=data, headers=headers)
+
+    def request_http(self, url, method='GET', **kwargs):
+        """ Request an HTTP(S) URL, retrying connection errors and retryable status codes """
+        import requests
+        attempt = 0
+        while True:
+            try:
+                resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                if resp.status_code < 400:
+                    return resp
+                resp.close()
+                err = TransportError(url, 'HTTP status %s' % resp.status_code, status=resp.status_code)
+                if resp.status_code not in self.retry_status:
+                    raise err
+                wait = resp.headers.get('Retry-After', '')
+                wait = float(wait) if wait.isdigit() else 0
+            except (requests.ConnectionError, requests.Timeout) as _err:
+                err = TransportError(url, str(_err))
+                wait = 0
+            if attempt >= self.retries:
+                raise err
+            wait = max(wait, self.delay(attempt))
+            attempt += 1
+            logger.warning('Retrying %s in %.2f seconds (%s)' % (url, wait, err))
+            time.sleep(wait)
+
+    def get_conditional(self, url, etag=None, last_modified=None):
+        """ Read contents of url if it has changed since it was read with etag and last_modified (as returned
+        by an earlier call), local files are always read
+        Returns:
+        Tuple of (contents, or None if not modified, etag, last_modified)
+        """
+        if url.startswith('s3://'):
+            try:
+                resp = self.get_object(url, **({'IfNoneMatch': etag} if etag else {}))
+            except TransportError as err:
+                if err.status == 304:
+                    return None, etag, last_modified
+                raise
+            modified = resp.get('LastModified')
+            return resp['Body'].read(), resp.get('ETag'), None if modified is None else modified.isoformat()
+        elif url.startswith('http://') or url.startswith('https://'):
+            headers = {}
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+            resp = self.request_http(url, headers=headers)
+            if resp.status_code == 304:
+                resp.close()
+                return None, etag, last_modified
+            return resp.content, resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+        return self.get(url), None, None
+
+    def get_object(self, url, **kwargs):
+        """ Get S3 object response, error responses are retried by the S3 client
+        Keyword arguments are passed to the S3 client get_object (e.g. IfNoneMatch)
+        """
+        from botocore.exceptions import ClientError
+        parts = urlparse(url)
+        kwargs.update({'Bucket': parts.netloc, 'Key': parts.path.lstrip('/')})
+        if self.requester_pays:
+            kwargs['RequestPayer'] = 'requester'
+        try:
+            return self.s3.get_object(**kwargs)
+        except ClientError as err:
+            status = err.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+            raise TransportError(url, str(err), status=status)
+
+    def get_s3(self, url):
+        """ GET an S3 object, retrying errors reading the body """
+        from botocore.exceptions import BotoCoreError
+        attempt = 0
+        while True:
+            try:
+                return self.get_object(url)['Body'].read()
+            except BotoCoreError as _err:
+                err = TransportError(url, str(_err))
+            if attempt >= self.retries:
+                raise err
+            wait = self.delay(attempt)
+            attempt += 1
+            logger.warning('Retrying %s in %.2f seconds (%s)' % (url, wait, err))
+            time.sleep(wait)
+
+
+class LocalTransport(Transport):
+    """ Stand-in transport reading URLs from a dictionary or a local directory
+
+    With a directory, s3://bucket/key and http(s)://host/path are read from root/bucket/key
+    and root/host/path respectively.
+    """
+
+    def __init__(self, root=None, files=None, **kwargs):
+        super(LocalTransport, self).__init__(**kwargs)
+        self.root = root
+        self.files = files or {}
+        self.requests = []
+
+    def get(self, url):
+        self.requests.append(url)
+        if url in self.files:
+            data = self.files[url]
+            return data.encode('utf-8') if isinstance(data, str) else data
+        if self.root is not None:
+            parts = urlparse(url)
+            if parts.scheme in ('s3', 'http', 'https'):
+                filename = op.join(self.root, parts.netloc, parts.path.lstrip('/'))
+                if op.exists(filename):
+                    with open(filename, 'rb') as f:
+                        return f.read()
+        if op.exists(url):
+            with open(url, 'rb') as f:
+                return f.read()
+        raise TransportError(url, 'File not found', status=404)
+
+    def get_conditional(self, url, etag=None, last_modified=None):
+        return self.get(url), None, None
+
+    def iter_content(self, url, chunk_size=65536):
+        data = self.get(url)
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
@@ -0,0 +1,259 @@
+import json
+import logging
+import os.path as op
+import re
+import threading
+import zlib
+
+from concurrent.futures import ProcessPoolExecutor, wait as wait_futures
+
+from .encoding import dumps
+from .sentinel import SentinelSTAC
+from .sinks import Sink
+
+logger = logging.getLogger(__name__)
+
+# STAC 0.9.0 and GeoJSON schemas vendored in SCHEMAS_PATH (see its README), by the URL they are published at
+SCHEMAS_PATH = op.join(op.dirname(__file__), 'schemas')
+SCHEMA_URLS = {
+    'https://schemas.stacspec.org/': '',
+    'https://geojson.org/schema/': 'geojson/'
+}
+ITEM_SCHEMA = 'https://schemas.stacspec.org/v0.9.0/item-spec/json-schema/item.json'
+EXTENSION_SCHEMA = 'https://schemas.stacspec.org/v0.9.0/extensions/%s/json-schema/schema.json'
+
+
+def load_schema(url, path=SCHEMAS_PATH):
+    """ Load a schema by URL from the schemas vendored in path, schemas are not fetched from the network """
+    url = url.split('#')[0]
+    for prefix, dirname in SCHEMA_URLS.items():
+        if url.startswith(prefix):
+            filename = op.join(path, dirname, url[len(prefix):])
+            if op.exists(filename):
+                with open(filename) as f:
+                    return json.load(f)
+    raise ValueError('Schema %s is not in %s' % (url, path))
+
+
+def compile_schema(url, path=SCHEMAS_PATH, extension=False):
+    """ Compile the schema at url, and the schemas it references, into a validation function with fastjsonschema
+
+    The function raises a fastjsonschema.JsonSchemaValueException for the first error in a value. The
+    schema of an extension is compiled without the Item schema it includes, which is checked separately.
+    """
+    try:
+        import fastjsonschema
+    except ImportError:
+        raise ImportError('Validation requires fastjsonschema, install with `pip install stac-sentinel[validate]`')
+    schema = load_schema(url, path)
+    if extension:
+        schema = dict(schema, allOf=[s for s in schema.get('allOf', [])
+                                     if not s.get('$ref', '').endswith('item.json')])
+    return fastjsonschema.compile(schema, handlers={'https': lambda uri: load_schema(uri, path)})
+
+
+def field(path):
+    """ Field of an error path, with array indices removed so errors can be counted by field """
+    return re.sub(r'\[\d+\]', '[]', path)
+
+
+def sampled(id, rate):
+    """ Whether the Item id is in a sample of rate (0 to 1) of Items, the same Items for every run """
+    return rate >= 1 or zlib.crc32(id.encode('utf-8')) < rate * 2 ** 32
+
+
+class ItemValidator(object):
+    """ Validate STAC Items against the STAC 0.9.0 Item schema and the schemas of the extensions they declare
+
+    The schemas, transcribed from STAC 0.9.0 into the schemas directory (see its README for how they
+    differ from the published ones), are compiled once with fastjsonschema, which reports the first
+    error found by each schema. Extensions without a schema (e.g. dtr, which became
+    common metadata in 0.9.0) are not checked. Extensions are checked with the Item properties added to
+    the properties of its Collection, as common properties (e.g. eo:bands) are only in the Collection.
+    """
+
+    def __init__(self, path=SCHEMAS_PATH):
+        """ Create validator
+        Keyword arguments:
+        path -- Directory of the schemas, laid out as the URLs they are published at (see SCHEMA_URLS)
+        """
+        self.path = path
+        self.check_item = compile_schema(ITEM_SCHEMA, path)
+        from fastjsonschema import JsonSchemaValueException
+        self.exception = JsonSchemaValueException
+        self.check_extensions = {}
+        self.common_properties = {}
+
+    def get_extension(self, name):
+        """ Validation function of an extension, None if it has no schema """
+        if name not in self.check_extensions:
+            try:
+                check = compile_schema(EXTENSION_SCHEMA % name, self.path, extension=True)
+            except ValueError:
+                check = None
+            self.check_extensions[name] = check
+        return self.check_extensions[name]
+
+    def get_common_properties(self, collection):
+        """ Properties of a Collection, shared by its Items """
+        props = self.common_properties.get(collection)
+        if props is None:
+            try:
+                props = SentinelSTAC(collection, {}).get_collection().get('properties', {})
+            except Exception:
+                props = {}
+            self.common_properties[collection] = props
+        return props
+
+    def check(self, check, item, errors):
+        """ Check an Item with a validation function, adding (path, message) of the error to errors """
+        try:
+            check(item)
+        except self.exception as err:
+            # e.g. data.properties.datetime must be date-time
+            message = err.message[len(err.name) + 1:] if err.message.startswith(err.name) else err.message
+            errors.append((err.name[5:], message))
+
+    def validate(self, item):
+        """ Validate an Item
+        Returns:
+        List of (path, message) of the errors found, empty if the Item is valid
+        """
+        errors = []
+        self.check(self.check_item, item, errors)
+        extensions = item.get('stac_extensions')
+        if isinstance(extensions, list) and isinstance(item.get('properties'), dict):
+            common = self.get_common_properties(item.get('collection'))
+            if common:
+                item = dict(item, properties=dict(common, **item['properties']))
+            for name in extensions:
+                check = self.get_extension(name) if isinstance(name, str) else None
+                if check is not None:
+                    self.check(check, item, errors)
+        return errors
+
+
+# validator of each worker process
+_validator = None
+
+
+def _validate_batch(batch):
+    """ Validate Items encoded as JSON bytes, returning (id, errors) of the invalid Items """
+    global _validator
+    if _validator is None:
+        _validator = ItemValidator()
+    invalid = []
+    for data in batch:
+        item = json.loads(data)
+        errors = _validator.validate(item)
+        if errors:
+            invalid.append((item.get('id'), errors))
+    return invalid
+
+
+class ValidationSink(Sink):
+    """ Validate Items, or a sample of Items, counting errors by field
+
+    Items are validated in batches of batch_size by a pool of processes, so validating does not slow
+    down the conversion, or in the thread writing Items with workers=0. At most max_in_flight
+    batches are queued or being validated, write() blocks when that limit is reached.
+    """
+
+    def __init__(self, rate=1.0, workers=2, batch_size=100, max_in_flight=None, max_logged=10, stats=None):
+        """ Create validation sink
+        Keyword arguments:
+        rate -- Fraction of Items validated, selected by Item id (see sampled)
+        workers -- Number of processes validating Items, 0 to validate in the calling thread
+        batch_size -- Number of Items sent to a process at a time
+        max_in_flight -- Maximum number of batches queued or being validated (default 2 * workers)
+        max_logged -- Number of invalid Items that are logged with all their errors
+        stats -- Stats the number of validated and invalid Items are counted in (default SentinelSTAC.stats)
+        """
+        self.rate = rate
+        self.batch_size = batch_size
+        self.max_logged = max_logged
+        self.stats = SentinelSTAC.stats if stats is None else stats
+        # also compiled when validating in processes, so a missing fastjsonschema is reported here
+        self.validator = ItemValidator()
+        self.executor = ProcessPoolExecutor(workers) if workers > 0 else None
+        self.in_flight = threading.BoundedSemaphore(max_in_flight or 2 * max(1, workers))
+        self.lock = threading.Lock()
+        self.futures = set()
+        self.batch = []
+        self.validated = 0
+        self.invalid = 0
+        # count of each (field, message)
+        self.errors = {}
+
+    def write(self, item, data=None):
+        """ Validate the Item if it is in the sample """
+        if not sampled(item['id'], self.rate):
+            return
+        if self.executor is None:
+            errors = self.validator.validate(item)
+            self.add_results(1, [(item['id'], errors)] if errors else [])
+            return
+        self.batch.append(dumps(item) if data is None else data)
+        if len(self.batch) >= self.batch_size:
+            self.submit()
+
+    def submit(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        self.in_flight.acquire()
+        future = self.executor.submit(_validate_batch, batch)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(lambda f: self._done(f, len(batch)))
+
+    def _done(self, future, count):
+        with self.lock:
+            self.futures.discard(future)
+        self.in_flight.release()
+        if future.exception() is not None:
+            logger.error('Error validating Items: %s' % future.exception())
+            return
+        self.add_results(count, future.result())
+
+    def add_results(self, count, invalid):
+        """ Count validated Items and the errors of the invalid ones """
+        with self.lock:
+            self.validated += count
+            for id, errors in invalid:
+                self.invalid += 1
+                if self.invalid <= self.max_logged:
+                    logger.warning('Invalid Item %s: %s' % (id, '; '.join('%s %s' % e for e in errors)))
+                for path, message in errors:
+                    key = (field(path), message)
+                    self.errors[key] = self.errors.get(key, 0) + 1
+        self.stats.incr('validated', count)
+        if invalid:
+            self.stats.incr('invalid', len(invalid))
+
+    def flush(self):
+        """ Wait for the Items written to be validated """
+        if self.executor is None:
+            return
+        self.submit()
+        with self.lock:
+            futures = list(self.futures)
+        wait_futures(futures)
+
+    def close(self):
+        """ Validate remaining Items and log the number of errors by field """
+        if self.executor is not None:
+            self.submit()
+            self.executor.shutdown(wait=True)
+        for (path, message), count in sorted(self.errors.items(), key=lambda e: -e[1]):
+            logger.warning('%s Items: %s %s' % (count, path, message))
+        logger.info('Validated %s Items, %s invalid' % (self.validated, self.invalid))
+
+    def to_dict(self):
+        """ Number of validated and invalid Items, and of errors by field """
+        with self.lock:
+            return {
+                'validated': self.validated,
+                'invalid': self.invalid,
+                'errors': {'%s %s' % k: v for k, v in sorted(self.errors.items(), key=lambda e: -e[1])}
+            }
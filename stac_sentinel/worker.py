@@ -0,0 +1,327 @@
+import json
+import logging
+import signal
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from .changes import content_hash
+from .encoding import dumps
+from .notifications import items_from_messages
+from .sentinel import SentinelSTAC
+
+logger = logging.getLogger(__name__)
+
+# limit of SQS ReceiveMessage and DeleteMessageBatch requests
+SQS_BATCH_SIZE = 10
+
+
+class SQSQueue(object):
+    """ SQS queue of new scene notifications, read with long polling
+
+    Messages are dictionaries of id, receipt (handle) and body.
+    """
+
+    def __init__(self, url, client=None, wait_time=20, visibility_timeout=None):
+        """ Create queue
+        Arguments:
+        url -- SQS queue URL
+
+        Keyword arguments:
+        client -- boto3 SQS client, created for the region of the queue if not provided
+        wait_time -- Seconds to wait for messages (long polling, up to 20)
+        visibility_timeout -- Seconds received messages are hidden from other receivers (default of the queue)
+        """
+        self.url = url
+        if client is None:
+            import boto3
+            # https://sqs.<region>.amazonaws.com/<account>/<name>
+            client = boto3.client('sqs', region_name=urlparse(url).netloc.split('.')[1])
+        self.client = client
+        self.wait_time = wait_time
+        self.visibility_timeout = visibility_timeout
+
+    def receive(self, max_messages=SQS_BATCH_SIZE):
+        """ Receive up to max_messages, waiting up to wait_time seconds for the first ones """
+        messages = []
+        wait = self.wait_time
+        while len(messages) < max_messages:
+            kwargs = {
+                'QueueUrl': self.url,
+                'MaxNumberOfMessages': min(SQS_BATCH_SIZE, max_messages - len(messages)),
+                'WaitTimeSeconds': wait
+            }
+            if self.visibility_timeout is not None:
+                kwargs['VisibilityTimeout'] = self.visibility_timeout
+            received = self.client.receive_message(**kwargs).get('Messages', [])
+            if not received:
+                break
+            messages += [{'id': m['MessageId'], 'receipt': m['ReceiptHandle'], 'body': m['Body']} for m in received]
+            # only wait for the first messages
+            wait = 0
+        return messages
+
+    def delete(self, messages):
+        """ Delete (acknowledge) messages with DeleteMessageBatch requests
+        Returns:
+        List of ids of messages that could not be deleted
+        """
+        failed = []
+        for i in range(0, len(messages), SQS_BATCH_SIZE):
+            batch = messages[i:i + SQS_BATCH_SIZE]
+            entries = [{'Id': str(j), 'ReceiptHandle': m['receipt']} for j, m in enumerate(batch)]
+            resp = self.client.delete_message_batch(QueueUrl=self.url, Entries=entries)
+            for f in resp.get('Failed', []):
+                logger.error('Error deleting message %s: %s' % (batch[int(f['Id'])]['id'], f.get('Message')))
+                failed.append(batch[int(f['Id'])]['id'])
+        return failed
+
+
+class LocalQueue(object):
+    """ In-memory stand-in for SQSQueue, for tests
+
+    Received messages are kept in in_flight until deleted, release() returns them to the queue as
+    when their visibility timeout expires.
+    """
+
+    def __init__(self, bodies=()):
+        self.messages = deque()
+        self.in_flight = {}
+        self.deleted = []
+        self.count = 0
+        self.lock = threading.Lock()
+        for body in bodies:
+            self.put(body)
+
+    def put(self, body):
+        """ Add message, returning its id """
+        with self.lock:
+            self.count += 1
+            id = str(self.count)
+            self.messages.append({'id': id, 'receipt': 'receipt-%s' % id, 'body': body})
+            return id
+
+    def receive(self, max_messages=SQS_BATCH_SIZE):
+        messages = []
+        with self.lock:
+            while self.messages and len(messages) < max_messages:
+                message = self.messages.popleft()
+                self.in_flight[message['id']] = message
+                messages.append(message)
+        return messages
+
+    def delete(self, messages):
+        with self.lock:
+            for message in messages:
+                self.in_flight.pop(message['id'], None)
+                self.deleted.append(message['id'])
+        return []
+
+    def release(self):
+        """ Return messages received but not deleted to the queue """
+        with self.lock:
+            self.messages.extend(self.in_flight.values())
+            self.in_flight = {}
+
+
+class Worker(object):
+    """ Long-running conversion of new scene notifications from a queue to STAC Items
+
+    Messages are received in micro-batches of up to batch_size. The metadata of all scenes in a batch
+    is fetched concurrently from a pool of threads kept for the life of the worker, and the Items are
+    written to the sinks and published. Once the sinks are flushed and the Items published, the messages
+    are deleted from the queue in bulk. Messages that failed are not deleted, and are received again
+    after their visibility timeout.
+
+    An error receiving, processing or deleting a batch is logged and counted, and the worker waits
+    (backoff, doubling with each consecutive error up to max_backoff seconds) before receiving again.
+    Messages of the batch are received again after their visibility timeout.
+
+    The worker stops on SIGTERM or SIGINT (when run in the main thread), or stop(), after completing
+    the batch in progress.
+    """
+
+    def __init__(self, queue, sinks=None, publishers=None, changes=None, batch_size=SQS_BATCH_SIZE, workers=16,
+                 backoff=1, max_backoff=60):
+        """ Create worker
+        Arguments:
+        queue -- SQSQueue or LocalQueue
+
+        Keyword arguments:
+        sinks -- List of Sinks Items are written to
+        publishers -- Dictionary of collection: SNSPublisher Items are published with, a publisher for the
+                      key None is used for all other collections
+        changes -- ChangeStore, Items that have not changed are not written or published
+        batch_size -- Maximum number of messages processed together
+        workers -- Number of threads fetching metadata
+        backoff -- Seconds to wait after an error, doubled for each consecutive error
+        max_backoff -- Maximum seconds to wait after an error
+        """
+        self.queue = queue
+        self.sinks = sinks or []
+        self.publishers = publishers or {}
+        self.changes = changes
+        self.batch_size = batch_size
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.executor = ThreadPoolExecutor(workers)
+        self.stats = SentinelSTAC.stats
+        self.running = False
+        self.stopped = threading.Event()
+
+    def stop(self, *args):
+        """ Stop after the batch in progress """
+        if self.running:
+            logger.info('Stopping after the batch in progress')
+        self.running = False
+        self.stopped.set()
+
+    def get_publisher(self, collection):
+        return self.publishers.get(collection, self.publishers.get(None))
+
+    def process(self, messages):
+        """ Convert, output and acknowledge a batch of messages
+        Returns:
+        List of ids of the messages that failed, and were not acknowledged
+        """
+        stats = self.stats
+        stats.incr('messages', len(messages))
+        with stats.timer('convert'):
+            items, failed = items_from_messages([(m['id'], m['body']) for m in messages], executor=self.executor)
+        failed = set(failed)
+
+        with stats.timer('encode'):
+            encoded = [dumps(item) for message_id, collection, item in items]
+        changes = [None] * len(items)
+        if self.changes is not None:
+            with stats.timer('changes'):
+                changes = self.changes.changes([(item['id'], content_hash(data))
+                                                for (message_id, collection, item), data in zip(items, encoded)])
+            stats.incr('unchanged', changes.count(None))
+
+        # messages of each Item id output
+        outputs = {}
+        try:
+            unwritten = self.output(items, encoded, changes, outputs)
+        except Exception:
+            if self.changes is not None:
+                # the hashes of all changed Items are stored, output them again when the messages are received again
+                self.changes.forget([item['id'] for (message_id, collection, item), change in zip(items, changes)
+                                     if change is not None])
+            raise
+        for id in unwritten:
+            failed.update(outputs.get(id, ()))
+        if self.changes is not None and unwritten:
+            # output again when the message is received again
+            self.changes.forget(unwritten)
+
+        stats.incr('items', len(items))
+        if failed:
+            stats.incr('failed', len(failed))
+            logger.error('Failed to process %s of %s messages' % (len(failed), len(messages)))
+        with stats.timer('delete'):
+            self.queue.delete([m for m in messages if m['id'] not in failed])
+        return sorted(failed)
+
+    def output(self, items, encoded, changes, outputs):
+        """ Write Items (except unchanged ones) to the sinks and publish them, adding the messages of each
+        Item id to outputs
+        Returns:
+        Set of ids of Items that could not be written or published
+        """
+        stats = self.stats
+        unwritten = set()
+        # number of failed entries of each publisher before this batch
+        published = {}
+        for (message_id, collection, item), data, change in zip(items, encoded, changes):
+            if self.changes is not None:
+                if change is None:
+                    continue
+                stats.incr(change)
+            outputs.setdefault(item['id'], set()).add(message_id)
+            try:
+                for sink in self.sinks:
+                    with stats.timer('write'):
+                        sink.write(item, data=data)
+            except Exception as err:
+                logger.error('Error writing Item %s: %s' % (item['id'], err))
+                unwritten.add(item['id'])
+                continue
+            publisher = self.get_publisher(collection)
+            if publisher is not None:
+                if publisher not in published:
+                    published[publisher] = len(publisher.failed)
+                with stats.timer('publish'):
+                    publisher.publish(item, data=data, change=change)
+
+        # Items are output before their messages are acknowledged
+        for sink in self.sinks:
+            with stats.timer('write'):
+                sink.flush()
+            failed = sink.pop_failed()
+            if failed:
+                stats.incr('write_failed', len(failed))
+                unwritten.update(failed)
+        for publisher, start in published.items():
+            with stats.timer('publish'):
+                publisher.wait()
+            with publisher.lock:
+                unpublished = [json.loads(entry['Message'])['id'] for entry, code in publisher.failed[start:]]
+                # only the failures of this batch are needed
+                del publisher.failed[start:]
+            if unpublished:
+                stats.incr('publish_failed', len(unpublished))
+                unwritten.update(unpublished)
+        return unwritten
+
+    def run(self, exit_when_empty=False):
+        """ Process messages until stopped
+        Keyword arguments:
+        exit_when_empty -- Stop when no messages are received
+        """
+        self.running = True
+        self.stopped.clear()
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                handlers[sig] = signal.signal(sig, self.stop)
+        try:
+            errors = 0
+            while self.running:
+                try:
+                    with self.stats.timer('receive'):
+                        messages = self.queue.receive(self.batch_size)
+                    if messages:
+                        self.process(messages)
+                    elif exit_when_empty:
+                        break
+                    errors = 0
+                except Exception as err:
+                    errors += 1
+                    self.stats.incr('errors')
+                    wait = min(self.max_backoff, self.backoff * 2 ** (errors - 1))
+                    logger.exception('Error processing messages, retrying in %s seconds: %s' % (wait, err))
+                    self.stopped.wait(wait)
+                self.stats.report()
+        finally:
+            for sig, handler in handlers.items():
+                signal.signal(sig, handler)
+            self.close()
+
+    def close(self):
+        """ Close the sinks and publishers """
+        self.running = False
+        self.executor.shutdown(wait=True)
+        for sink in self.sinks:
+            with self.stats.timer('write'):
+                sink.close()
+        # a publisher can be used for several collections
+        for publisher in set(self.publishers.values()):
+            with self.stats.timer('publish'):
+                publisher.close()
+            self.stats.incr('published', publisher.published)
+        if self.changes is not None:
+            self.changes.close()
+        self.stats.report(force=True)
@@ -0,0 +1,5 @@
+import os.path as op
+import sys
+
+# tests import the helpers shared between them from utils, whatever the import mode of pytest
+sys.path.insert(0, op.dirname(__file__))
@@ -0,0 +1,167 @@
+import asyncio
+import shutil
+import tempfile
+import unittest
+
+import os.path as op
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.aio import AsyncTransport, LocalAsyncTransport, get_aws_archive, to_stac
+from stac_sentinel.inventory import Inventory
+from stac_sentinel.transport import LocalTransport, Transport, TransportError
+
+from utils import ANNOTATION, Handler, create_inventory, serve
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+testpath = op.dirname(__file__)
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def collect(items):
+    return [item async for item in items]
+
+
+class Presigner(object):
+    """ Stand-in S3 client presigning S3 URLs as URLs of a local server """
+
+    def __init__(self, url):
+        self.url = url
+        self.params = []
+
+    def generate_presigned_url(self, method, Params, ExpiresIn):
+        self.params.append(Params)
+        return '%s/%s/%s' % (self.url, Params['Bucket'], Params['Key'])
+
+
+class PresignedTransport(Transport):
+    """ Transport with the S3 client replaced by a Presigner """
+
+    def __init__(self, url, **kwargs):
+        super(PresignedTransport, self).__init__(**kwargs)
+        self.presigner = Presigner(url)
+
+    @property
+    def s3(self):
+        return self.presigner
+
+
+class Test(unittest.TestCase):
+    """ Test aio module """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        create_inventory(self.path)
+        with open(op.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')) as f:
+            metadata = f.read()
+        self.transport = LocalTransport(files={r['url']: metadata for r in Inventory(self.path).records()})
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_to_stac(self):
+        url = 's3://sentinel-s1-l1c/GRD/2019/2/20/IW/DH/S1B/productInfo.json'
+        with open(op.join(testpath, 'samples/sentinel-s1-l1c-productInfo.json')) as f:
+            files = {url: f.read(), op.dirname(url) + '/annotation/iw-hv.xml': ANNOTATION}
+        transport = LocalAsyncTransport(LocalTransport(files=files))
+        item = run(to_stac('sentinel-s1-l1c', url, transport, direct_from_s3=True))
+        assert(item['properties']['sat:orbit_state'] == 'ascending')
+        assert(item['properties']['sar:looks_range'] == 5)
+
+    def test_get_aws_archive(self):
+        _transport, SentinelSTAC.transport = SentinelSTAC.transport, self.transport
+        try:
+            expected = list(SentinelSTAC.get_aws_archive('sentinel-s2-l1c', inventory=self.path, direct_from_s3=True))
+            transport = LocalAsyncTransport(self.transport, limit=4, delay=0.01)
+            items = run(collect(get_aws_archive('sentinel-s2-l1c', transport=transport, inventory=self.path,
+                                                direct_from_s3=True, chunk_size=7)))
+            assert(items == expected)
+            # concurrent, up to the limit of the transport
+            assert(transport.max_in_flight == 4)
+            transport = LocalAsyncTransport(self.transport, limit=4, delay=0.01)
+            items = run(collect(get_aws_archive('sentinel-s2-l1c', transport=transport, inventory=self.path,
+                                                direct_from_s3=True, ordered=False, prefix='tiles/2/')))
+            assert(sorted(i['id'] for i in items) == sorted(i['id'] for i in expected[10:20]))
+        finally:
+            SentinelSTAC.transport = _transport
+
+    def test_failed(self):
+        transport = LocalAsyncTransport(LocalTransport())
+        _transport, SentinelSTAC.transport = SentinelSTAC.transport, self.transport
+        try:
+            items = run(collect(get_aws_archive('sentinel-s2-l1c', transport=transport, inventory=self.path,
+                                                direct_from_s3=True)))
+        finally:
+            SentinelSTAC.transport = _transport
+        assert(items == [])
+
+
+@unittest.skipIf(aiohttp is None, 'requires aiohttp')
+class TestAsyncTransport(unittest.TestCase):
+    """ Test AsyncTransport against a local HTTP server """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.url = serve()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        # the handler is shared with other tests
+        del Handler.requests[:]
+        self.transport = AsyncTransport(transport=PresignedTransport(self.url, backoff=0.01), limit=4)
+
+    def get(self, coro):
+        async def _get():
+            async with self.transport:
+                return await coro
+        return run(_get())
+
+    def test_get_json(self):
+        assert(self.get(self.transport.get_json(self.url + '/tile')) == {'path': '/tile'})
+        # closed with the context manager
+        assert(self.transport._session is None)
+
+    def test_get_s3(self):
+        assert(self.get(self.transport.get_json('s3://bucket/tiles/0')) == {'path': '/bucket/tiles/0'})
+        params = self.transport.transport.presigner.params
+        assert(params == [{'Bucket': 'bucket', 'Key': 'tiles/0', 'RequestPayer': 'requester'}])
+
+    def test_retry(self):
+        assert(self.get(self.transport.get_json(self.url + '/flaky')) == {'path': '/flaky'})
+        assert(Handler.requests.count('/flaky') == 2)
+
+    def test_status_error(self):
+        with self.assertRaises(TransportError) as cm:
+            self.get(self.transport.get(self.url + '/missing'))
+        assert(cm.exception.status == 404)
+        assert(Handler.requests.count('/missing') == 1)
+
+    def test_iter_content(self):
+        async def read(url, nchunks=None):
+            chunks, content = [], self.transport.iter_content(url, chunk_size=4)
+            try:
+                async for chunk in content:
+                    chunks.append(chunk)
+                    if len(chunks) == nchunks:
+                        break
+            finally:
+                await content.aclose()
+            return chunks
+        assert(b''.join(self.get(read(self.url + '/tile'))) == b'{"path": "/tile"}')
+        # stopping early releases the request
+        assert(self.get(read(self.url + '/tile', nchunks=1)) == [b'{"pa'])
+        assert(self.transport.semaphore._value == self.transport.limit)
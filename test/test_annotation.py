@@ -0,0 +1,45 @@
+import json
+import unittest
+
+import os.path as op
+
+from xml.etree.ElementTree import tostring
+from xmljson import badgerfish as bf
+
+from stac_sentinel.annotation import FIELDS, SWATH_PARAMS, read_annotation
+
+testpath = op.dirname(__file__)
+
+
+class Test(unittest.TestCase):
+    """ Test annotation module """
+
+    @classmethod
+    def setUpClass(cls):
+        # sample is the annotation XML converted with xmljson, convert it back
+        with open(op.join(testpath, 'samples/sentinel-s1-l1c-metadata.json')) as f:
+            cls.metadata = json.loads(f.read())
+        cls.xml = tostring(bf.etree(cls.metadata)[0])
+
+    def chunks(self, size=4096):
+        self.read = 0
+        for i in range(0, len(self.xml), size):
+            self.read += size
+            yield self.xml[i:i + size]
+
+    def test_read_annotation(self):
+        values = read_annotation(self.chunks())
+        assert(sorted(values.keys()) == sorted(FIELDS))
+        header = self.metadata['product']['adsHeader']
+        assert(values['adsHeader/startTime'] == header['startTime']['$'])
+        assert(values['adsHeader/absoluteOrbitNumber'] == header['absoluteOrbitNumber']['$'])
+        swath = self.metadata['product']['imageAnnotation']['processingInformation']['swathProcParamsList']['swathProcParams'][0]
+        assert(values[SWATH_PARAMS + '/rangeProcessing/numberOfLooks'] == swath['rangeProcessing']['numberOfLooks']['$'])
+
+    def test_early_exit(self):
+        read_annotation(self.chunks())
+        assert(self.read < len(self.xml) / 10)
+
+    def test_missing_field(self):
+        with self.assertRaises(ValueError):
+            read_annotation(self.chunks(), fields=['adsHeader/missionId', 'adsHeader/notAField'])
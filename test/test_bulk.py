@@ -0,0 +1,179 @@
+import json
+import threading
+import time
+import unittest
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from stac_sentinel.bulk import BulkLoader, ElasticsearchLoader, TransactionsLoader, get_loader
+from stac_sentinel.stats import Stats
+from stac_sentinel.transport import Transport
+
+from utils import get_items
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    """ Stand-in for the _bulk API of Elasticsearch and the STAC API Transactions extension
+
+    Documents with ids in reject are rejected with 429 the first time and those in invalid with 400.
+    A PUT of an Item that does not exist is rejected with 404. Concurrent requests are counted in
+    max_in_flight.
+    """
+    documents = {}
+    requests = []
+    reject = set()
+    invalid = set()
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def reply(self, status, body=None):
+        data = json.dumps(body or {}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def read(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests.append((self.command, self.path))
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        time.sleep(0.02)
+        return self.rfile.read(int(self.headers['Content-Length']))
+
+    def do_POST(self):
+        body = self.read()
+        try:
+            if self.path == '/_bulk':
+                self.bulk(body)
+            else:
+                self.post_items(json.loads(body))
+        finally:
+            with self.lock:
+                type(self).in_flight -= 1
+
+    def do_PUT(self):
+        item = json.loads(self.read())
+        with self.lock:
+            type(self).in_flight -= 1
+            if item['id'] not in self.documents:
+                return self.reply(404, {'description': 'Item not found'})
+            self.documents[item['id']] = item
+        self.reply(200, item)
+
+    def bulk(self, body):
+        lines = body.decode('utf-8').strip('\n').split('\n')
+        results = []
+        for action, doc in zip(lines[::2], lines[1::2]):
+            action, doc = json.loads(action)['index'], json.loads(doc)
+            with self.lock:
+                if action['_id'] in self.reject:
+                    self.reject.discard(action['_id'])
+                    status = 429
+                elif action['_id'] in self.invalid:
+                    status = 400
+                else:
+                    self.documents[action['_id']] = dict(doc, _index=action['_index'])
+                    status = 201
+            results.append({'index': {'_id': action['_id'], 'status': status}})
+        self.reply(200, {'errors': any(r['index']['status'] != 201 for r in results), 'items': results})
+
+    def post_items(self, body):
+        items = body['features'] if body['type'] == 'FeatureCollection' else [body]
+        with self.lock:
+            if any(item['id'] in self.invalid for item in items):
+                return self.reply(400, {'description': 'invalid Item'})
+            if any(item['id'] in self.documents for item in items):
+                return self.reply(409, {'description': 'Item exists'})
+            for item in items:
+                self.documents[item['id']] = item
+        self.reply(200)
+
+    def log_message(self, *args):
+        pass
+
+
+class Test(unittest.TestCase):
+    """ Test bulk module """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Server(('127.0.0.1', 0), Handler)
+        cls.url = 'http://127.0.0.1:%s/' % cls.server.server_address[1]
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.documents, Handler.requests = {}, []
+        Handler.reject, Handler.invalid = set(), set()
+        Handler.max_in_flight = 0
+
+    def test_elasticsearch(self):
+        items = get_items(20)
+        Handler.reject = {items[1]['id'], items[12]['id']}
+        Handler.invalid = {items[5]['id']}
+        stats = Stats()
+        with ElasticsearchLoader(self.url, batch_size=3, workers=4, backoff=0.01, stats=stats) as loader:
+            for item in items:
+                loader.write(item)
+        assert(loader.loaded == 19)
+        assert(loader.failed[0][1].startswith('HTTP status 400'))
+        assert(loader.pop_failed() == [items[5]['id']])
+        assert(loader.failed == [] and loader.load_failed == 1)
+        assert(len(Handler.documents) == 19)
+        assert(Handler.documents[items[1]['id']]['_index'] == 'sentinel-s2-l1c')
+        # 7 batches and 2 retries
+        assert(len(Handler.requests) == 9)
+        assert(Handler.max_in_flight > 1)
+        assert(stats.counters == {'loaded': 19, 'load_failed': 1})
+
+    def test_max_bytes(self):
+        items = get_items(4)
+        size = len(json.dumps(items[0]))
+        with get_loader(self.url, api='elasticsearch', index='items', max_bytes=2 * size + 100) as loader:
+            for item in items:
+                loader.write(item)
+        assert(len(Handler.requests) == 2)
+        assert(set(doc['_index'] for doc in Handler.documents.values()) == {'items'})
+
+    def test_transactions(self):
+        items = get_items(10)
+        Handler.documents[items[2]['id']] = {}
+        Handler.invalid = {items[7]['id']}
+        with TransactionsLoader(self.url, batch_size=5, workers=1, transport=Transport(retries=0)) as loader:
+            for item in items:
+                loader.write(item)
+        assert(loader.loaded == 9)
+        assert(loader.pop_failed() == [items[7]['id']])
+        assert(len(Handler.documents) == 9)
+        # existing Item is replaced, the other Items of its batch are PUT (or POSTed if new) without splitting it
+        assert(Handler.documents[items[2]['id']]['id'] == items[2]['id'])
+        requests = Handler.requests[:10]
+        assert([method for method, path in requests] == ['POST'] + ['PUT', 'POST'] * 2 + ['PUT'] + ['PUT', 'POST'] * 2)
+        assert(('PUT', '/collections/sentinel-s2-l1c/items/%s' % items[2]['id']) in requests)
+        # the batch with an invalid Item is split: [5, 6] and [7, 8, 9], then [7] and [8, 9]
+        assert(len(Handler.requests) == 15)
+        assert(all(path.startswith('/collections/sentinel-s2-l1c/items') for method, path in Handler.requests))
+
+    def test_get_loader(self):
+        assert(isinstance(get_loader(self.url), TransactionsLoader))
+        with self.assertRaises(ValueError):
+            get_loader(self.url, api='solr')
+
+    def test_abstract_loader(self):
+        class IncompleteLoader(BulkLoader):
+            pass
+        with self.assertRaises(TypeError):
+            IncompleteLoader(self.url)
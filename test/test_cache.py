@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import os.path as op
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.cache import CachingTransport, MetadataCache
+from stac_sentinel.inventory import Inventory
+from stac_sentinel.transport import LocalTransport, TransportError
+
+from utils import create_inventory
+
+testpath = op.dirname(__file__)
+
+
+class Handler(BaseHTTPRequestHandler):
+    """ Serve /file with an ETag, answering 304 if it matches If-None-Match """
+    requests = []
+    etag = '"1"'
+
+    def do_GET(self):
+        self.requests.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        data = ('contents %s' % self.etag).encode('utf-8')
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class Test(unittest.TestCase):
+    """ Test cache module """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_cache(self):
+        with MetadataCache(op.join(self.path, 'cache'), batch_size=2) as cache:
+            digest = cache.put('bucket/a/tileInfo.json', b'{}', version='v1')
+            cache.put('bucket/b/tileInfo.json', b'{}', version='v1')
+            cache.put('bucket/b/preview.jpg', b'jpg')
+            assert(cache.get('bucket/a/tileInfo.json') == b'{}')
+            assert(cache.get('bucket/a/tileInfo.json', version='v1') == b'{}')
+            assert(cache.get('bucket/a/tileInfo.json', version='v2') is None)
+            assert(cache.get('bucket/c/tileInfo.json') is None)
+            assert(cache.lookup('bucket/b/tileInfo.json')['digest'] == digest)
+            assert(len(cache) == 3)
+            # identical contents are stored once
+            assert(len(os.listdir(op.join(self.path, 'cache', 'objects'))) == 2)
+            assert(list(cache.keys('bucket/b/', chunk_size=1)) == ['bucket/b/preview.jpg', 'bucket/b/tileInfo.json'])
+            records = list(cache.records('bucket', suffix='tileInfo.json'))
+            assert([r['url'] for r in records] == ['s3://bucket/a/tileInfo.json', 's3://bucket/b/tileInfo.json'])
+            assert(records[0]['Key'] == 'a/tileInfo.json')
+        # reopened
+        with MetadataCache(op.join(self.path, 'cache')) as cache:
+            assert(cache.get('bucket/b/preview.jpg') == b'jpg')
+
+    def test_conditional_get(self):
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = 'http://127.0.0.1:%s/file' % server.server_address[1]
+        cache = MetadataCache(self.path)
+        transport = CachingTransport(cache)
+        try:
+            assert(transport.get(url) == b'contents "1"')
+            assert(transport.get(url) == b'contents "1"')
+            assert(Handler.requests == [None, '"1"'])
+            # not requested if it is the version expected
+            transport.expect(url, 'v1')
+            transport.get(url)
+            transport.expect(url, 'v1')
+            assert(transport.get(url) == b'contents "1"')
+            assert(len(Handler.requests) == 3)
+            # changed
+            Handler.etag = '"2"'
+            transport.expect(url, 'v2')
+            assert(transport.get(url) == b'contents "2"')
+            assert(Handler.requests[-1] == '"1"')
+            # offline
+            assert(CachingTransport(cache, offline=True).get(url) == b'contents "2"')
+            assert(len(Handler.requests) == 4)
+        finally:
+            server.shutdown()
+            server.server_close()
+            cache.close()
+
+    def test_iter_content(self):
+        files = {'s3://bucket/annotation.xml': b'0123456789'}
+        cache = MetadataCache(self.path)
+        transport = CachingTransport(cache, LocalTransport(files=files))
+        chunks = transport.iter_content('s3://bucket/annotation.xml', chunk_size=4)
+        assert(next(chunks) == b'0123')
+        chunks.close()
+        # only the part read is cached, and it is not used for reading the whole file
+        assert(cache.lookup('bucket/annotation.xml')['partial'] == 1)
+        offline = CachingTransport(cache, offline=True).iter_content('s3://bucket/annotation.xml')
+        assert(next(offline) == b'0123')
+        self.assertRaises(TransportError, lambda: next(offline))
+        # a reader needing more than the cached part continues from the file
+        local = LocalTransport(files=files)
+        chunks = CachingTransport(cache, local).iter_content('s3://bucket/annotation.xml', chunk_size=3)
+        assert(b''.join(chunks) == b'0123456789')
+        assert(cache.lookup('bucket/annotation.xml')['partial'] == 0)
+        assert(list(CachingTransport(cache, offline=True).iter_content('s3://bucket/annotation.xml')) == [b'0123456789'])
+        assert(transport.get('s3://bucket/annotation.xml') == b'0123456789')
+        offline = CachingTransport(cache, offline=True)
+        self.assertRaises(TransportError, lambda: list(offline.iter_content('s3://bucket/other.xml')))
+        cache.close()
+
+    def test_get_aws_archive(self):
+        inventory = op.join(self.path, 'inventory')
+        create_inventory(inventory)
+        with open(op.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')) as f:
+            metadata = f.read()
+        files = {r['url']: metadata for r in Inventory(inventory).records()}
+        cache = op.join(self.path, 'cache')
+        kwargs = {'inventory': inventory, 'direct_from_s3': True, 'prefix': 'tiles/1/', 'cache': cache}
+        _transport = SentinelSTAC.transport
+        try:
+            SentinelSTAC.transport = transport = LocalTransport(files=files)
+            items = list(SentinelSTAC.get_aws_archive('sentinel-s2-l1c', **kwargs))
+            assert(len([url for url in transport.requests if url.startswith('s3://')]) == 10)
+            # unchanged in the inventory, nothing is fetched
+            SentinelSTAC.transport = transport = LocalTransport(files=files)
+            assert(list(SentinelSTAC.get_aws_archive('sentinel-s2-l1c', **kwargs)) == items)
+            assert(not [url for url in transport.requests if url.startswith('s3://')])
+            # replay needs no inventory or files
+            SentinelSTAC.transport = transport = LocalTransport()
+            replayed = list(SentinelSTAC.get_aws_archive('sentinel-s2-l1c', cache=cache, replay=True))
+            assert(transport.requests == [])
+            assert(replayed == items)
+            self.assertRaises(ValueError, lambda: list(SentinelSTAC.get_aws_archive('sentinel-s2-l1c', replay=True)))
+        finally:
+            SentinelSTAC.transport = _transport
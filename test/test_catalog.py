@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import os.path as op
+
+from stac_sentinel.catalog import CatalogWriter, relative, shard_path
+
+from utils import get_items
+
+
+def read(*path):
+    with open(op.join(*path)) as f:
+        return json.loads(f.read())
+
+
+def hrefs(catalog, rel):
+    return [link['href'] for link in catalog['links'] if link['rel'] == rel]
+
+
+class Test(unittest.TestCase):
+    """ Test catalog module """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_shard_path(self):
+        item = get_items(1)[0]
+        assert(shard_path(item) == ['57', 'U', 'VB', '2017'])
+        item = dict(item, properties={'datetime': '2019-07-04T10:00:00Z'})
+        assert(shard_path(item) == ['2019', '07', '04'])
+
+    def test_relative(self):
+        assert(relative(('catalog.json',), ('a', 'b')) == '../../catalog.json')
+        assert(relative(('a', 'collection.json'), ('a', 'b', 'c')) == '../../collection.json')
+        assert(relative(('a', 'b'), ()) == 'a/b')
+
+    def test_catalog_writer(self):
+        items = get_items(5)
+        with CatalogWriter(self.path, workers=2, max_in_flight=2) as writer:
+            for item in items:
+                writer.write(item)
+        assert(writer.errors == [])
+        root = read(self.path, 'catalog.json')
+        assert(hrefs(root, 'child') == ['sentinel-s2-l1c/collection.json'])
+        collection = read(self.path, 'sentinel-s2-l1c', 'collection.json')
+        assert(collection['id'] == 'sentinel-s2-l1c')
+        assert(hrefs(collection, 'child') == ['57/catalog.json'])
+        assert(hrefs(collection, 'parent') == ['../catalog.json'])
+        leaf = op.join(self.path, 'sentinel-s2-l1c', '57', 'U', 'VB', '2017')
+        catalog = read(leaf, 'catalog.json')
+        assert(hrefs(catalog, 'item') == sorted('%s.json' % item['id'] for item in items))
+        assert(hrefs(catalog, 'root') == ['../../../../../catalog.json'])
+        assert(hrefs(read(self.path, 'sentinel-s2-l1c', '57', 'catalog.json'), 'parent') == ['../collection.json'])
+        item = read(leaf, '%s.json' % items[0]['id'])
+        assert(hrefs(item, 'collection') == ['../../../../collection.json'])
+        assert(hrefs(item, 'parent') == ['catalog.json'])
+        assert(item['assets'] == items[0]['assets'])
+        # every link resolves
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for filename in filenames:
+                for link in read(dirpath, filename)['links']:
+                    if not link['href'].startswith('http'):
+                        assert(op.exists(op.normpath(op.join(dirpath, link['href']))))
+
+    def test_flush(self):
+        items = get_items(5)
+        leaf = op.join(self.path, 'sentinel-s2-l1c', '57', 'U', 'VB', '2017')
+        writer = CatalogWriter(self.path, batch_size=2)
+        for item in items[:3]:
+            writer.write(item)
+        # catalogs are written every batch_size Items
+        assert(len(hrefs(read(leaf, 'catalog.json'), 'item')) == 2)
+        writer.flush()
+        assert(len(hrefs(read(leaf, 'catalog.json'), 'item')) == 3)
+        assert(writer.items == {} and writer.children == {})
+        # an Item that can not be written is not linked
+        os.makedirs(op.join(leaf, '%s.json' % items[3]['id']))
+        writer.write(items[3])
+        writer.close()
+        assert(writer.pop_failed() == [items[3]['id']])
+        assert(len(hrefs(read(leaf, 'catalog.json'), 'item')) == 3)
+        assert(hrefs(read(self.path, 'catalog.json'), 'child') == ['sentinel-s2-l1c/collection.json'])
+
+    def test_update_catalog(self):
+        items = get_items(4)
+        with CatalogWriter(self.path) as writer:
+            for item in items[:2]:
+                writer.write(item)
+        with CatalogWriter(self.path) as writer:
+            for item in items[1:]:
+                writer.write(dict(item, properties=dict(item['properties'], datetime='2018-01-01T00:00:00Z')))
+        grid_square = op.join(self.path, 'sentinel-s2-l1c', '57', 'U', 'VB')
+        assert(hrefs(read(grid_square, 'catalog.json'), 'child') == ['2017/catalog.json', '2018/catalog.json'])
+        assert(len(hrefs(read(grid_square, '2017', 'catalog.json'), 'item')) == 2)
+        assert(len(hrefs(read(grid_square, '2018', 'catalog.json'), 'item')) == 3)
+        assert(len(hrefs(read(self.path, 'catalog.json'), 'child')) == 1)
@@ -0,0 +1,39 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import os.path as op
+
+from stac_sentinel.changes import ChangeStore, content_hash
+from stac_sentinel.encoding import dumps
+
+
+class Test(unittest.TestCase):
+    """ Test changes module """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = op.join(self.path, 'changes.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_content_hash(self):
+        item = {'id': 'a', 'properties': {'eo:cloud_cover': 1.5}}
+        assert(content_hash(dumps(item)) == content_hash(dumps(dict(item))))
+        assert(content_hash(dumps(item)) != content_hash(dumps({'id': 'a', 'properties': {'eo:cloud_cover': 2}})))
+
+    def test_changes(self):
+        with ChangeStore(self.filename, batch_size=2) as store:
+            assert(store.changes([('a', '1'), ('b', '1'), ('c', '1')]) == ['new', 'new', 'new'])
+            # buffered and stored hashes
+            assert(store.changes([('a', '1'), ('c', '1'), ('b', '2')]) == [None, None, 'updated'])
+            # same id twice
+            assert(store.changes([('d', '1'), ('d', '1')]) == ['new', None])
+            assert(len(store) == 4)
+        with ChangeStore(self.filename) as store:
+            assert(store.get(['a', 'b', 'x']) == {'a': '1', 'b': '2'})
+            store.forget(['a'])
+            assert(store.change({'id': 'a'}, b'{}') == 'new')
+            assert(store.change({'id': 'a'}, b'{}') is None)
@@ -1,9 +1,19 @@
 import os
+import shutil
+import sys
+import tempfile
 import unittest
 
 from datetime import datetime as dt
 
-from stac_sentinel.cli import parse_args
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.changes import ChangeStore
+from stac_sentinel.cli import cli, parse_args, parse_worker_args
+from stac_sentinel.inventory import Inventory
+from stac_sentinel.sinks import FileSink, NDJSONSink
+from stac_sentinel.transport import LocalTransport
+
+from utils import create_inventory
 
 testpath = os.path.dirname(__file__)
 
@@ -12,8 +22,50 @@ class Test(unittest.TestCase):
 
     def test_parse_no_args(self):
         args = parse_args([''])
-        assert(len(args)==7)
+        assert(len(args)==36)
 
     def test_parse_args(self):
         args = parse_args('sentinel-s1-l1c'.split(' '))
-        assert(args['collection'] == 'sentinel-s1-l1c')
\ No newline at end of file
+        assert(args['collection'] == 'sentinel-s1-l1c')
+
+    def test_parse_worker_args(self):
+        args = parse_worker_args(['https://sqs.eu-central-1.amazonaws.com/123456789012/queue', '--publish', 'arn1',
+                                  'sentinel-s1-l1c=arn2'])
+        assert(args['queue'].endswith('/queue'))
+        assert(args['publish'] == ['arn1', 'sentinel-s1-l1c=arn2'])
+        assert(args['batch_size'] == 10)
+
+    def test_close_error(self):
+        path = tempfile.mkdtemp()
+        create_inventory(path, nfiles=1, ntiles=2)
+        with open(os.path.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')) as f:
+            metadata = f.read()
+        transport = LocalTransport(files={r['url']: metadata for r in Inventory(path).records()})
+        savepath, changes = os.path.join(path, 'items'), os.path.join(path, 'changes.db')
+
+        def close(sink):
+            raise IOError('disk full')
+
+        def pop_failed(sink):
+            return [fname[:-5] for fname in os.listdir(savepath)]
+
+        _argv = sys.argv
+        _transport, SentinelSTAC.transport = SentinelSTAC.transport, transport
+        _close, FileSink.close = FileSink.close, close
+        _pop_failed, NDJSONSink.pop_failed = NDJSONSink.pop_failed, pop_failed
+        sys.argv = ['stac-sentinel', 'sentinel-s2-l1c', '--inventory', path, '--direct_from_s3', '--log', '5',
+                    '--save', savepath, '--ndjson', os.path.join(path, 'ndjson'), '--changes', changes]
+        try:
+            cli()
+        finally:
+            sys.argv = _argv
+            SentinelSTAC.transport = _transport
+            FileSink.close = _close
+            NDJSONSink.pop_failed = _pop_failed
+        try:
+            # the error closing the first sink is logged, the Item failed by the second one is forgotten
+            assert(len(os.listdir(savepath)) == 1)
+            with ChangeStore(changes) as store:
+                assert(len(store) == 0)
+        finally:
+            shutil.rmtree(path)
@@ -0,0 +1,52 @@
+import json
+import unittest
+
+import os.path as op
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.encoding import dumps, get_encoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+testpath = op.dirname(__file__)
+
+
+def get_items():
+    with open(op.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')) as f:
+        s2 = SentinelSTAC('sentinel-s2-l1c', json.loads(f.read())).to_stac()
+    s1 = {}
+    for name in ['sentinel-s1-l1c_item.json', 'sentinel-s2-l2a_item.json']:
+        with open(op.join(testpath, '..', 'samples', name)) as f:
+            s1[name] = json.loads(f.read())
+    return [s2] + list(s1.values())
+
+
+class Test(unittest.TestCase):
+    """ Test encoding module """
+
+    def test_json(self):
+        for item in get_items():
+            data = get_encoder('json')(item)
+            assert(isinstance(data, bytes))
+            assert(json.loads(data) == json.loads(json.dumps(item)))
+        assert(get_encoder('json')({'title': 'Sentinel-2 Ü'}) == '{"title":"Sentinel-2 Ü"}'.encode('utf-8'))
+
+    @unittest.skipIf(orjson is None, 'orjson not installed')
+    def test_orjson_identical(self):
+        items = get_items() + [{'id': 'Ü', 'bbox': [1.0, -0.5, 0.0001, 179.99999999999997], 'n': [0, 10 ** 12]}]
+        for item in items:
+            assert(get_encoder('orjson')(item) == get_encoder('json')(item))
+        # floats written in exponent notation by the standard library differ only in format
+        item = {'bbox': [1e-05, 1e+16]}
+        assert(json.loads(get_encoder('orjson')(item)) == json.loads(get_encoder('json')(item)))
+
+    def test_dumps(self):
+        item = get_items()[0]
+        assert(json.loads(dumps(item)) == json.loads(json.dumps(item)))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_encoder('yaml')
@@ -0,0 +1,44 @@
+import subprocess
+import sys
+import unittest
+
+import os.path as op
+
+testpath = op.dirname(__file__)
+
+HEAVY = ['boto3', 'botocore', 'boto3utils', 'dateutil', 'numpy', 'pyproj', 'requests', 'shapely', 'xmljson']
+
+
+def imported(code):
+    """ Heavy modules imported after running code in a new interpreter """
+    code += '\nimport sys\nprint(" ".join(m for m in %r if m in sys.modules))' % (HEAVY,)
+    out = subprocess.check_output([sys.executable, '-c', code], cwd=op.dirname(testpath))
+    return out.decode().split()
+
+
+class Test(unittest.TestCase):
+    """ Test heavy dependencies are only imported when needed """
+
+    def test_import(self):
+        assert(imported('import stac_sentinel, stac_sentinel.publish') == [])
+
+    def test_import_cli(self):
+        assert(imported('import stac_sentinel.cli') == [])
+
+    def test_s1_transform(self):
+        code = '\n'.join([
+            'import json',
+            'from stac_sentinel import SentinelSTAC',
+            'md = json.load(open("test/samples/sentinel-s1-l1c-productInfo.json"))',
+            'SentinelSTAC.productinfo_to_metadata(md, "s3://sentinel-s1-l1c/%s" % md["path"])'
+        ])
+        assert(imported(code) == [])
+
+    def test_s2_transform(self):
+        code = '\n'.join([
+            'import json',
+            'from stac_sentinel import SentinelSTAC',
+            'md = json.load(open("test/samples/sentinel-s2-l1c-tileInfo.json"))',
+            'SentinelSTAC("sentinel-s2-l1c", md).to_stac()'
+        ])
+        assert(imported(code) == ['numpy', 'pyproj', 'shapely'])
@@ -0,0 +1,107 @@
+import io
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+
+import os.path as op
+
+from copy import deepcopy
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.cli import parse_query_args, query
+from stac_sentinel.index import ItemIndex, parse_interval
+
+testpath = op.dirname(__file__)
+
+
+def get_items(n):
+    """ Sentinel-2 Items shifted by one degree east and one day each """
+    with open(op.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')) as f:
+        item = SentinelSTAC('sentinel-s2-l1c', json.loads(f.read())).to_stac()
+    items = []
+    for i in range(n):
+        _item = deepcopy(item)
+        _item['id'] = '%s_%s' % (item['id'], i)
+        _item['bbox'] = [item['bbox'][0] + i, item['bbox'][1], item['bbox'][2] + i, item['bbox'][3]]
+        _item['properties']['datetime'] = '2017-10-%02dT00:46:57.464000+00:00' % (i + 1)
+        _item['properties']['eo:cloud_cover'] = float(i * 10)
+        items.append(_item)
+    return items
+
+
+class Test(unittest.TestCase):
+    """ Test index module """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = op.join(self.path, 'index.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_parse_interval(self):
+        assert(parse_interval('2017-10-02') == ('2017-10-02T00:00:00.000000Z', '2017-10-03T00:00:00.000000Z'))
+        assert(parse_interval('../2017-10-02T01:00:00+01:00') == (None, '2017-10-02T00:00:00.000001Z'))
+        with self.assertRaises(ValueError):
+            parse_interval('2017/2018/2019')
+
+    def test_query(self):
+        items = get_items(10)
+        with ItemIndex(self.filename, batch_size=3) as index:
+            for item in items:
+                index.write(item)
+        with ItemIndex(self.filename) as index:
+            assert(len(index) == 10)
+            bbox = items[0]['bbox']
+            ids = [r['id'] for r in index.query(bbox=[bbox[2] + 0.5, bbox[1], bbox[2] + 0.6, bbox[3]])]
+            assert(ids == [items[i]['id'] for i in (1, 2)])
+            rows = index.query(datetime='2017-10-03/2017-10-04')
+            assert([r['id'] for r in rows] == [items[i]['id'] for i in (2, 3)])
+            assert(rows[0]['grid_square'] == '57UVB')
+            assert(len(index.query(max_cloud_cover=30, datetime='2017-10-02/..')) == 3)
+            assert(len(index.query(collection='sentinel-s1-l1c')) == 0)
+            assert(len(index.query(limit=4)) == 4)
+            assert(index.contains([items[0]['id'], 'missing']) == set([items[0]['id']]))
+            assert(items[1]['id'] in index)
+
+    def test_replace(self):
+        items = get_items(2)
+        with ItemIndex(self.filename) as index:
+            for item in items:
+                index.write(item)
+            index.flush()
+            items[0]['bbox'] = items[1]['bbox']
+            index.write(items[0])
+            assert(len(index) == 2)
+            assert(len(index.query(bbox=items[1]['bbox'])) == 2)
+            bbox = get_items(1)[0]['bbox']
+            assert(len(index.query(bbox=[bbox[0], bbox[1], bbox[0] + 0.1, bbox[3]])) == 0)
+
+    def test_duplicate(self):
+        items = get_items(2)
+        with ItemIndex(self.filename) as index:
+            index.write(items[0])
+            index.write(dict(items[0], bbox=items[1]['bbox']))
+            index.write(items[1])
+            index.flush()
+            assert(len(index) == 2)
+            assert(len(index.query(bbox=items[1]['bbox'])) == 2)
+            index.write(items[1])
+            assert(len(index) == 2)
+
+    def test_query_cli(self):
+        items = get_items(3)
+        with ItemIndex(self.filename) as index:
+            for item in items:
+                index.write(item)
+        args = parse_query_args([self.filename, '--bbox', '158,55,159,56', '--datetime', '2017-10-01/2017-10-02'])
+        assert(args['bbox'] == [158, 55, 159, 56])
+        stdout, sys.stdout = sys.stdout, io.StringIO()
+        try:
+            query([self.filename, '--datetime', '2017-10-02/..', '--ids'])
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        assert(output.split() == [items[1]['id'], items[2]['id']])
@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+import unittest
+
+import os.path as op
+
+from datetime import date
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.inventory import Inventory, shard_key
+from stac_sentinel.transport import LocalTransport
+
+from utils import create_inventory
+
+testpath = op.dirname(__file__)
+
+
+class Test(unittest.TestCase):
+    """ Test inventory module """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        create_inventory(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_files(self):
+        inventory = Inventory(self.path)
+        assert(inventory.manifest['sourceBucket'] == 'sentinel-s2-l1c')
+        assert(inventory.files() == [op.join(self.path, 'data', '%s.csv.gz' % i) for i in range(3)])
+
+    def test_records(self):
+        records = list(Inventory(self.path, workers=2).records())
+        assert(len(records) == 90)
+        assert(records[0]['url'] == 's3://sentinel-s2-l1c/tiles/1/U/VB/2017/10/23/0/B01.jp2')
+        assert(records[-1]['Key'] == 'tiles/3/U/VB/2017/10/23/9/preview.jpg')
+        assert(records[0]['LastModifiedDate'] == '2020-01-01T01:02:03.000Z')
+
+    def test_filters(self):
+        inventory = Inventory(self.path, workers=3)
+        records = list(inventory.records(suffix='tileInfo.json'))
+        assert(len(records) == 30)
+        # order of files is kept when reading concurrently
+        assert([r['Key'][6] for r in records] == ['1'] * 10 + ['2'] * 10 + ['3'] * 10)
+        records = list(inventory.records(prefix='tiles/2/', suffix='tileInfo.json',
+                                         start_date=date(2020, 1, 2), end_date=date(2020, 1, 5)))
+        assert([r['Key'] for r in records] == ['tiles/2/U/VB/2017/10/23/%s/tileInfo.json' % i for i in (2, 3)])
+
+    def test_get_aws_archive(self):
+        with open(op.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')) as f:
+            metadata = f.read()
+        transport = LocalTransport(files={r['url']: metadata for r in Inventory(self.path).records()})
+        _transport, SentinelSTAC.transport = SentinelSTAC.transport, transport
+        try:
+            items = list(SentinelSTAC.get_aws_archive('sentinel-s2-l1c', inventory=self.path, direct_from_s3=True,
+                                                      prefix='tiles/1/'))
+        finally:
+            SentinelSTAC.transport = _transport
+        assert(len(items) == 10)
+        assert(items[0]['assets']['B01']['href'] == 's3://sentinel-s2-l1c/tiles/1/U/VB/2017/10/23/0/B01.jp2')
+
+    def test_shard_key(self):
+        assert(shard_key('tiles/57/U/VB/2017/10/23/0/tileInfo.json', 'grid') == 'tiles/57/U/VB')
+        assert(shard_key('GRD/2019/2/20/IW/DH/S1B/productInfo.json', 'grid') == 'GRD/2019/2/20')
+
+    def test_shards(self):
+        inventory = Inventory(self.path)
+        records = [r['Key'] for r in inventory.records(suffix='tileInfo.json')]
+        for by in ['hash', 'grid']:
+            shards = [[r['Key'] for r in inventory.records(suffix='tileInfo.json', shard=(i, 3, by))] for i in range(3)]
+            # shards do not overlap and cover all keys
+            assert(sorted(sum(shards, [])) == sorted(records))
+        # all tiles of a grid square are in the same shard
+        assert(sorted(len(s) for s in shards) in ([0, 10, 20], [0, 0, 30], [10, 10, 10]))
@@ -0,0 +1,69 @@
+import importlib.util
+import shutil
+import tempfile
+import unittest
+
+import os.path as op
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.changes import ChangeStore
+from stac_sentinel.transport import LocalTransport
+
+from utils import TILE, Client, RaisingPublisher, s2_message, sqs_event, tile_files
+
+testpath = op.dirname(__file__)
+
+
+def load_lambda():
+    """ Import the Lambda function module, lambda is not a valid package name """
+    spec = importlib.util.spec_from_file_location('lambda_function',
+                                                  op.join(testpath, '..', 'lambda', 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def sns_event(bodies):
+    return {'Records': [{'EventSource': 'aws:sns', 'Sns': {'MessageId': 'm%s' % i, 'Message': body}}
+                        for i, body in enumerate(bodies)]}
+
+
+class Test(unittest.TestCase):
+    """ Test Lambda function """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.transport = LocalTransport(files=tile_files())
+
+    def setUp(self):
+        self._transport, SentinelSTAC.transport = SentinelSTAC.transport, self.transport
+        self.path = tempfile.mkdtemp()
+        self.module = load_lambda()
+        self.module.client = Client()
+
+    def tearDown(self):
+        SentinelSTAC.transport = self._transport
+        shutil.rmtree(self.path)
+
+    def test_sqs_event(self):
+        event = sqs_event([s2_message(TILE), s2_message(TILE[:-1] + '2'), '{}'])
+        # the message of the missing tile is retried, the unrecognized message is dropped
+        assert(self.module.lambda_handler(event, None) == {'batchItemFailures': [{'itemIdentifier': 'm1'}]})
+        assert(sum(len(b) for b in self.module.client.batches) == 1)
+
+    def test_sns_event(self):
+        assert(self.module.lambda_handler(sns_event([s2_message(TILE)]), None) is None)
+        assert(self.module.lambda_handler(sns_event(['{}']), None) is None)
+        self.module.client = Client(fail=['0'], sender_fault=True)
+        with self.assertRaises(Exception) as context:
+            self.module.lambda_handler(sns_event([s2_message(TILE)]), None)
+        assert(str(context.exception) == 'Failed to process messages m0')
+
+    def test_publish_error(self):
+        self.module.CHANGE_STORE = op.join(self.path, 'changes.db')
+        self.module.SNSPublisher = RaisingPublisher
+        with self.assertRaises(IOError):
+            self.module.lambda_handler(sns_event([s2_message(TILE), s2_message(TILE[:-1] + '3')]), None)
+        # published when the event is retried
+        with ChangeStore(self.module.CHANGE_STORE) as changes:
+            assert(len(changes) == 0)
@@ -0,0 +1,72 @@
+import json
+import unittest
+
+import os.path as op
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.notifications import get_collection, get_messages, is_sqs_event, items_from_event
+from stac_sentinel.transport import LocalTransport
+
+from utils import ANNOTATION, sqs_event
+
+testpath = op.dirname(__file__)
+
+TILE = 'tiles/57/U/VB/2017/10/23/0'
+
+
+class Test(unittest.TestCase):
+    """ Test notifications module """
+
+    @classmethod
+    def setUpClass(cls):
+        with open(op.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')) as f:
+            tileinfo = f.read()
+        with open(op.join(testpath, 'samples/sentinel-s1-l1c-productInfo.json')) as f:
+            cls.productinfo = json.loads(f.read())
+        base_url = 's3://sentinel-s1-l1c/%s' % cls.productinfo['path']
+        files = {
+            '%s/sentinel-s2-l1c/%s/tileInfo.json' % (SentinelSTAC.FREE_URL, TILE): tileinfo,
+            '%s/sentinel-s2-l1c/%s/tileInfo.json' % (SentinelSTAC.FREE_URL, TILE[:-1] + '1'): tileinfo,
+            base_url + '/annotation/iw-hv.xml': ANNOTATION
+        }
+        cls.transport = LocalTransport(files=files)
+
+    def setUp(self):
+        self._transport, SentinelSTAC.transport = SentinelSTAC.transport, self.transport
+
+    def tearDown(self):
+        SentinelSTAC.transport = self._transport
+
+    def s2_message(self, *paths):
+        name = 'S2A_MSIL1C_20171023T004701_N0205_R045_T57UVB_20171023T004657'
+        return json.dumps({'name': name, 'tiles': [{'path': p} for p in paths]})
+
+    def test_get_collection(self):
+        assert(get_collection({'name': 'S2B_MSIL2A_20200101', 'tiles': []}) == 'sentinel-s2-l2a')
+        with open(op.join(testpath, 'samples/sentinel-s2-l1c_productInfo.json')) as f:
+            assert(get_collection(json.loads(f.read())) == 'sentinel-s2-l1c')
+        assert(get_collection(self.productinfo) == 'sentinel-s1-l1c')
+        assert(get_collection({}) is None)
+
+    def test_sns_event(self):
+        event = {'Records': [{'Sns': {'MessageId': 'a', 'Message': self.s2_message(TILE)}}]}
+        assert(get_messages(event) == [('a', self.s2_message(TILE))])
+        assert(not is_sqs_event(event))
+        items, failed = items_from_event(event)
+        assert(failed == [])
+        assert(items[0][0:2] == ('a', 'sentinel-s2-l1c'))
+        assert(items[0][2]['assets']['B01']['href'].startswith('s3://sentinel-s2-l1c/%s/' % TILE))
+
+    def test_sqs_event(self):
+        # SNS notification delivered through SQS without raw message delivery
+        s1 = json.dumps({'Type': 'Notification', 'Message': json.dumps(self.productinfo)})
+        event = sqs_event([self.s2_message(TILE, TILE[:-1] + '1'), s1, 'not json', self.s2_message(TILE[:-1] + '2')])
+        assert(is_sqs_event(event))
+        items, failed = items_from_event(event, workers=4)
+        assert(sorted(failed) == ['m2', 'm3'])
+        assert([i[0] for i in items] == ['m0', 'm0', 'm1'])
+        assert(items[2][2]['properties']['sar:looks_range'] == 5)
+        # messages that would fail again
+        invalid = []
+        items, failed = items_from_event(event, workers=4, invalid=invalid)
+        assert(failed == ['m3'] and invalid == ['m2'])
@@ -0,0 +1,71 @@
+import time
+import unittest
+
+from stac_sentinel.pipeline import Pipeline
+
+
+def fetch(i):
+    # later inputs finish first to exercise reordering
+    time.sleep(0.001 * (10 - i % 10))
+    if i % 10 == 7:
+        raise ValueError('bad input %s' % i)
+    return i
+
+
+class Test(unittest.TestCase):
+    """ Test pipeline module """
+
+    def test_ordered(self):
+        pipeline = Pipeline(fetch, abs, fetch_workers=4, transform_workers=2)
+        results = list(pipeline.run(range(50)))
+        assert([r[0] for r in results] == list(range(50)))
+        assert(results[3] == (3, 3, None))
+        assert(isinstance(results[7][2], ValueError))
+        assert(results[7][1] is None)
+
+    def test_unordered(self):
+        pipeline = Pipeline(fetch, abs, fetch_workers=4, ordered=False)
+        results = list(pipeline.run(range(50)))
+        assert(sorted(r[0] for r in results) == list(range(50)))
+        assert(len([r for r in results if r[2] is not None]) == 5)
+
+    def test_processes(self):
+        pipeline = Pipeline(fetch, abs, fetch_workers=2, transform_workers=2, processes=True)
+        results = [r[1] for r in pipeline.run(range(20)) if r[2] is None]
+        assert(results == [i for i in range(20) if i % 10 != 7])
+
+    def test_early_exit(self):
+        pipeline = Pipeline(fetch, abs, fetch_workers=2, queue_size=2)
+        for i, (value, result, err) in enumerate(pipeline.run(range(1000))):
+            if i == 3:
+                break
+        assert(value == 3)
+
+    def test_input_error(self):
+        def inputs():
+            yield 1
+            yield 2
+            raise IOError('inventory file could not be read')
+        results = []
+        with self.assertRaises(IOError):
+            for result in Pipeline(fetch, abs, fetch_workers=2).run(inputs()):
+                results.append(result)
+        assert(results == [(1, 1, None), (2, 2, None)])
+
+    def test_window(self):
+        fed = []
+
+        def inputs():
+            for i in range(200):
+                fed.append(i)
+                yield i
+
+        def slow(i):
+            if i == 0:
+                time.sleep(0.3)
+            return i
+        results = Pipeline(slow, abs, fetch_workers=4, queue_size=2, window=10).run(inputs())
+        assert(next(results) == (0, 0, None))
+        # inputs after the slow first one are not read beyond the window
+        assert(len(fed) <= 11)
+        assert([r[0] for r in results] == list(range(1, 200)))
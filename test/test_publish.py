@@ -0,0 +1,51 @@
+import json
+import unittest
+
+from stac_sentinel.publish import SNSPublisher, get_sns_attributes, entry_size, MAX_BATCH_BYTES
+
+from utils import TOPIC, Client, get_items
+
+
+class Test(unittest.TestCase):
+    """ Test publish module """
+
+    def test_publish_batches(self):
+        client = Client()
+        items = get_items(25)
+        with SNSPublisher(TOPIC, client=client, workers=2) as publisher:
+            for item in items:
+                publisher.publish(item)
+        assert(sorted(len(b) for b in client.batches) == [5, 10, 10])
+        assert(publisher.published == 25)
+        entry = client.batches[0][0]
+        assert(entry['MessageAttributes'] == get_sns_attributes(json.loads(entry['Message'])))
+        assert(len(set(e['Id'] for e in client.batches[0])) == len(client.batches[0]))
+
+    def test_retry_failed(self):
+        client = Client(fail=['1', '3'])
+        with SNSPublisher(TOPIC, client=client, workers=1, backoff=0.01) as publisher:
+            for item in get_items(5):
+                publisher.publish(item)
+        assert([len(b) for b in client.batches] == [5, 2])
+        assert(publisher.published == 5)
+        assert(publisher.failed == [])
+
+    def test_sender_fault(self):
+        client = Client(fail=['0'], sender_fault=True)
+        with SNSPublisher(TOPIC, client=client, workers=1, backoff=0.01) as publisher:
+            for item in get_items(3):
+                publisher.publish(item)
+        assert(len(client.batches) == 1)
+        assert(publisher.published == 2)
+        assert(len(publisher.failed) == 1)
+
+    def test_batch_size_limit(self):
+        client = Client()
+        item = get_items(1)[0]
+        item['properties']['description'] = 'x' * 100000
+        with SNSPublisher(TOPIC, client=client) as publisher:
+            for i in range(3):
+                publisher.publish(item)
+        for batch in client.batches:
+            assert(sum(entry_size(e) for e in batch) <= MAX_BATCH_BYTES)
+        assert(sorted(len(b) for b in client.batches) == [1, 2])
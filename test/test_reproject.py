@@ -0,0 +1,42 @@
+import json
+import unittest
+
+import os.path as op
+
+from stac_sentinel import reproject
+
+testpath = op.dirname(__file__)
+
+
+class Test(unittest.TestCase):
+    """ Test reproject module """
+
+    def read_test_footprint(self):
+        with open(op.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')) as f:
+            dat = json.loads(f.read())
+        return 32657, dat['tileDataGeometry']['coordinates'][0]
+
+    def test_get_transformer(self):
+        assert(reproject.get_transformer(32657) is reproject.get_transformer('32657'))
+
+    def test_cache_eviction(self):
+        first = reproject.get_transformer(32601)
+        for epsg in range(32602, 32605):
+            reproject.get_transformer(epsg, cache_size=3)
+        assert(reproject.get_transformer(32601) is not first)
+
+    def test_reproject_footprint(self):
+        footprint = reproject.reproject_footprint(*self.read_test_footprint())
+        assert(footprint['geometry']['type'] == 'Polygon')
+        bbox = [round(b, 6) for b in footprint['bbox']]
+        assert(bbox == [157.398579, 54.949075, 159.156256, 55.945626])
+
+    def test_reproject_footprints(self):
+        epsg, coordinates = self.read_test_footprint()
+        # same footprint as if it were in the neighbouring zone
+        footprints = [(epsg, coordinates), (epsg - 1, coordinates), (epsg, coordinates[::-1])]
+        results = reproject.reproject_footprints(footprints)
+        assert(results[0] == reproject.reproject_footprint(epsg, coordinates))
+        assert(results[1] == reproject.reproject_footprint(epsg - 1, coordinates))
+        assert(results[0]['bbox'] == results[2]['bbox'])
+        assert(results[0]['bbox'][0] - results[1]['bbox'][0] > 5)
@@ -4,7 +4,11 @@ import unittest
 from datetime import datetime as dt
 import os.path as op
 
+from dateutil.parser import parse
 from stac_sentinel import SentinelSTAC
+from stac_sentinel.sentinel import parse_datetime
+
+from utils import get_s1_item
 
 testpath = op.dirname(__file__)
 
@@ -34,3 +38,35 @@ class Test(unittest.TestCase):
         assert(item['type'] == 'Feature')
         assert(len(item['assets']) == 17)
         assert(item['properties']['sentinel:sequence'] == "0")
+
+    def test_transform_s1(self):
+        props = get_s1_item()['properties']
+        # annotation times are UTC
+        assert(props['datetime'] == props['start_datetime'] == '2019-02-20T09:54:17.100000+00:00')
+        assert(props['end_datetime'] == '2019-02-20T09:54:42.100000+00:00')
+
+    def test_parse_datetime(self):
+        for value in ['2017-10-23T00:46:57.464Z', '2018-06-19T05:45:06.950370', '2019-02-20T09:54:17',
+                      '2019-02-20T09:54:17+02:00', '2019-02-20T09:54:17.5-03:30', '2017-10-23T00:46:57.464000+00:00',
+                      '2019-02-20']:
+            assert(parse_datetime(value).isoformat() == parse(value).isoformat())
+
+    def test_to_stac_many(self):
+        records = [self.read_test_metadata() for i in range(5)]
+        records[2]['path'] = 'tiles/57/U/VB/2017/10/23/2'
+        # invalid footprint and unknown CRS
+        del records[1]['tileDataGeometry']
+        records[3]['tileOrigin']['crs']['properties']['name'] = 'urn:ogc:def:crs:EPSG:8.8.1:1'
+        items, errors = SentinelSTAC.to_stac_many('sentinel-s2-l1c', records)
+        assert(len(items) == 3)
+        assert([e[0] for e in errors] == [1, 3])
+        item = SentinelSTAC('sentinel-s2-l1c', records[0]).to_stac(base_url='s3://sentinel-s2-l1c/' + records[0]['path'])
+        assert(items[0] == item)
+        assert(items[1]['properties']['sentinel:sequence'] == '2')
+
+    def test_to_stac_chunks(self):
+        chunks = ([self.read_test_metadata()] * 3 for i in range(2))
+        results = list(SentinelSTAC.to_stac_chunks('sentinel-s2-l2a', chunks))
+        assert(len(results) == 2)
+        assert(len(results[1][0]) == 3)
+        assert(results[1][1] == [])
@@ -0,0 +1,83 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import os.path as op
+
+from stac_sentinel.encoding import dumps
+from stac_sentinel.sinks import Sink, FileSink, NDJSONSink, GeoParquetSink
+
+from utils import get_items
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+testpath = op.dirname(__file__)
+
+
+class Test(unittest.TestCase):
+    """ Test sinks module """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_abstract_sink(self):
+        class IncompleteSink(Sink):
+            pass
+        with self.assertRaises(TypeError):
+            IncompleteSink()
+
+    def test_file_sink(self):
+        items = get_items(3)
+        with FileSink(op.join(self.path, 'items')) as sink:
+            for item in items:
+                sink.write(item)
+        assert(len(os.listdir(op.join(self.path, 'items'))) == 3)
+        with open(op.join(self.path, 'items', items[0]['id'] + '.json')) as f:
+            assert(json.loads(f.read()) == json.loads(json.dumps(items[0])))
+
+    def test_ndjson_sink(self):
+        items = get_items(25)
+        with NDJSONSink(self.path, max_items=10, batch_size=4) as sink:
+            for item in items:
+                sink.write(item)
+        assert(sorted(os.listdir(self.path)) == ['items-%05d.ndjson.gz' % i for i in range(3)])
+        lines = []
+        for fname in sink.filenames:
+            with gzip.open(fname, 'rt') as f:
+                lines += [json.loads(line) for line in f]
+        assert(lines == json.loads(json.dumps(items)))
+
+    def test_ndjson_sink_max_bytes(self):
+        items = get_items(5)
+        size = len(dumps(items[0])) + 1
+        with NDJSONSink(self.path, max_items=None, max_bytes=size * 2, compress=False) as sink:
+            for item in items:
+                sink.write(item)
+        assert(len(sink.filenames) == 3)
+        with open(sink.filenames[0]) as f:
+            assert(len(f.readlines()) == 2)
+
+    @unittest.skipIf(pq is None, 'pyarrow not installed')
+    def test_parquet_sink(self):
+        items = get_items(5)
+        fname = op.join(self.path, 'items.parquet')
+        with GeoParquetSink(fname, batch_size=2) as sink:
+            for item in items:
+                sink.write(item)
+        pf = pq.ParquetFile(fname)
+        assert(pf.metadata.num_row_groups == 3)
+        assert(json.loads(pf.schema_arrow.metadata[b'geo'])['primary_column'] == 'geometry')
+        rows = pf.read().to_pylist()
+        assert([r['id'] for r in rows] == [i['id'] for i in items])
+        assert(rows[0]['sentinel:grid_square'] == '57UVB')
+        assert(rows[0]['bbox']['xmin'] == items[0]['bbox'][0])
+        assert(dict(rows[0]['assets'])['B01'] == items[0]['assets']['B01']['href'])
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import os.path as op
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.state import StateStore
+from stac_sentinel.transport import LocalTransport
+
+testpath = op.dirname(__file__)
+
+
+def inventory_record(i, last_modified='2020-01-01T00:00:00.000Z'):
+    key = 'tiles/57/U/VB/2017/10/23/%s/tileInfo.json' % i
+    return {'Bucket': 'sentinel-s2-l1c', 'Key': key, 'LastModifiedDate': last_modified,
+            'url': 's3://sentinel-s2-l1c/%s' % key}
+
+
+class Test(unittest.TestCase):
+    """ Test state module """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = op.join(self.path, 'state.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_skip(self):
+        records = [inventory_record(i) for i in range(5)]
+        with StateStore(self.filename, batch_size=2) as state:
+            state.record(records[0], item_id='item0')
+            state.record(records[1], error=Exception('failed'))
+            state.record(records[2], item_id='item2')
+        records[2] = inventory_record(2, last_modified='2020-02-01T00:00:00.000Z')
+        with StateStore(self.filename) as state:
+            assert(state.counts() == {'ok': 2, 'error': 1})
+            assert(list(state.skip(records)) == records)
+            assert(list(state.skip(records, resume=True)) == records[3:])
+            assert(list(state.skip(records, delta=True, chunk_size=2)) == records[1:])
+            assert(list(state.failed()) == [records[1]])
+
+    def test_retry_failed(self):
+        record = inventory_record(0)
+        with StateStore(self.filename) as state:
+            state.record(record, error=Exception('failed'))
+        transport = LocalTransport(files={record['url']: open(op.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')).read()})
+        _transport, SentinelSTAC.transport = SentinelSTAC.transport, transport
+        try:
+            items = list(SentinelSTAC.get_aws_archive('sentinel-s2-l1c', direct_from_s3=True, state=self.filename,
+                                                      retry_failed=True))
+        finally:
+            SentinelSTAC.transport = _transport
+        assert(len(items) == 1)
+        with StateStore(self.filename) as state:
+            assert(state.counts() == {'ok': 1})
@@ -0,0 +1,84 @@
+import json
+import shutil
+import tempfile
+import unittest
+
+import os.path as op
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.inventory import Inventory
+from stac_sentinel.stats import Histogram, Stats
+from stac_sentinel.transport import LocalTransport
+
+from utils import create_inventory
+
+testpath = op.dirname(__file__)
+
+
+class Test(unittest.TestCase):
+    """ Test stats module """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_histogram(self):
+        hist = Histogram(buckets=(1, 2, 3))
+        for v in [0.5] * 50 + [1.5] * 40 + [2.5] * 10:
+            hist.observe(v)
+        assert(hist.counts == [50, 40, 10, 0])
+        assert(hist.percentile(50) == 1)
+        assert(1 < hist.percentile(90) <= 2)
+        assert(hist.to_dict()['mean'] == 1.1)
+
+    def test_timer(self):
+        stats = Stats()
+        with stats.timer('fetch'):
+            pass
+        with self.assertRaises(ValueError):
+            with stats.timer('fetch'):
+                raise ValueError('failed')
+        stats.incr('items', 2)
+        data = stats.to_dict()
+        assert(data['stages']['fetch']['count'] == 2)
+        assert(data['errors'] == {'fetch:ValueError': 1})
+        assert(data['counters'] == {'items': 2})
+        assert('items 2' in stats.summary())
+
+    def test_save(self):
+        stats = Stats()
+        with stats.timer('transform'):
+            pass
+        stats.error('fetch', KeyError())
+        stats.save(op.join(self.path, 'stats.json'))
+        with open(op.join(self.path, 'stats.json')) as f:
+            assert(json.loads(f.read())['stages']['transform']['count'] == 1)
+        stats.save(op.join(self.path, 'stats.prom'))
+        with open(op.join(self.path, 'stats.prom')) as f:
+            lines = f.read().splitlines()
+        assert('stac_sentinel_stage_seconds_bucket{stage="transform",le="+Inf"} 1' in lines)
+        assert('stac_sentinel_stage_seconds_count{stage="transform"} 1' in lines)
+        assert('stac_sentinel_errors_total{stage="fetch",type="KeyError"} 1' in lines)
+
+    def test_get_aws_archive(self):
+        create_inventory(self.path)
+        with open(op.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')) as f:
+            metadata = f.read()
+        files = {r['url']: metadata for r in Inventory(self.path).records(prefix='tiles/1/')}
+        _transport, SentinelSTAC.transport = SentinelSTAC.transport, LocalTransport(files=files)
+        _stats, SentinelSTAC.stats = SentinelSTAC.stats, Stats()
+        try:
+            items = list(SentinelSTAC.get_aws_archive('sentinel-s2-l1c', inventory=self.path, direct_from_s3=True,
+                                                      prefix='tiles/'))
+            data = SentinelSTAC.stats.to_dict()
+        finally:
+            SentinelSTAC.transport, SentinelSTAC.stats = _transport, _stats
+        assert(len(items) == 10)
+        assert(data['counters'] == {'records': 30, 'items': 10, 'failed': 20})
+        assert(data['stages']['inventory']['count'] == 3)
+        assert(data['stages']['fetch']['count'] == 30)
+        assert(data['errors'] == {'fetch:TransportError': 20})
+        assert(data['stages']['transform']['count'] == 10)
+        assert(data['stages']['reproject']['count'] == 10)
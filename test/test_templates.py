@@ -0,0 +1,33 @@
+import unittest
+
+from stac_sentinel.templates import ItemTemplate, load_collection, prefix
+
+
+class Test(unittest.TestCase):
+    """ Test templates module """
+
+    def test_prefix(self):
+        assert(prefix('') == '')
+        assert(prefix('s3://bucket/') == 's3://bucket/')
+        assert(prefix('s3://bucket') == 's3://bucket/')
+
+    def test_get_template(self):
+        template = ItemTemplate.get('sentinel-s2-l1c')
+        assert(template is ItemTemplate.get('sentinel-s2-l1c'))
+        assert(template.get_collection() == load_collection('sentinel-s2-l1c'))
+
+    def test_get_assets_from_url(self):
+        template = ItemTemplate.get('sentinel-s2-l2a')
+        assets = template.get_assets_from_url('s3://sentinel-s2-l2a/tiles/1', l1c_base_url='s3://sentinel-s2-l1c/tiles/1')
+        assert(len(assets) == 19)
+        assert(assets['B01']['href'] == 's3://sentinel-s2-l2a/tiles/1/R60m/B01.jp2')
+        assert(assets['thumbnail']['href'] == 's3://sentinel-s2-l1c/tiles/1/preview.jpg')
+        # items do not share asset dictionaries with the template
+        assets['B01']['roles'].append('test')
+        assert('test' not in template.get_assets_from_url('')['B01']['roles'])
+        assert('href' not in template.collection['assets']['B01'])
+
+    def test_get_assets(self):
+        assets = ItemTemplate.get('sentinel-s1-l1c').get_assets({'VV': 'vv.tiff', 'thumbnail': 'preview.png'})
+        assert(list(assets.keys()) == ['thumbnail', 'VV'])
+        assert(assets['VV']['href'] == 'vv.tiff')
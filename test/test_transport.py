@@ -0,0 +1,70 @@
+import os.path as op
+import unittest
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.transport import Transport, LocalTransport, TransportError
+
+from utils import ANNOTATION, Handler, serve
+
+testpath = op.dirname(__file__)
+
+
+class Test(unittest.TestCase):
+    """ Test transport module """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.url = serve()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        # the handler is shared with other tests
+        del Handler.requests[:]
+
+    def test_get_http(self):
+        transport = Transport(backoff=0.01)
+        assert(transport.get_json(self.url + '/tile') == {'path': '/tile'})
+        # session is reused between requests
+        assert(transport.session is transport.session)
+
+    def test_retry(self):
+        transport = Transport(backoff=0.01)
+        assert(transport.get_json(self.url + '/flaky') == {'path': '/flaky'})
+        assert(Handler.requests.count('/flaky') == 2)
+
+    def test_status_error(self):
+        transport = Transport(backoff=0.01)
+        with self.assertRaises(TransportError) as cm:
+            transport.get(self.url + '/missing')
+        assert(cm.exception.status == 404)
+        assert(Handler.requests.count('/missing') == 1)
+
+    def test_local_transport(self):
+        transport = LocalTransport(root=testpath, files={'s3://bucket/key.json': '{"a": 1}'})
+        assert(transport.get_json('s3://bucket/key.json') == {'a': 1})
+        md = transport.get_json('https://samples/sentinel-s2-l1c-tileInfo.json')
+        assert(md['gridSquare'] == 'VB')
+        with self.assertRaises(TransportError):
+            transport.get('s3://bucket/missing.json')
+
+    def test_fetch_metadata(self):
+        url = 's3://sentinel-s1-l1c/GRD/2019/2/20/IW/DH/S1B/productInfo.json'
+        base_url = op.dirname(url)
+        with open(op.join(testpath, 'samples/sentinel-s1-l1c-productInfo.json')) as f:
+            transport = LocalTransport(files={url: f.read(), base_url + '/annotation/iw-hv.xml': ANNOTATION})
+        _transport, SentinelSTAC.transport = SentinelSTAC.transport, transport
+        try:
+            metadata, base_url = SentinelSTAC.fetch_metadata('sentinel-s1-l1c', url, direct_from_s3=True)
+        finally:
+            SentinelSTAC.transport = _transport
+        assert(base_url == op.dirname(url))
+        assert(len(metadata['filenames']) == 2)
+        assert(metadata['filenames'][0].startswith(base_url + '/annotation/'))
+        assert(metadata['annotation']['adsHeader/missionId'] == 'S1B')
+        item = SentinelSTAC('sentinel-s1-l1c', metadata).to_stac()
+        assert(item['properties']['sat:orbit_state'] == 'ascending')
+        assert(item['properties']['sar:looks_range'] == 5)
@@ -0,0 +1,79 @@
+import logging
+import unittest
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+from stac_sentinel.stats import Stats
+from stac_sentinel.validate import ITEM_SCHEMA, ItemValidator, ValidationSink, field, load_schema, sampled
+
+from utils import get_items, get_s1_item
+
+
+class Test(unittest.TestCase):
+    """ Test validate module """
+
+    def test_load_schema(self):
+        schema = load_schema(ITEM_SCHEMA)
+        assert(schema['title'] == 'STAC Item')
+        assert(load_schema('https://geojson.org/schema/Feature.json#')['title'] == 'GeoJSON Feature')
+        with self.assertRaises(ValueError):
+            load_schema('https://schemas.stacspec.org/v0.9.0/extensions/dtr/json-schema/schema.json')
+        assert(field('geometry.coordinates[0][3]') == 'geometry.coordinates[][]')
+
+    @unittest.skipIf(fastjsonschema is None, 'fastjsonschema not installed')
+    def test_valid_items(self):
+        validator = ItemValidator()
+        assert(validator.validate(get_items(1)[0]) == [])
+        assert(validator.validate(get_s1_item()) == [])
+        # dtr has no schema in 0.9.0
+        assert(sorted(validator.check_extensions) == ['dtr', 'eo', 'sar', 'sat'])
+        assert(validator.check_extensions['dtr'] is None)
+
+    @unittest.skipIf(fastjsonschema is None, 'fastjsonschema not installed')
+    def test_invalid_item(self):
+        item = get_items(1)[0]
+        item = dict(item, properties=dict(item['properties'], **{'eo:cloud_cover': 101}))
+        del item['assets']['info']['href']
+        s1 = get_s1_item()
+        s1['properties']['datetime'] = s1['properties']['datetime'][:-6]
+        del s1['properties']['sar:product_type']
+        validator = ItemValidator()
+        assert(validator.validate(item) == [
+            ('assets.info', 'must contain [\'href\'] properties'),
+            ('properties.eo:cloud_cover', 'must be smaller than or equal to 100')
+        ])
+        assert(validator.validate(dict(item, assets={}, bbox=[1, 2])) == [
+            ('bbox', 'must contain at least 4 items'),
+            ('properties.eo:cloud_cover', 'must be smaller than or equal to 100')
+        ])
+        assert(validator.validate(s1) == [('properties.datetime', 'must be date-time'),
+                                          ('properties', 'must contain [\'sar:product_type\'] properties')])
+
+    def test_sampled(self):
+        ids = ['item-%s' % i for i in range(1000)]
+        assert(all(sampled(id, 1) for id in ids))
+        assert(not any(sampled(id, 0) for id in ids))
+        sample = [id for id in ids if sampled(id, 0.1)]
+        assert(50 < len(sample) < 150)
+        assert(sample == [id for id in ids if sampled(id, 0.1)])
+
+    @unittest.skipIf(fastjsonschema is None, 'fastjsonschema not installed')
+    def test_validation_sink(self):
+        items = get_items(10)
+        items[3] = dict(items[3], type='Feature Collection')
+        logging.disable(logging.WARNING)
+        try:
+            for workers in (0, 2):
+                stats = Stats()
+                with ValidationSink(workers=workers, batch_size=3, stats=stats) as sink:
+                    for item in items:
+                        sink.write(item)
+                    sink.flush()
+                    assert(sink.validated == 10)
+                assert(sink.to_dict() == {'validated': 10, 'invalid': 1, 'errors': {"type must be one of ['Feature']": 1}})
+                assert(stats.counters == {'validated': 10, 'invalid': 1})
+        finally:
+            logging.disable(logging.NOTSET)
@@ -0,0 +1,191 @@
+import json
+import os
+import shutil
+import signal
+import tempfile
+import unittest
+
+import os.path as op
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.changes import ChangeStore
+from stac_sentinel.publish import SNSPublisher
+from stac_sentinel.sinks import Sink
+from stac_sentinel.transport import LocalTransport
+from stac_sentinel.worker import LocalQueue, SQSQueue, Worker
+
+from utils import TILE, TOPIC, Client, RaisingPublisher, s2_message, tile_files
+
+
+class ListSink(Sink):
+    """ Keep Items in a list, optionally calling a function on each write """
+
+    def __init__(self, on_write=None):
+        self.items = []
+        self.flushed = 0
+        self.closed = False
+        self.on_write = on_write
+
+    def write(self, item, data=None):
+        self.items.append(json.loads(data))
+        if self.on_write:
+            self.on_write()
+
+    def flush(self):
+        self.flushed = len(self.items)
+
+    def close(self):
+        self.closed = True
+
+
+class FlakyQueue(LocalQueue):
+    """ LocalQueue failing the first receive """
+
+    def receive(self, max_messages=10):
+        if not self.deleted and not getattr(self, 'failed', False):
+            self.failed = True
+            raise IOError('connection reset')
+        return super(FlakyQueue, self).receive(max_messages)
+
+
+class SQSClient(object):
+    """ Stand-in SQS client """
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.deleted = []
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages, WaitTimeSeconds):
+        messages, self.messages = self.messages[:MaxNumberOfMessages], self.messages[MaxNumberOfMessages:]
+        return {'Messages': messages}
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        assert(len(Entries) <= 10)
+        self.deleted += [e['ReceiptHandle'] for e in Entries]
+        return {'Successful': [], 'Failed': [{'Id': '0', 'Message': 'error'}] if len(self.deleted) > 20 else []}
+
+
+class Test(unittest.TestCase):
+    """ Test worker module """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.transport = LocalTransport(files=tile_files())
+
+    def setUp(self):
+        self._transport, SentinelSTAC.transport = SentinelSTAC.transport, self.transport
+
+    def tearDown(self):
+        SentinelSTAC.transport = self._transport
+
+    def test_worker(self):
+        queue = LocalQueue([s2_message(TILE, TILE[:-1] + '1'), 'not json', s2_message(TILE[:-1] + '2'),
+                            s2_message(TILE)])
+        sink = ListSink()
+        client = Client()
+        worker = Worker(queue, sinks=[sink], publishers={None: SNSPublisher(TOPIC, client=client)}, batch_size=2)
+        worker.run(exit_when_empty=True)
+        assert(queue.deleted == ['1', '4'])
+        assert(sorted(queue.in_flight.keys()) == ['2', '3'])
+        assert(len(sink.items) == 3 and sink.flushed == 3 and sink.closed)
+        assert(sum(len(b) for b in client.batches) == 3)
+
+    def test_publish_failed(self):
+        queue = LocalQueue([s2_message(TILE), s2_message(TILE[:-1] + '1')])
+        publisher = SNSPublisher(TOPIC, client=Client(fail=['1'], sender_fault=True))
+        worker = Worker(queue, publishers={'sentinel-s2-l1c': publisher})
+        # both messages have an Item with the same id, neither is acknowledged
+        assert(worker.process(queue.receive()) == ['1', '2'])
+        assert(publisher.failed == [])
+        worker.close()
+        assert(queue.deleted == [])
+
+    def test_error(self):
+        queue = FlakyQueue([s2_message(TILE)])
+        sink = ListSink()
+        worker = Worker(queue, sinks=[sink], backoff=0.01)
+        worker.stats.reset()
+        worker.run(exit_when_empty=True)
+        assert(queue.deleted == ['1'])
+        assert(len(sink.items) == 1)
+        assert(worker.stats.counters['errors'] == 1)
+
+    def test_changes(self):
+        path = tempfile.mkdtemp()
+        try:
+            queue = LocalQueue([s2_message(TILE), s2_message(TILE)])
+            client = Client()
+            sink = ListSink()
+            worker = Worker(queue, sinks=[sink], publishers={None: SNSPublisher(TOPIC, client=client)},
+                            changes=ChangeStore(op.join(path, 'changes.db')), batch_size=1)
+            worker.run(exit_when_empty=True)
+            # the unchanged Item is not written or published again, but its message is acknowledged
+            assert(queue.deleted == ['1', '2'])
+            assert(len(sink.items) == 1)
+            entries = [e for b in client.batches for e in b]
+            assert(len(entries) == 1)
+            assert(entries[0]['MessageAttributes']['change']['StringValue'] == 'new')
+        finally:
+            shutil.rmtree(path)
+
+    def test_write_failed(self):
+        path = tempfile.mkdtemp()
+        try:
+            queue = LocalQueue([s2_message(TILE)])
+            sink = ListSink()
+            sink.pop_failed = lambda: [item['id'] for item in sink.items]
+            changes = ChangeStore(op.join(path, 'changes.db'))
+            worker = Worker(queue, sinks=[sink], changes=changes)
+            assert(worker.process(queue.receive()) == ['1'])
+            # the Item is written again when the message is received again
+            assert(len(changes) == 0)
+            queue.release()
+            sink.on_write = lambda: 1 / 0
+            assert(worker.process(queue.receive()) == ['1'])
+            assert(len(changes) == 0)
+            queue.release()
+            sink.pop_failed = lambda: []
+            sink.on_write = None
+            assert(worker.process(queue.receive()) == [])
+            assert(len(changes) == 1)
+            assert(queue.deleted == ['1'])
+            worker.close()
+        finally:
+            shutil.rmtree(path)
+
+    def test_publish_error(self):
+        path = tempfile.mkdtemp()
+        try:
+            queue = LocalQueue([s2_message(TILE), s2_message(TILE[:-1] + '3')])
+            publisher = RaisingPublisher(TOPIC, client=Client())
+            changes = ChangeStore(op.join(path, 'changes.db'))
+            worker = Worker(queue, publishers={None: publisher}, changes=changes)
+            with self.assertRaises(IOError):
+                worker.process(queue.receive())
+            # neither Item is unchanged when the messages are received again
+            assert(publisher.calls == 1)
+            assert(len(changes) == 0)
+            assert(queue.deleted == [])
+            worker.close()
+        finally:
+            shutil.rmtree(path)
+
+    def test_stop(self):
+        queue = LocalQueue([s2_message(TILE)] * 5)
+        sink = ListSink(on_write=lambda: os.kill(os.getpid(), signal.SIGTERM))
+        handler = signal.getsignal(signal.SIGTERM)
+        Worker(queue, sinks=[sink], batch_size=2).run()
+        # the batch in progress is completed
+        assert(queue.deleted == ['1', '2'])
+        assert(len(queue.messages) == 3)
+        assert(signal.getsignal(signal.SIGTERM) == handler)
+
+    def test_sqs_queue(self):
+        messages = [{'MessageId': str(i), 'ReceiptHandle': 'r%s' % i, 'Body': '{}'} for i in range(25)]
+        queue = SQSQueue('https://sqs.eu-central-1.amazonaws.com/123456789012/test', client=SQSClient(messages))
+        received = queue.receive(15)
+        assert([m['id'] for m in received] == [str(i) for i in range(15)])
+        assert(queue.delete(received) == [])
+        received = queue.receive(15)
+        assert(len(received) == 10)
+        assert(queue.delete(received) == ['15'])
@@ -0,0 +1,155 @@
+""" Helpers shared by the tests """
+import gzip
+import json
+import os
+import threading
+
+import os.path as op
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from stac_sentinel import SentinelSTAC
+from stac_sentinel.publish import SNSPublisher
+from stac_sentinel.transport import LocalTransport
+
+testpath = op.dirname(__file__)
+
+ANNOTATION = """<product><adsHeader><missionId>S1B</missionId><productType>GRD</productType><mode>IW</mode>
+<startTime>2019-02-20T09:54:17.1</startTime><stopTime>2019-02-20T09:54:42.1</stopTime>
+<absoluteOrbitNumber>15028</absoluteOrbitNumber></adsHeader>
+<generalAnnotation><productInformation><pass>Ascending</pass></productInformation></generalAnnotation>
+<imageAnnotation><imageInformation><incidenceAngleMidSwath>38.3</incidenceAngleMidSwath></imageInformation>
+<processingInformation><swathProcParamsList><swathProcParams>
+<rangeProcessing><numberOfLooks>5</numberOfLooks></rangeProcessing>
+<azimuthProcessing><numberOfLooks>1</numberOfLooks></azimuthProcessing>
+</swathProcParams></swathProcParamsList></processingInformation></imageAnnotation></product>"""
+
+TILE = 'tiles/57/U/VB/2017/10/23/0'
+
+TOPIC = 'arn:aws:sns:eu-central-1:123456789012:test'
+
+
+class Handler(BaseHTTPRequestHandler):
+    """ Serve {'path': path} as JSON, fail the first request to /flaky, always fail /missing """
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        if self.path == '/missing' or (self.path == '/flaky' and self.requests.count('/flaky') == 1):
+            self.send_response(404 if self.path == '/missing' else 503)
+            self.end_headers()
+            return
+        body = json.dumps({'path': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(handler=Handler):
+    """ Start a local HTTP server in a thread, to be stopped with shutdown() and server_close()
+    Returns:
+    Tuple of (server, url)
+    """
+    server = HTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:%s' % server.server_address[1]
+
+
+class Client(object):
+    """ Stand-in SNS client, failing the given entry Ids of the first request """
+
+    def __init__(self, fail=(), sender_fault=False):
+        self.fail = set(fail)
+        self.sender_fault = sender_fault
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        with self.lock:
+            first = not self.batches
+            self.batches.append(PublishBatchRequestEntries)
+        failed = [{'Id': e['Id'], 'Code': 'InternalError', 'SenderFault': self.sender_fault}
+                  for e in PublishBatchRequestEntries if first and e['Id'] in self.fail]
+        return {'Successful': [], 'Failed': failed}
+
+
+class RaisingPublisher(SNSPublisher):
+    """ SNSPublisher raising on publish """
+
+    calls = 0
+
+    def publish(self, item, attributes=None, data=None, change=None):
+        self.calls += 1
+        raise IOError('connection reset')
+
+
+def s2_message(*paths):
+    """ New Sentinel-2 L1C scene notification of the tile paths """
+    name = 'S2A_MSIL1C_20171023T004701_N0205_R045_T57UVB_20171023T004657'
+    return json.dumps({'name': name, 'tiles': [{'path': p} for p in paths]})
+
+
+def sqs_event(bodies):
+    """ Lambda event of an SQS batch of messages with ids m0, m1, ... """
+    return {'Records': [{'messageId': 'm%s' % i, 'eventSource': 'aws:sqs', 'body': body}
+                        for i, body in enumerate(bodies)]}
+
+
+def tile_files():
+    """ Files of a LocalTransport with the tileInfo of TILE, of sequence 1 (the same Item id) and of
+    sequence 3 (another Item id) """
+    with open(op.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')) as f:
+        tileinfo = f.read()
+    url = '%s/sentinel-s2-l1c/%s/tileInfo.json'
+    return {
+        url % (SentinelSTAC.FREE_URL, TILE): tileinfo,
+        url % (SentinelSTAC.FREE_URL, TILE[:-1] + '1'): tileinfo,
+        url % (SentinelSTAC.FREE_URL, TILE[:-1] + '3'): json.dumps(dict(json.loads(tileinfo), path=TILE[:-1] + '3'))
+    }
+
+
+def get_items(n):
+    """ n Sentinel-2 Items with different ids """
+    with open(op.join(testpath, 'samples/sentinel-s2-l1c-tileInfo.json')) as f:
+        item = SentinelSTAC('sentinel-s2-l1c', json.loads(f.read())).to_stac()
+    items = []
+    for i in range(n):
+        items.append(dict(item, id='%s_%s' % (item['id'], i)))
+    return items
+
+
+def create_inventory(path, nfiles=3, ntiles=10):
+    """ Create local inventory of sentinel-s2-l1c with nfiles data files, each with ntiles tiles """
+    manifest = {
+        'sourceBucket': 'sentinel-s2-l1c',
+        'fileFormat': 'CSV',
+        'fileSchema': 'Bucket, Key, Size, LastModifiedDate',
+        'files': []
+    }
+    os.makedirs(op.join(path, '2020-01-02T00-00Z'))
+    os.makedirs(op.join(path, 'data'))
+    for i in range(nfiles):
+        key = 'sentinel-s2-l1c/sentinel-s2-l1c-inventory/data/%s.csv.gz' % i
+        lines = []
+        for j in range(ntiles):
+            tile = 'tiles/%s/U/VB/2017/10/23/%s' % (i + 1, j)
+            for fname in ['B01.jp2', 'tileInfo.json', 'preview.jpg']:
+                lines.append('"sentinel-s2-l1c","%s/%s","100","2020-01-%02dT01:02:03.000Z"' % (tile, fname, j + 1))
+        with gzip.open(op.join(path, 'data', op.basename(key)), 'wt') as f:
+            f.write('\n'.join(lines))
+        manifest['files'].append({'key': key})
+    with open(op.join(path, '2020-01-02T00-00Z', 'manifest.json'), 'w') as f:
+        f.write(json.dumps(manifest))
+
+
+def get_s1_item():
+    """ Sentinel-1 Item from the sample productInfo and ANNOTATION """
+    url = 's3://sentinel-s1-l1c/GRD/2019/2/20/IW/DH/S1B/productInfo.json'
+    with open(op.join(testpath, 'samples/sentinel-s1-l1c-productInfo.json')) as f:
+        transport = LocalTransport(files={url: f.read(), op.dirname(url) + '/annotation/iw-hv.xml': ANNOTATION})
+    metadata, base_url = SentinelSTAC.fetch_metadata('sentinel-s1-l1c', url, direct_from_s3=True, transport=transport)
+    return SentinelSTAC('sentinel-s1-l1c', metadata).to_stac(base_url=base_url)